@@ -196,6 +196,7 @@ function AppContent() {
         // Real entries: delete from database
         await apiService.deleteEntry(entryId);
         setDiaryEntries(diaryEntries.filter(entry => entry.id !== entryId));
+        setLastEntryTimestamp(Date.now());
         alert("✅ Entry deleted from database!");
       }
       
@@ -476,6 +477,7 @@ function AppContent() {
                   setSelectedDate={setSelectedDate}
                   handleDeleteEntry={handleDeleteEntry}
                   selectedProfile={selectedProfile}
+                  lastEntryTimestamp={lastEntryTimestamp}
                   onEntryUpdated={handleEntryUpdated}
                 />
               )}
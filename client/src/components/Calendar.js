@@ -1,19 +1,75 @@
-import React, { useMemo, useState } from 'react';
+import React, { useEffect, useMemo, useState } from 'react';
 import "./Calendar.css";
 import DiaryEntry from "./DiaryEntry.js";
+import apiService from '../services/apiService';
 
-function Calendar({getDatesWithEntries, getEntriesForDate, selectedDate, setSelectedDate, handleDeleteEntry, onEntryUpdated}) {
+// Mood bucket for an average 1-10 mood score
+const moodFromScore = (score) => score > 6.5 ? 'positive' : score < 4.5 ? 'negative' : 'neutral';
+
+// Entry count and mood for a day: the server's month summary when it has
+// the day, otherwise the entries loaded in the app
+const describeDay = (summary, dayEntries) => {
+    if (summary) {
+        return {
+            entryCount: summary.entry_count,
+            averageMood: summary.avg_mood_score != null ? moodFromScore(summary.avg_mood_score) : 'neutral'
+        };
+    }
+
+    let averageMood = 'neutral';
+    if (dayEntries.length > 0) {
+        // Use AI mood scores if available, otherwise fall back to mood strings
+        const moodSum = dayEntries.reduce((sum, entry) => {
+            if (entry.aiData && entry.aiData.moodScore) {
+                return sum + entry.aiData.moodScore;
+            } else {
+                // Fallback to string-based mood
+                return sum + (entry.mood === 'positive' ? 8 : entry.mood === 'negative' ? 3 : 5);
+            }
+        }, 0);
+        averageMood = moodFromScore(moodSum / dayEntries.length);
+    }
+    return { entryCount: dayEntries.length, averageMood };
+};
+
+function Calendar({getDatesWithEntries, getEntriesForDate, selectedDate, setSelectedDate, handleDeleteEntry, onEntryUpdated, selectedProfile, lastEntryTimestamp}) {
 
     // State for current month/year being viewed
     const [currentDate, setCurrentDate] = useState(new Date());
     
     // NEW: State for view mode (month or week)
     const [viewMode, setViewMode] = useState('month');
+
+    // Server per-day counts and averages for the viewed month, keyed like dateString
+    const [monthSummary, setMonthSummary] = useState({});
     
     // Get current month and year
     const currentMonth = currentDate.getMonth();
     const currentYear = currentDate.getFullYear();
 
+    // One /entries/calendar request per month change (or after entries change)
+    useEffect(() => {
+        if (!selectedProfile) return;
+        let cancelled = false;
+        const month = `${currentYear}-${String(currentMonth + 1).padStart(2, '0')}`;
+
+        apiService.getCalendarMonth(selectedProfile, month)
+            .then((result) => {
+                if (cancelled) return;
+                const summary = {};
+                result.days.forEach((day) => {
+                    const [year, monthNumber, dayNumber] = day.date.split('-').map(Number);
+                    summary[new Date(year, monthNumber - 1, dayNumber).toLocaleDateString()] = day;
+                });
+                setMonthSummary(summary);
+            })
+            .catch(() => {
+                if (!cancelled) setMonthSummary({});
+            });
+
+        return () => { cancelled = true; };
+    }, [selectedProfile, currentMonth, currentYear, lastEntryTimestamp]);
+
     const monthNames = [
         "January", "February", "March", "April", "May", "June",
         "July", "August", "September", "October", "November", "December"
@@ -43,33 +99,18 @@ function Calendar({getDatesWithEntries, getEntriesForDate, selectedDate, setSele
                 const isCurrentMonth = date.getMonth() === currentMonth;
                 const isToday = date.toDateString() === today.toDateString();
                 const isSelected = selectedDate === dateString;
-                
-                // Calculate average mood
-                // Calculate average mood using AI mood scores
-                let averageMood = 'neutral';
-                if (dayEntries.length > 0) {
-                    // Use AI mood scores if available, otherwise fall back to mood strings
-                    const moodSum = dayEntries.reduce((sum, entry) => {
-                        if (entry.aiData && entry.aiData.moodScore) {
-                            return sum + entry.aiData.moodScore;
-                        } else {
-                            // Fallback to string-based mood
-                            return sum + (entry.mood === 'positive' ? 8 : entry.mood === 'negative' ? 3 : 5);
-                        }
-                    }, 0);
-                    const avgScore = moodSum / dayEntries.length;
-                    averageMood = avgScore > 6.5 ? 'positive' : avgScore < 4.5 ? 'negative' : 'neutral';
-                }
+                const { entryCount, averageMood } = describeDay(monthSummary[dateString], dayEntries);
                 
                 days.push({
                     date: date,
                     dateString: dateString,
                     dayNumber: date.getDate(),
                     entries: dayEntries,
+                    entryCount: entryCount,
                     isCurrentMonth: isCurrentMonth,
                     isToday: isToday,
                     isSelected: isSelected,
-                    hasEntries: dayEntries.length > 0,
+                    hasEntries: entryCount > 0,
                     averageMood: averageMood
                 });
             }
@@ -91,38 +132,25 @@ function Calendar({getDatesWithEntries, getEntriesForDate, selectedDate, setSele
                 const isCurrentMonth = date.getMonth() === currentMonth;
                 const isToday = date.toDateString() === today.toDateString();
                 const isSelected = selectedDate === dateString;
-
-                let averageMood = 'neutral';
-                if (dayEntries.length > 0) {
-                    // Use AI mood scores if available, otherwise fall back to mood strings
-                    const moodSum = dayEntries.reduce((sum, entry) => {
-                        if (entry.aiData && entry.aiData.moodScore) {
-                            return sum + entry.aiData.moodScore;
-                        } else {
-                            // Fallback to string-based mood
-                            return sum + (entry.mood === 'positive' ? 8 : entry.mood === 'negative' ? 3 : 5);
-                        }
-                    }, 0);
-                    const avgScore = moodSum / dayEntries.length;
-                    averageMood = avgScore > 6.5 ? 'positive' : avgScore < 4.5 ? 'negative' : 'neutral';
-                }
+                const { entryCount, averageMood } = describeDay(monthSummary[dateString], dayEntries);
 
                 days.push({
                     date: date,
                     dateString: dateString,
                     dayNumber: date.getDate(),
                     entries: dayEntries,
+                    entryCount: entryCount,
                     isCurrentMonth: isCurrentMonth,
                     isToday: isToday,
                     isSelected: isSelected,
-                    hasEntries: dayEntries.length > 0,
+                    hasEntries: entryCount > 0,
                     averageMood: averageMood
                 });
             }
         }
         
         return days;
-    }, [currentMonth, currentYear, currentDate, viewMode, getDatesWithEntries, getEntriesForDate, selectedDate]);
+    }, [currentMonth, currentYear, currentDate, viewMode, getDatesWithEntries, getEntriesForDate, selectedDate, monthSummary]);
 
     // UPDATED: Navigation based on view mode
     const goToPrevious = () => {
@@ -238,7 +266,7 @@ function Calendar({getDatesWithEntries, getEntriesForDate, selectedDate, setSele
                             {/* Entry count */}
                             {day.hasEntries && (
                                 <div className="entry-count">
-                                    {day.entries.length} {day.entries.length === 1 ? 'entry' : 'entries'}
+                                    {day.entryCount} {day.entryCount === 1 ? 'entry' : 'entries'}
                                 </div>
                             )}
                         </div>
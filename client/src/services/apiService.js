@@ -188,6 +188,25 @@ class ApiService {
     }
   }
 
+  // Get per-day entry counts and metric averages for a month (YYYY-MM)
+  async getCalendarMonth(selectedProfile, month) {
+    try {
+      if (!selectedProfile) {
+        throw new Error('No profile selected');
+      }
+
+      const params = new URLSearchParams();
+      params.append('user_id', selectedProfile.id);
+      params.append('month', month);
+
+      const response = await this.api.get(`/entries/calendar?${params.toString()}`);
+      return await this.handleResponse(response);
+    } catch (error) {
+      console.error(`❌ Failed to fetch calendar for ${month}:`, error);
+      throw error;
+    }
+  }
+
   // Convert backend entry format to your current React format
   convertBackendEntry(backendEntry) {
     console.log('🔄 Converting backend entry:', backendEntry);
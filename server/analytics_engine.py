@@ -6,11 +6,17 @@ This module handles all the statistical analysis and AI-powered insights
 from psycopg2.extras import RealDictCursor
 from datetime import datetime, timedelta
 import json
+import logging
 import statistics
 from openai import OpenAI
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 from utils.db_utils import get_db_connection
+from utils.ai_utils import create_chat_completion
+from utils.model_usage import model_usage_scope
+from utils.model_scheduler import model_priority, BACKGROUND
+
+logger = logging.getLogger(__name__)
 
 @dataclass
 class HealthSummary:
@@ -58,8 +64,6 @@ class HealthAnalyticsEngine:
             end_date = datetime.now().date()
             start_date = end_date - timedelta(weeks=weeks_back)
             
-            print(f"🔍 Querying for data between {start_date} and {end_date}")
-            
             # FIXED: Complete the SQL query that was cut off
             query = """
                 SELECT 
@@ -85,17 +89,14 @@ class HealthAnalyticsEngine:
             cursor.execute(query, (user_id, start_date, end_date))
             results = cursor.fetchall()
             
-            print(f"✅ Found {len(results)} entries for analysis")
-            
-            # Debug: Print date range of found entries
-            if results:
-                dates = [r['entry_date'] for r in results]
-                print(f"📅 Entry dates found: {min(dates)} to {max(dates)}")
+            logger.debug("Loaded entries for analysis", extra={
+                "user_id": user_id, "entries": len(results),
+                "start_date": start_date, "end_date": end_date})
             
             return [dict(row) for row in results]
             
         except Exception as e:
-            print(f"❌ Error in get_weekly_data: {e}")
+            logger.exception("Loading analysis data failed", extra={"user_id": user_id})
             return []
             
         finally:
@@ -107,7 +108,6 @@ class HealthAnalyticsEngine:
         Calculate basic statistical measures from the health data
         This is our foundation before AI analysis
         """
-        print('Basic Stats Data:', data)
         if not data:
             return {}
         
@@ -331,7 +331,7 @@ class HealthAnalyticsEngine:
             }
             
         except Exception as e:
-            print(f"Error calculating correlation: {e}")
+            logger.warning("Correlation calculation failed: %s", e)
             return None
         
     def _generate_correlation_insight(self, metric1: str, metric2: str, correlation: Dict) -> str:
@@ -463,10 +463,10 @@ class HealthAnalyticsEngine:
     BE EXTREMELY SPECIFIC - name exact foods, specific environmental conditions, particular social situations, etc. Avoid generic terms like "certain foods" - instead identify "leftover rice", "spicy chutney", etc."""
 
         try:
-            print("🤖 Generating acute trigger-focused AI insights...")
-            
             # STEP 1: Get trigger analysis
-            trigger_response = self.openai_client.chat.completions.create(
+            trigger_response = create_chat_completion(
+                "trigger_analysis",
+                client=self.openai_client,
                 model="gpt-4o",
                 messages=[{"role": "user", "content": trigger_analysis_prompt}],
                 temperature=0.1,
@@ -484,7 +484,7 @@ class HealthAnalyticsEngine:
             try:
                 trigger_data = json.loads(trigger_analysis)
             except json.JSONDecodeError:
-                print("⚠️ Trigger analysis JSON parsing failed")
+                logger.warning("Trigger analysis response was not valid JSON")
                 trigger_data = {"specific_triggers": [], "environmental_patterns": [], "behavioral_insights": []}
             
             # STEP 2: Synthesis prompt - FIXED to actually use it
@@ -525,10 +525,10 @@ class HealthAnalyticsEngine:
 
     Make each recommendation SPECIFIC and ACTIONABLE with clear next steps."""
 
-            print("🧠 Generating synthesis and recommendations...")
-            
             # STEP 2: Get synthesis
-            synthesis_response = self.openai_client.chat.completions.create(
+            synthesis_response = create_chat_completion(
+                "synthesis",
+                client=self.openai_client,
                 model="gpt-4o",
                 messages=[{"role": "user", "content": synthesis_prompt}],
                 temperature=0.2,
@@ -546,7 +546,7 @@ class HealthAnalyticsEngine:
             try:
                 final_insights = json.loads(synthesis_result)
             except json.JSONDecodeError:
-                print("⚠️ Synthesis JSON parsing failed")
+                logger.warning("Synthesis response was not valid JSON")
                 final_insights = {
                     "key_insights": ["Analysis completed but formatting issue occurred"],
                     "potential_triggers": ["Check diary entries for patterns"],
@@ -555,14 +555,14 @@ class HealthAnalyticsEngine:
                     "positive_patterns": ["Regular logging is beneficial"]
                 }
             
-            print("✅ AI insights generated successfully")
-            print(f"🎯 Generated {len(final_insights.get('potential_triggers', []))} potential triggers")
+            logger.debug("AI insights generated", extra={
+                "potential_triggers": len(final_insights.get('potential_triggers', []))})
             
             # FIXED: Return the correct format that your frontend expects
             return final_insights
             
         except Exception as e:
-            print(f"❌ AI insights generation error: {e}")
+            logger.exception("AI insights generation failed")
             # FIXED: Return correct fallback format
             return {
                 "key_insights": ["Unable to generate insights due to processing error"],
@@ -578,27 +578,21 @@ class HealthAnalyticsEngine:
         Main function to generate complete weekly health summary
         FIXED: Properly stores all AI insight fields
         """
-        print("🔄 Generating weekly health summary...")
-        
         # Step 1: Get raw data
         raw_data = self.get_weekly_data(user_id, weeks_back=1)
-        print(f"📊 Retrieved {len(raw_data)} entries for analysis")
         
         if not raw_data:
             return self._create_empty_summary()
         
         # Step 2: Calculate statistical measures
         stats = self.calculate_basic_stats(raw_data)
-        print("📈 Calculated basic statistics")
         
         # Step 3: Find correlations and patterns
         correlations = self.find_correlations(raw_data)
-        print(f"🔍 Found {len(correlations)} significant correlations")
         
         # Step 4: Generate AI insights
-        ai_insights = self.generate_ai_insights(stats, correlations, raw_data)
-        print("🤖 Generated AI insights")
-        print(f"🔍 AI insights keys: {list(ai_insights.keys())}")
+        with model_usage_scope(user_id=user_id), model_priority(BACKGROUND):
+            ai_insights = self.generate_ai_insights(stats, correlations, raw_data)
         
         # Step 5: Compile everything into HealthSummary object
         # FIXED: Properly extract all fields from AI insights
@@ -623,10 +617,10 @@ class HealthAnalyticsEngine:
             positive_patterns=ai_insights.get('positive_patterns', [])
         )
         
-        print("✅ Weekly summary generated successfully")
-        print(f"🔍 Summary insights count: {len(summary.insights)}")
-        print(f"🔍 Summary areas of concern count: {len(summary.areas_of_concern)}")
-        print(f"🔍 Summary positive patterns count: {len(summary.positive_patterns)}")
+        logger.info("Weekly summary generated", extra={
+            "user_id": user_id, "entries": len(raw_data), "correlations": len(correlations),
+            "insights": len(summary.insights), "areas_of_concern": len(summary.areas_of_concern),
+            "positive_patterns": len(summary.positive_patterns)})
         
         return summary
 
@@ -1,18 +1,33 @@
 from flask import Flask, jsonify
+import logging
 import os
 from datetime import datetime
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from extensions import db, migrate, jwt, cors
 from config import DevelopmentConfig, ProductionConfig, TestingConfig
+from utils.json_provider import FastJSONProvider
+from utils.compression import init_compression
+from utils.metrics import init_metrics
+from utils.query_profiler import init_query_profiler
+from utils.slow_profiler import init_slow_request_profiler
+from utils.model_usage import init_model_usage
+from utils.rate_limit import init_rate_limiting
+from utils.model_scheduler import init_model_scheduler
+from utils.logging_utils import configure_logging
 
 # Load environment variables only for non-testing environments
 if os.getenv("FLASK_ENV") != "testing":
     from dotenv import load_dotenv
     load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 def create_app(config_class=None):
+    # Structured, queued logging configured by LOG_* settings (once per process)
+    configure_logging()
+
     app = Flask(__name__)
     # app.config.from_object(os.getenv('FLASK_ENV', 'development'))
     app.config.from_object(config_class or os.getenv("FLASK_CONFIG") or DevelopmentConfig)
@@ -26,6 +41,29 @@ def create_app(config_class=None):
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
     app.config['JWT_ALGORITHM'] = 'HS256'
 
+    # Request/DB/model metrics served at /metrics (registered first so the
+    # request timing also covers serialization and compression)
+    init_metrics(app)
+
+    # Sampled / on-demand per-request query profiles with N+1 detection
+    init_query_profiler(app)
+
+    # Stack samples of requests slower than SLOW_REQUEST_PROFILE_MS (opt-in)
+    init_slow_request_profiler(app)
+
+    # Admin view of model token usage and cost across families
+    init_model_usage(app)
+
+    # Per-family and global token buckets for model calls
+    init_rate_limiting(app)
+
+    # Model call slots, with capacity reserved for interactive saves
+    init_model_scheduler(app)
+
+    # Faster serialization (orjson when installed) and compressed large responses
+    app.json = FastJSONProvider(app)
+    init_compression(app)
+
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
@@ -39,14 +77,18 @@ def create_app(config_class=None):
 
     @jwt.invalid_token_loader
     def invalid_token_callback(error):
-        print(f"❌ Invalid token error: {error}")
+        logger.info("Invalid token: %s", error)
         return jsonify({'error': 'Invalid token'}), 422
 
     @jwt.unauthorized_loader
     def missing_token_callback(error):
-        print(f"❌ Missing token error: {error}")
+        logger.debug("Missing token: %s", error)
         return jsonify({'error': 'Authorization token is required'}), 401
 
+    @app.errorhandler(413)
+    def request_too_large(error):
+        return jsonify({'success': False, 'message': f"Request exceeds the {app.config['MAX_CONTENT_LENGTH']} byte limit"}), 413
+
     from models import User, Family, HealthMetric, RawEntry
 
     # Register blueprints
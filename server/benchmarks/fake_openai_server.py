@@ -0,0 +1,158 @@
+# benchmarks/fake_openai_server.py
+"""
+Local OpenAI-compatible HTTP server for load tests.
+
+    python -m benchmarks.fake_openai_server --port 8089
+        [--latency lognormal:800:0.5] [--error-rate 0.02]
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8089/v1 (and any
+OPENAI_API_KEY). POST /v1/chat/completions answers with the replies of
+benchmarks.fake_model after a sampled latency, injects 429/500 errors at
+--error-rate, and reports token usage estimated from the request and reply.
+GET /stats returns call, error and token counts.
+
+Latency specs (milliseconds):
+    fixed:MS                  always MS
+    uniform:LOW:HIGH          uniformly between LOW and HIGH
+    lognormal:MEDIAN:SIGMA    long-tailed, like real model calls
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fake_model import detect_call_site, reply_for, estimate_tokens
+
+
+def parse_latency(spec):
+    """Returns a function drawing one latency in seconds from `spec`"""
+    kind, *values = spec.split(":")
+    values = [float(value) for value in values]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma) / 1000
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+class FakeOpenAIState:
+    def __init__(self, latency="fixed:50", error_rate=0.0, seed=None):
+        self.draw_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.stats = {"calls": {}, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self.lock = threading.Lock()
+
+    def plan(self):
+        """(latency seconds, inject error?) for the next call"""
+        with self.lock:
+            return self.draw_latency(self.rng), self.rng.random() < self.error_rate
+
+    def record(self, call_site, error=False, prompt_tokens=0, completion_tokens=0):
+        with self.lock:
+            self.stats["calls"][call_site] = self.stats["calls"].get(call_site, 0) + 1
+            self.stats["errors"] += 1 if error else 0
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.stats))
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeOpenAI/1.0"
+
+    def log_message(self, format, *args):
+        pass  # one line per call would drown the load test output
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            return self._send(200, self.server.state.snapshot())
+        self._send(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send(400, {"error": {"message": "Invalid JSON", "type": "invalid_request_error"}})
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+        state = self.server.state
+        messages = request.get("messages") or []
+        call_site = detect_call_site(messages)
+        latency, fail = state.plan()
+        time.sleep(latency)
+
+        if fail:
+            state.record(call_site, error=True)
+            if state.rng.random() < 0.5:
+                return self._send(429, {"error": {"message": "Rate limit reached (injected)", "type": "rate_limit_error"}},
+                                  {"Retry-After": "1"})
+            return self._send(500, {"error": {"message": "Server error (injected)", "type": "server_error"}})
+
+        prompt = "\n".join(message.get("content", "") for message in messages)
+        content = json.dumps(reply_for(call_site, prompt))
+        usage = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(content)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        state.record(call_site, prompt_tokens=usage["prompt_tokens"], completion_tokens=usage["completion_tokens"])
+        self._send(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+
+def start_server(host="127.0.0.1", port=0, latency="fixed:50", error_rate=0.0, seed=None):
+    """Starts the server on a daemon thread; returns it (`server.server_port`, `server.state`)"""
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.state = FakeOpenAIState(latency, error_rate, seed)
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="lognormal:800:0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    server = start_server(args.host, args.port, args.latency, args.error_rate, args.seed)
+    print(f"Fake OpenAI listening on http://{args.host}:{server.server_port}/v1 (latency {args.latency}, "
+          f"error rate {args.error_rate})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
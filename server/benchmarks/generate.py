@@ -0,0 +1,136 @@
+# benchmarks/generate.py
+"""
+Generates synthetic diaries for load and scale testing.
+
+    python -m benchmarks.generate load --families 500 --members 4 --years 3
+                                       [--mode direct|import] [--processes 4]
+                                       [--tag scale1] [--seed 1]
+    python -m benchmarks.generate dump --families 2 --members 3 --years 1 --out ./diaries
+    python -m benchmarks.generate remove --tag scale1
+
+`load` writes straight into DATABASE_URL (a local database, never
+production); families are spread over --processes worker processes, each
+with its own connection. `--mode import` sends every diary through the import
+pipeline instead of bulk inserts; it is slower and meant for exercising that
+path. `dump` writes one pasted-diary text file per member, in the formats the
+bulk importer accepts, for uploading through the API. `remove` deletes
+everything a tagged load created.
+
+A given --seed always produces the same diaries, whatever the tag.
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+os.environ.setdefault("EMBEDDING_PROVIDER", "hashing")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from benchmarks.seed import seed_family, remove_seeded, member_rng
+from benchmarks.synthetic import make_persona, generate_diary, format_bulk_text
+
+
+def _connect():
+    from utils.db_utils import get_db_connection
+    conn = get_db_connection()
+    if not conn:
+        raise SystemExit("Database connection failed; set DATABASE_URL to a local Postgres")
+    return conn
+
+
+def _load_families(tag, family_indexes, members, days, seed, mode):
+    conn = _connect()
+    try:
+        return [seed_family(conn, tag, index, members, days, seed, mode)["entries"] for index in family_indexes]
+    finally:
+        conn.close()
+
+
+def load(args):
+    tag = args.tag or uuid.uuid4().hex[:8]
+    days = int(args.years * 365)
+    chunks = [list(range(start, args.families, args.processes)) for start in range(args.processes)]
+    chunks = [chunk for chunk in chunks if chunk]
+
+    started = time.perf_counter()
+    stored = families_done = 0
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        futures = [pool.submit(_load_families, tag, chunk, args.members, days, args.seed, args.mode)
+                   for chunk in chunks]
+        for future in as_completed(futures):
+            counts = future.result()
+            stored += sum(counts)
+            families_done += len(counts)
+            print(f"  {families_done}/{args.families} families, {stored} entries "
+                  f"({time.perf_counter() - started:.0f}s)")
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Loaded {stored} entries for {args.families * args.members} members in {elapsed:.1f}s "
+          f"({stored / elapsed:.0f} entries/s), tag {tag}")
+    print(f"   Remove with: python -m benchmarks.generate remove --tag {tag}")
+
+
+def dump(args):
+    os.makedirs(args.out, exist_ok=True)
+    days = int(args.years * 365)
+    start = date.today() - timedelta(days=days - 1)
+    files = 0
+    for family_index in range(args.families):
+        for member in range(args.members):
+            rng = member_rng(args.seed, family_index, member)
+            persona = make_persona(rng)
+            entries = list(generate_diary(persona, start, days, rng))
+            path = os.path.join(args.out, f"family-{family_index}-member-{member}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(format_bulk_text(entries, persona, rng))
+            files += 1
+    print(f"✅ Wrote {files} diary files to {args.out}")
+
+
+def remove(args):
+    conn = _connect()
+    try:
+        print(f"✅ Removed {remove_seeded(conn, args.tag)} families tagged {args.tag}")
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_size_arguments(sub):
+        sub.add_argument("--families", type=int, default=10)
+        sub.add_argument("--members", type=int, default=4, help="profiles per family")
+        sub.add_argument("--years", type=float, default=2.0, help="length of each diary")
+        sub.add_argument("--seed", type=int, default=0)
+
+    load_parser = subparsers.add_parser("load", help="Write synthetic families into the database")
+    add_size_arguments(load_parser)
+    load_parser.add_argument("--mode", choices=["direct", "import"], default="direct")
+    load_parser.add_argument("--processes", type=int, default=max(1, min(4, os.cpu_count() or 1)))
+    load_parser.add_argument("--tag", help="run tag used for removal (default: random)")
+    load_parser.set_defaults(func=load)
+
+    dump_parser = subparsers.add_parser("dump", help="Write pasted-diary text files")
+    add_size_arguments(dump_parser)
+    dump_parser.add_argument("--out", required=True)
+    dump_parser.set_defaults(func=dump)
+
+    remove_parser = subparsers.add_parser("remove", help="Delete a tagged load")
+    remove_parser.add_argument("--tag", required=True)
+    remove_parser.set_defaults(func=remove)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
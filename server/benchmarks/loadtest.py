@@ -0,0 +1,360 @@
+# benchmarks/loadtest.py
+"""
+HTTP load test against a real gunicorn deployment of the app.
+
+    python -m benchmarks.loadtest [--rps 20] [--duration 60] [--concurrency 64]
+                                  [--workers 2] [--threads 4]
+                                  [--model-latency lognormal:800:0.5] [--model-error-rate 0.01]
+                                  [--mix create_entry=2,list_entries=3,weekly_summary=0.5]
+                                  [--families 5] [--members 3] [--days 180]
+                                  [--output results.json]
+
+Run from server/ with DATABASE_URL pointing at a local, migrated Postgres
+(never production: the run seeds and then deletes its own families). The
+harness starts benchmarks.fake_openai_server on a free port, boots gunicorn
+with OPENAI_BASE_URL pointing at it (or drives an already-running server
+given by --app-url, which must share JWT_SECRET_KEY and be configured
+against the fake server itself), and sends the weighted traffic mix
+open-loop at --rps: requests start on schedule whether or not earlier ones
+have finished, and latency is measured from the scheduled start, so a
+saturated server shows up as queueing time instead of a lower request rate.
+
+Compare runs with different --workers / --threads / --concurrency to size
+gunicorn and the database connection count without spending real tokens.
+"""
+
+import argparse
+import json
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+os.environ.setdefault("EMBEDDING_PROVIDER", "hashing")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from benchmarks.fake_openai_server import start_server
+from benchmarks.run import summarize, git_commit
+from benchmarks.seed import seed_families, remove_seeded
+from benchmarks.synthetic import make_persona, generate_diary
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REQUEST_TIMEOUT = 120
+
+
+# -- Traffic ------------------------------------------------------------------
+
+class LoadContext:
+    def __init__(self, base_url, tag, families, tokens):
+        self.base_url = base_url.rstrip("/")
+        self.tag = tag
+        self.families = families
+        self.tokens = tokens
+        self._lock = threading.Lock()
+        rng = random.Random(11)
+        self._diary = generate_diary(make_persona(rng), date(2000, 1, 1), 10 ** 6, rng)
+
+    def entry_text(self):
+        with self._lock:
+            return next(self._diary).text
+
+    def pick(self, rng):
+        """(family_id, user_id) of a random seeded profile"""
+        family = rng.choice(self.families)
+        return family["family_id"], rng.choice(family["user_ids"])
+
+    def request(self, method, path, family_id, body=None):
+        """Returns the HTTP status; connection failures count as status 0"""
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method, headers={
+            "Authorization": f"Bearer {self.tokens[family_id]}",
+            "Content-Type": "application/json",
+        })
+        try:
+            with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except (urllib.error.URLError, OSError):
+            return 0
+
+
+def op_create_entry(ctx, rng, i):
+    family_id, user_id = ctx.pick(rng)
+    return ctx.request("POST", "/api/entries", family_id, {
+        "user_id": user_id,
+        "date": (date.today() - timedelta(days=rng.randrange(30))).isoformat(),
+        "text": f"{ctx.entry_text()} (loadtest {ctx.tag} #{i})",
+    })
+
+
+def op_list_entries(ctx, rng, i):
+    family_id, user_id = ctx.pick(rng)
+    return ctx.request("GET", f"/api/entries?user_id={user_id}&limit=20", family_id)
+
+
+def op_all_entries(ctx, rng, i):
+    family_id, _ = ctx.pick(rng)
+    return ctx.request("GET", "/api/entries/all?page=1&page_size=20", family_id)
+
+
+def op_profiles(ctx, rng, i):
+    family_id, _ = ctx.pick(rng)
+    return ctx.request("GET", "/api/family/profiles", family_id)
+
+
+def op_calendar(ctx, rng, i):
+    family_id, user_id = ctx.pick(rng)
+    return ctx.request("GET", f"/api/entries/calendar?user_id={user_id}&month={date.today():%Y-%m}", family_id)
+
+
+def op_summary(ctx, rng, i):
+    family_id, user_id = ctx.pick(rng)
+    return ctx.request("GET", f"/api/analytics/summary?user_id={user_id}&days=30", family_id)
+
+
+def op_weekly_summary(ctx, rng, i):
+    family_id, user_id = ctx.pick(rng)
+    return ctx.request("GET", f"/api/analytics/weekly-summary?user_id={user_id}", family_id)
+
+
+OPERATIONS = OrderedDict([
+    ("create_entry", op_create_entry),
+    ("list_entries", op_list_entries),
+    ("all_entries", op_all_entries),
+    ("profiles", op_profiles),
+    ("calendar", op_calendar),
+    ("summary", op_summary),
+    ("weekly_summary", op_weekly_summary),
+])
+
+# Roughly what the app sees: mostly reads, some writes, few model-backed summaries
+DEFAULT_MIX = "create_entry=2,list_entries=3,all_entries=2,profiles=2,calendar=1,summary=1,weekly_summary=0.5"
+
+
+def parse_mix(spec):
+    """'name=weight,...' -> OrderedDict of positive weights for known operations"""
+    mix = OrderedDict()
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {name}")
+        mix[name] = float(weight) if weight else 1.0
+    mix = OrderedDict((name, weight) for name, weight in mix.items() if weight > 0)
+    if not mix:
+        raise ValueError("The traffic mix is empty")
+    return mix
+
+
+def schedule(rps, duration, mix, seed=0, poisson=True):
+    """
+    [(offset seconds, operation name), ...] for an open-loop run: `rps` on
+    average for `duration` seconds, exponential inter-arrival times unless
+    `poisson` is false, operations drawn by weight.
+    """
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    plan, offset = [], 0.0
+    while True:
+        offset = offset + rng.expovariate(rps) if poisson else (len(plan) + 1) / rps
+        if offset >= duration:
+            return plan
+        plan.append((offset, rng.choices(names, weights)[0]))
+
+
+def drive(ctx, plan, concurrency, seed=0):
+    """
+    Sends `plan` open-loop; returns ({name: [(latency ms, status)]}, wall seconds).
+    Latency runs from the scheduled start, so time spent waiting for a free
+    client slot counts against the server.
+    """
+    samples = {name: [] for _, name in plan}
+    lock = threading.Lock()
+    rngs = threading.local()
+
+    def send(index, name, scheduled):
+        if not hasattr(rngs, "rng"):
+            rngs.rng = random.Random(f"{seed}:{threading.get_ident()}")
+        status = OPERATIONS[name](ctx, rngs.rng, index)
+        with lock:
+            samples[name].append(((time.perf_counter() - scheduled) * 1000, status))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="loadtest") as pool:
+        for index, (offset, name) in enumerate(plan):
+            scheduled = started + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, index, name, scheduled)
+    return samples, time.perf_counter() - started
+
+
+def report(samples, wall_seconds):
+    results = OrderedDict()
+    every = []
+    for name, rows in samples.items():
+        errors = sum(1 for _, status in rows if status == 0 or status >= 400)
+        results[name] = summarize([latency for latency, _ in rows], errors)
+        results[name]["error_rate"] = round(errors / len(rows), 4) if rows else 0.0
+        every.extend(rows)
+    errors = sum(1 for _, status in every if status == 0 or status >= 400)
+    overall = summarize([latency for latency, _ in every], errors, wall_seconds)
+    overall["error_rate"] = round(errors / len(every), 4) if every else 0.0
+    statuses = {}
+    for _, status in every:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    overall["statuses"] = dict(sorted(statuses.items()))
+    results["overall"] = overall
+    return results
+
+
+# -- Runner -------------------------------------------------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def mint_tokens(secret, family_ids):
+    """Access tokens for the app under test, signed with its JWT_SECRET_KEY"""
+    from flask import Flask
+    from flask_jwt_extended import JWTManager, create_access_token
+
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = secret
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=12)
+    JWTManager(app)
+    with app.app_context():
+        return {family_id: create_access_token(identity=str(family_id)) for family_id in family_ids}
+
+
+def start_gunicorn(port, workers, threads, env):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "--workers", str(workers),
+         "--threads", str(threads), "--timeout", str(REQUEST_TIMEOUT), "app:app"],
+        cwd=SERVER_DIR, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=2):
+                return process
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.25)
+    process.terminate()
+    raise SystemExit("gunicorn did not become healthy within 60s")
+
+
+def print_report(results):
+    print(f"{'operation':<16}{'n':>7}{'err %':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<16}{result['iterations']:>7}{result['error_rate'] * 100:>8.2f}{result['p50_ms']:>10}"
+              f"{result['p90_ms']:>10}{result['p99_ms']:>10}{result['max_ms']:>10}")
+    overall = results["overall"]
+    print(f"Achieved {overall.get('throughput_rps')} req/s; statuses {overall['statuses']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=20.0, help="target request rate")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of traffic")
+    parser.add_argument("--concurrency", type=int, default=64, help="max requests in flight")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation=weight,...")
+    parser.add_argument("--uniform", action="store_true", help="evenly spaced arrivals instead of Poisson")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--app-url", help="drive this running server instead of starting gunicorn")
+    parser.add_argument("--model-latency", default="lognormal:800:0.5", help="fixed:MS, uniform:LO:HI or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--model-error-rate", type=float, default=0.0)
+    parser.add_argument("--families", type=int, default=5)
+    parser.add_argument("--members", type=int, default=3, help="profiles per family")
+    parser.add_argument("--days", type=int, default=180, help="days of seeded diary per profile")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--keep-data", action="store_true", help="leave the seeded families in the database")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    from utils.db_utils import get_db_connection
+
+    fake = start_server(latency=args.model_latency, error_rate=args.model_error_rate, seed=args.seed)
+    fake_url = f"http://127.0.0.1:{fake.server_port}/v1"
+    secret = os.getenv("JWT_SECRET_KEY") or secrets.token_hex(32)
+    gunicorn = None
+
+    conn = get_db_connection()
+    if not conn:
+        print("Database connection failed; set DATABASE_URL to a local Postgres", file=sys.stderr)
+        return 2
+
+    tag = uuid.uuid4().hex[:8]
+    try:
+        seeding_started = time.perf_counter()
+        families = seed_families(conn, tag, args.families, args.members, args.days, args.seed)
+        print(f"Seeded {args.families} families x {args.members} profiles x {args.days} days "
+              f"in {time.perf_counter() - seeding_started:.1f}s (tag {tag})")
+
+        if args.app_url:
+            base_url = args.app_url
+        else:
+            port = free_port()
+            gunicorn = start_gunicorn(port, args.workers, args.threads, {
+                **os.environ,
+                "OPENAI_BASE_URL": fake_url,
+                "OPENAI_API_KEY": "loadtest",
+                "JWT_SECRET_KEY": secret,
+                "QUERY_PROFILE_SAMPLE_RATE": "0",
+            })
+            base_url = f"http://127.0.0.1:{port}"
+        print(f"Driving {base_url} at {args.rps} req/s for {args.duration:g}s (model at {fake_url})")
+
+        ctx = LoadContext(base_url, tag, families, mint_tokens(secret, [f["family_id"] for f in families]))
+        plan = schedule(args.rps, args.duration, mix, args.seed, poisson=not args.uniform)
+        samples, wall_seconds = drive(ctx, plan, args.concurrency, args.seed)
+    finally:
+        if gunicorn:
+            gunicorn.terminate()
+            gunicorn.wait(timeout=30)
+        fake.shutdown()
+        if not args.keep_data:
+            remove_seeded(conn, tag)
+        conn.close()
+
+    results = report(samples, wall_seconds)
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "meta": {
+                    "timestamp": datetime.now().isoformat(timespec="seconds"),
+                    "git_commit": git_commit(),
+                    "settings": {key: value for key, value in vars(args).items() if key != "output"},
+                    "model": fake.state.snapshot(),
+                },
+                "operations": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
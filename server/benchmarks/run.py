@@ -0,0 +1,342 @@
+# benchmarks/run.py
+"""
+Offline benchmarks for the request hot paths.
+
+    python -m benchmarks.run [--families 2] [--members 3] [--days 90]
+                             [--iterations 30] [--model-latency-ms 50]
+                             [--index-entries 10000]
+                             [--only create_entry,weekly_summary]
+                             [--output results.json]
+                             [--compare baseline.json] [--max-regression 10]
+
+Run from server/ with DATABASE_URL pointing at a local, migrated Postgres
+(never production: the run writes and then deletes its own families). The
+OpenAI client is replaced by benchmarks.fake_model with a fixed latency, so
+model-bound paths measure our overhead on top of a known model time.
+similar_days runs in-process against a synthetic --index-entries embedding
+index (the similar-days lookup every extraction makes), without HTTP or the
+database.
+
+Each benchmark drives the real Flask app in-process through the test client
+and reports latency percentiles (ms), sequential throughput and errors. The
+JSON written to --output can be passed back as --compare on a later run,
+which prints p50/p99 changes and exits with status 1 when any benchmark got
+slower than --max-regression percent.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+# Quiet, deterministic app settings; must be set before the app is imported
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_PROVIDER", "hashing")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("QUERY_PROFILE_SAMPLE_RATE", "0")
+
+from benchmarks.fake_model import FakeModelClient
+from benchmarks.seed import seed_families, remove_seeded
+from benchmarks.synthetic import make_persona, generate_diary
+
+REGRESSION_METRICS = ("p50_ms", "p99_ms")
+
+
+# -- Statistics ---------------------------------------------------------------
+
+def percentile(sorted_values, q):
+    """Linear-interpolated percentile (q in 0..100) of an ascending list"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(samples_ms, errors=0, wall_seconds=None):
+    ordered = sorted(samples_ms)
+    total = len(ordered)
+    result = {
+        "iterations": total,
+        "errors": errors,
+        "mean_ms": round(sum(ordered) / total, 3) if total else None,
+        "min_ms": round(ordered[0], 3) if total else None,
+        "max_ms": round(ordered[-1], 3) if total else None,
+    }
+    for q in (50, 90, 99):
+        value = percentile(ordered, q)
+        result[f"p{q}_ms"] = round(value, 3) if value is not None else None
+    if wall_seconds:
+        result["throughput_rps"] = round(total / wall_seconds, 2)
+    return result
+
+
+def compare(baseline, current, max_regression_pct=10.0):
+    """p50/p99 changes of benchmarks present in both result files"""
+    rows = []
+    for name, result in current["benchmarks"].items():
+        before = baseline.get("benchmarks", {}).get(name)
+        if not before:
+            continue
+        for metric in REGRESSION_METRICS:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            rows.append({
+                "benchmark": name, "metric": metric, "baseline": old, "current": new,
+                "change_pct": round(change, 1), "regression": change > max_regression_pct
+            })
+    return rows
+
+
+# -- Benchmarks ---------------------------------------------------------------
+
+class BenchContext:
+    def __init__(self, client, tag, families, headers, import_entries, index_entries=10_000):
+        self.client = client
+        self.tag = tag
+        self.families = families
+        self.headers = headers
+        self.import_entries = import_entries
+        self.index_entries = index_entries
+        self._similarity_index = None
+        rng = random.Random(7)
+        self._diary = generate_diary(make_persona(rng), date(2000, 1, 1), 10 ** 6, rng)
+
+    def entry_text(self):
+        return next(self._diary).text
+
+    def family(self, i):
+        family = self.families[i % len(self.families)]
+        return family, self.headers[family["family_id"]]
+
+    def user(self, i):
+        family, headers = self.family(i)
+        return family["user_ids"][(i // len(self.families)) % len(family["user_ids"])], headers
+
+    def similarity_index(self):
+        """A user index of `index_entries` synthetic days, built on first use"""
+        if self._similarity_index is None:
+            from utils.embeddings import get_embedding_provider, pack_vector, unpack_vector
+            from utils.vector_index import UserVectorIndex, lsh_keys
+
+            provider = get_embedding_provider()
+            index = UserVectorIndex()
+            rng = random.Random(11)
+            diary = generate_diary(make_persona(rng), date(1990, 1, 1), self.index_entries, rng)
+            for entry_id, entry in enumerate(diary, start=1):
+                # Round-tripped through storage like vectors loaded from the database
+                vector = unpack_vector(pack_vector(provider.embed([entry.text])[0]))
+                index.add(entry_id, entry.entry_date, vector, lsh_keys(vector, provider.name))
+            self._similarity_index = (index, provider)
+        return self._similarity_index
+
+
+def bench_create_entry(ctx, i):
+    user_id, headers = ctx.user(i)
+    return ctx.client.post("/api/entries", headers=headers, json={
+        "user_id": user_id,
+        "date": (date.today() - timedelta(days=i % 30)).isoformat(),
+        "text": f"{ctx.entry_text()} (benchmark {ctx.tag} #{i})"
+    })
+
+
+def bench_get_all_entries(ctx, i):
+    _, headers = ctx.family(i)
+    return ctx.client.get("/api/entries/all?page=1&page_size=20", headers=headers)
+
+
+def bench_get_family_profiles(ctx, i):
+    _, headers = ctx.family(i)
+    return ctx.client.get("/api/family/profiles", headers=headers)
+
+
+def bench_analytics_summary(ctx, i):
+    user_id, headers = ctx.user(i)
+    return ctx.client.get(f"/api/analytics/summary?user_id={user_id}&days=30", headers=headers)
+
+
+def bench_analytics_trends(ctx, i):
+    user_id, headers = ctx.user(i)
+    return ctx.client.get(f"/api/analytics/trends?user_id={user_id}&weeks=4", headers=headers)
+
+
+def bench_weekly_summary(ctx, i):
+    user_id, headers = ctx.user(i)
+    return ctx.client.get(f"/api/analytics/weekly-summary?user_id={user_id}", headers=headers)
+
+
+def bench_similar_days(ctx, i):
+    from utils.ai_utils import TEMPORAL_SIMILAR_DAYS
+    from utils.embeddings import embed_text
+    from utils.vector_index import lsh_keys
+
+    index, provider = ctx.similarity_index()
+    vector = embed_text(f"{ctx.entry_text()} #{i}", provider)
+    index.query(vector, lsh_keys(vector, provider.name), k=TEMPORAL_SIMILAR_DAYS, before_date=date.today())
+
+
+def bench_bulk_import(ctx, i):
+    user_id, headers = ctx.user(i)
+    start = date.today() - timedelta(days=400 + i * ctx.import_entries)
+    text = "\n\n".join(
+        f"{(start + timedelta(days=day)).strftime('%B %d, %Y')}\n"
+        f"{ctx.entry_text()} (benchmark {ctx.tag} import {i}.{day})"
+        for day in range(ctx.import_entries)
+    )
+    return ctx.client.post("/api/entries/bulk-import/new", headers=headers, json={"user_id": user_id, "text": text})
+
+
+# name -> (function, share of --iterations); bulk imports are much longer requests
+BENCHMARKS = OrderedDict([
+    ("create_entry", (bench_create_entry, 1.0)),
+    ("get_all_entries", (bench_get_all_entries, 1.0)),
+    ("get_family_profiles", (bench_get_family_profiles, 1.0)),
+    ("analytics_summary", (bench_analytics_summary, 1.0)),
+    ("analytics_trends", (bench_analytics_trends, 1.0)),
+    ("weekly_summary", (bench_weekly_summary, 0.5)),
+    ("bulk_import", (bench_bulk_import, 0.2)),
+    ("similar_days", (bench_similar_days, 1.0)),
+])
+
+
+def run_benchmark(ctx, function, iterations, warmup):
+    for i in range(warmup):
+        function(ctx, -1 - i)
+    samples, errors = [], 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        request_started = time.perf_counter()
+        response = function(ctx, i)
+        samples.append((time.perf_counter() - request_started) * 1000)
+        # In-process benchmarks return None and fail by raising
+        if response is not None and response.status_code >= 400:
+            errors += 1
+    return summarize(samples, errors, time.perf_counter() - started)
+
+
+# -- Runner -------------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def install_fake_model(fake):
+    import utils.ai_utils
+    import routes.analytics_routes
+    utils.ai_utils.openai_client = fake
+    routes.analytics_routes.analytics_engine.openai_client = fake
+
+
+def print_results(results):
+    print(f"{'benchmark':<22}{'n':>5}{'err':>5}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    for name, result in results.items():
+        print(f"{name:<22}{result['iterations']:>5}{result['errors']:>5}{result['p50_ms']:>10}"
+              f"{result['p90_ms']:>10}{result['p99_ms']:>10}{result.get('throughput_rps', ''):>9}")
+
+
+def print_comparison(rows):
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['benchmark']:<22}{row['metric']:<8}{row['baseline']:>10} -> {row['current']:<10}"
+              f"{row['change_pct']:+.1f}%{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--families", type=int, default=2)
+    parser.add_argument("--members", type=int, default=3, help="profiles per family")
+    parser.add_argument("--days", type=int, default=90, help="days of seeded diary per profile")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--import-entries", type=int, default=20, help="entries per bulk import request")
+    parser.add_argument("--model-latency-ms", type=float, default=50.0)
+    parser.add_argument("--index-entries", type=int, default=10_000, help="entries in the similar_days index")
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="allowed p50/p99 slowdown in percent")
+    parser.add_argument("--keep-data", action="store_true", help="leave the seeded families in the database")
+    args = parser.parse_args(argv)
+
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    from app import create_app
+    from config import TestingConfig
+    from flask_jwt_extended import create_access_token
+    from utils.db_utils import get_db_connection
+
+    app = create_app(TestingConfig)
+    fake = FakeModelClient(args.model_latency_ms / 1000)
+    install_fake_model(fake)
+
+    tag = uuid.uuid4().hex[:8]
+    conn = get_db_connection()
+    if not conn:
+        print("Database connection failed; set DATABASE_URL to a local Postgres", file=sys.stderr)
+        return 2
+
+    try:
+        seeding_started = time.perf_counter()
+        families = seed_families(conn, tag, args.families, args.members, args.days)
+        print(f"Seeded {args.families} families x {args.members} profiles x {args.days} days "
+              f"in {time.perf_counter() - seeding_started:.1f}s (tag {tag})")
+
+        with app.app_context():
+            headers = {family["family_id"]: {"Authorization": f"Bearer {create_access_token(identity=str(family['family_id']))}"}
+                       for family in families}
+        ctx = BenchContext(app.test_client(), tag, families, headers, args.import_entries, args.index_entries)
+
+        results = OrderedDict()
+        for name in selected:
+            function, share = BENCHMARKS[name]
+            results[name] = run_benchmark(ctx, function, max(1, int(args.iterations * share)), args.warmup)
+    finally:
+        if not args.keep_data:
+            remove_seeded(conn, tag)
+        conn.close()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "model_calls": fake.calls,
+        },
+        "benchmarks": results,
+    }
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(json.load(f), report, args.max_regression)
+        print_comparison(rows)
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# benchmarks/seed.py
+"""
+Loads synthetic families (benchmarks.synthetic) into Postgres.
+
+Every family, profile and entry belongs to a run tag (family emails
+`bench-<tag>-<n>@example.com`), so a run can remove exactly what it created.
+
+Two bulk paths:
+  direct  execute_values inserts of entries and their ground-truth metrics;
+          the fast way to reach millions of rows
+  import  the diary is formatted as a pasted dump and goes through the real
+          parser, dedup and batched writer of utils.import_pipeline, with the
+          ground truth standing in for the model
+"""
+
+import io
+import random
+from datetime import date, timedelta
+from psycopg2.extras import execute_values
+from utils.ai_utils import summarize_extraction
+from utils.db_utils import json_param
+from utils.dedup_utils import compute_content_hash, DuplicateChecker
+from utils.import_pipeline import ImportPipeline
+from utils.import_utils import iter_bulk_entries
+from .synthetic import make_persona, generate_diary, format_bulk_text
+
+DIRECT_PAGE_SIZE = 1000
+AVATARS = ["👑", "👩", "👨", "👧", "👦", "👵", "👴"]
+
+
+def member_rng(seed, family_index, member):
+    """Independent, reproducible randomness per member (also across worker processes)"""
+    return random.Random(f"{seed}:{family_index}:{member}")
+
+
+def create_family(cursor, tag, family_index, members):
+    cursor.execute("""
+        INSERT INTO families (family_name, email, password_hash, created_at)
+        VALUES (%s, %s, %s, NOW()) RETURNING id
+    """, (f"Bench {family_index}", f"bench-{tag}-{family_index}@example.com", "benchmark"))
+    family_id = cursor.fetchone()['id']
+
+    rows = execute_values(cursor, """
+        INSERT INTO users (family_id, username, display_name, avatar, role, last_active)
+        VALUES %s RETURNING id
+    """, [
+        (family_id, f"bench-{tag}-{family_index}-{member}", f"Member {member}",
+         AVATARS[member % len(AVATARS)], "admin" if member == 0 else "user", None)
+        for member in range(members)
+    ], fetch=True)
+    return family_id, [row['id'] for row in rows]
+
+
+def load_direct(cursor, user_id, entries):
+    """Inserts SyntheticEntries with their metrics; returns the number stored"""
+    entries = list(entries)
+    if not entries:
+        return 0
+    raw_ids = execute_values(cursor, """
+        INSERT INTO raw_entries (user_id, entry_text, entry_date, content_hash, created_at)
+        VALUES %s RETURNING id
+    """, [
+        (user_id, entry.text, entry.entry_date, compute_content_hash(entry.text))
+        for entry in entries
+    ], template="(%s, %s, %s, %s, NOW())", page_size=DIRECT_PAGE_SIZE, fetch=True)
+
+    metric_fields = ("mood_score", "energy_level", "pain_level", "sleep_quality", "sleep_hours", "stress_level")
+    execute_values(cursor, """
+        INSERT INTO health_metrics (
+            user_id, raw_entry_id, entry_date, mood_score, energy_level, pain_level,
+            sleep_quality, sleep_hours, stress_level, ai_confidence, processing_version,
+            extraction_details, created_at
+        ) VALUES %s
+    """, [
+        (user_id, row['id'], entry.entry_date, *[entry.metrics[name] for name in metric_fields],
+         0.9, "synthetic", json_param(summarize_extraction(entry.as_extraction())))
+        for row, entry in zip(raw_ids, entries)
+    ], template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())", page_size=DIRECT_PAGE_SIZE)
+    return len(entries)
+
+
+def load_via_import(conn, user_id, entries, persona, rng, workers=4, write_batch_size=100):
+    """Runs the diary through the import pipeline; returns its ImportResult"""
+    entries = list(entries)
+    truth = {entry.entry_date: entry.as_extraction() for entry in entries}
+
+    def extract(text, user_id, entry_date, import_batch=None):
+        return truth.get(entry_date) or {"confidence": 0.0}
+
+    bulk_text = format_bulk_text(entries, persona, rng)
+    checker = DuplicateChecker(user_id)
+    try:
+        pipeline = ImportPipeline(conn, user_id, workers=workers, write_batch_size=write_batch_size,
+                                  dedup=checker, extract=extract)
+        return pipeline.run(iter_bulk_entries(io.StringIO(bulk_text)))
+    finally:
+        checker.close()
+
+
+def seed_family(conn, tag, family_index, members, days, seed=0, mode="direct", end=None):
+    """Creates one family with `days` days of diary per member (ending `end`)"""
+    end = end or date.today()
+    start = end - timedelta(days=days - 1)
+    cursor = conn.cursor()
+    family_id, user_ids = create_family(cursor, tag, family_index, members)
+    conn.commit()
+
+    stored = 0
+    for member, user_id in enumerate(user_ids):
+        rng = member_rng(seed, family_index, member)
+        persona = make_persona(rng)
+        diary = generate_diary(persona, start, days, rng)
+        if mode == "import":
+            stored += load_via_import(conn, user_id, diary, persona, rng).processed
+        else:
+            stored += load_direct(cursor, user_id, diary)
+            conn.commit()
+    return {"family_id": family_id, "user_ids": user_ids, "entries": stored}
+
+
+def seed_families(conn, tag, families=2, members=3, days=90, seed=0, mode="direct"):
+    """
+    Creates `families` families of `members` profiles with `days` days of
+    diary each (ending today). Returns [{"family_id", "user_ids", "entries"}, ...].
+    """
+    return [seed_family(conn, tag, index, members, days, seed, mode) for index in range(families)]
+
+
+def remove_seeded(conn, tag):
+    """Deletes every family of run `tag` with its profiles, entries and model usage"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM families WHERE email LIKE %s", (f"bench-{tag}-%@example.com",))
+    family_ids = [row['id'] for row in cursor.fetchall()]
+    if family_ids:
+        cursor.execute("SELECT id FROM users WHERE family_id = ANY(%s)", (family_ids,))
+        user_ids = [row['id'] for row in cursor.fetchall()]
+        cursor.execute("DELETE FROM health_metrics WHERE user_id = ANY(%s)", (user_ids,))
+        cursor.execute("DELETE FROM raw_entries WHERE user_id = ANY(%s)", (user_ids,))
+        cursor.execute("DELETE FROM model_usage WHERE family_id = ANY(%s)", (family_ids,))
+        cursor.execute("DELETE FROM users WHERE id = ANY(%s)", (user_ids,))
+        cursor.execute("DELETE FROM families WHERE id = ANY(%s)", (family_ids,))
+    conn.commit()
+    return len(family_ids)
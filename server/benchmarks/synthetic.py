@@ -0,0 +1,270 @@
+# benchmarks/synthetic.py
+"""
+Synthetic diaries for load and scale testing.
+
+Each generated family member gets a persona: baseline levels, how strongly
+stress carries over between days, how verbose and regular a diarist they
+are, their usual foods and activities, a preferred date heading, and one to
+three food or behaviour triggers with a lagged effect (e.g. pickles ->
+headache the next day). Daily metrics are correlated time series:
+
+    stress    AR(1) around the baseline, higher on weekdays and after work crunches
+    sleep     fewer hours and worse quality under stress
+    pain      AR(1) plus the delayed effects of triggers
+    energy    follows sleep, drops with pain
+    mood      follows energy, drops with stress and pain, small winter dip
+
+Entry text mentions what drives the numbers (foods eaten, the triggered
+symptom, sleep, work) in sentences of varied length, so the stored ground
+truth and the text agree. Nothing here touches the database; see
+benchmarks.seed for the loaders.
+"""
+
+import math
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List
+
+FOODS = [
+    "oatmeal", "toast", "eggs", "yogurt", "leftover rice", "pickles", "spicy chutney", "pasta", "curry",
+    "salad", "soup", "pizza", "sushi", "a burger", "dark chocolate", "cheese", "red wine", "green tea",
+    "coffee", "ice cream", "lentils", "grilled chicken", "fried noodles", "a smoothie", "bananas"
+]
+ACTIVITIES = [
+    "a long walk", "yoga", "a bike ride", "gardening", "swimming", "a run", "stretching", "reading",
+    "a board game night", "cleaning the house", "a gym session", "a hike"
+]
+SOCIAL = [
+    "Called mom in the evening.", "Had dinner with friends.", "The kids were loud all afternoon.",
+    "Quiet day at home, mostly on my own.", "Long chat with my sister.", "Argued with my partner about chores.",
+    "Neighbours came over for tea.", "Video call with the grandkids."
+]
+FILLER = [
+    "The weather was grey and damp.", "It was sunny and warm for once.", "Spent too long on my phone.",
+    "Watched a documentary before bed.", "Paid some bills.", "Traffic was terrible on the way home.",
+    "Tried a new recipe.", "Forgot to drink enough water.", "Took the dog to the vet.",
+    "Sorted out the garage.", "Read a few chapters of my book."
+]
+SYMPTOMS = ["headache", "migraine", "bloating", "stomach ache", "back pain", "stiff neck", "joint pain", "nausea"]
+BEHAVIOUR_TRIGGERS = ["a late work session", "skipping lunch", "a second coffee after 4pm", "a late night out"]
+MOOD_WORDS = {
+    1: ["miserable", "awful", "really low"], 3: ["down", "flat", "irritable"],
+    5: ["okay", "so-so", "a bit meh"], 7: ["good", "upbeat", "content"], 9: ["great", "fantastic", "really happy"]
+}
+
+# Date heading formats the bulk importer recognises
+DATE_FORMATS = [
+    "{month} {day}, {year}", "**{month} {day}, {year}**", "{mon} {day} {year}",
+    "{m:02d}/{d:02d}/{year}", "{year}-{m:02d}-{d:02d}", "{year}/{m}/{d}",
+]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August",
+          "September", "October", "November", "December"]
+
+
+def format_date_heading(entry_date, pattern):
+    month = MONTHS[entry_date.month - 1]
+    return pattern.format(month=month, mon=month[:3], day=entry_date.day, year=entry_date.year,
+                          m=entry_date.month, d=entry_date.day)
+
+
+@dataclass
+class Trigger:
+    cause: str          # a food or behaviour mentioned in the text
+    symptom: str
+    lag_days: int       # 0 = same day
+    pain_effect: float
+    probability: float  # chance the effect follows the cause
+    is_food: bool = True
+
+
+@dataclass
+class Persona:
+    mood: float
+    pain: float
+    stress: float
+    sleep_hours: float
+    carry_over: float           # AR(1) coefficient for stress and pain
+    verbosity: float            # mean sentence count
+    regularity: float           # chance of writing on a given day
+    usual_foods: List[str]
+    activities: List[str]
+    date_format: str
+    triggers: List[Trigger]
+
+
+@dataclass
+class SyntheticEntry:
+    entry_date: date
+    text: str
+    metrics: Dict[str, float]
+    foods: List[str] = field(default_factory=list)
+    activities: List[str] = field(default_factory=list)
+    symptoms: List[str] = field(default_factory=list)
+    triggers: List[str] = field(default_factory=list)
+
+    def as_extraction(self):
+        """The entry as an extraction result (what a perfect model would return)"""
+        return {
+            **self.metrics,
+            "symptoms": self.symptoms,
+            "food_intake": self.foods,
+            "activities": self.activities,
+            "triggers": self.triggers,
+            "medications": [],
+            "confidence": 0.9,
+            "processing_version": "synthetic",
+        }
+
+
+def make_persona(rng):
+    foods = rng.sample(FOODS, 10)
+    triggers = []
+    for _ in range(rng.randint(1, 3)):
+        if rng.random() < 0.75:
+            triggers.append(Trigger(rng.choice(foods), rng.choice(SYMPTOMS), rng.choice([0, 1, 1, 2]),
+                                    rng.uniform(1.5, 4.0), rng.uniform(0.5, 0.9)))
+        else:
+            triggers.append(Trigger(rng.choice(BEHAVIOUR_TRIGGERS), rng.choice(["headache", "migraine", "back pain"]),
+                                    1, rng.uniform(1.0, 3.0), rng.uniform(0.5, 0.8), is_food=False))
+    return Persona(
+        mood=rng.uniform(5.0, 8.0),
+        pain=rng.uniform(0.5, 3.5),
+        stress=rng.uniform(2.5, 6.5),
+        sleep_hours=rng.uniform(6.2, 8.2),
+        carry_over=rng.uniform(0.4, 0.85),
+        verbosity=rng.lognormvariate(1.5, 0.45),
+        regularity=rng.uniform(0.6, 0.98),
+        usual_foods=foods,
+        activities=rng.sample(ACTIVITIES, 4),
+        date_format=rng.choice(DATE_FORMATS),
+        triggers=triggers,
+    )
+
+
+def _clip(value, low, high):
+    return max(low, min(high, value))
+
+
+def _mood_word(rng, mood):
+    bucket = min(MOOD_WORDS, key=lambda level: abs(level - mood))
+    return rng.choice(MOOD_WORDS[bucket])
+
+
+def generate_diary(persona, start, days, rng):
+    """Yields one SyntheticEntry per written day from `start` for `days` days"""
+    stress = persona.stress
+    pain = persona.pain
+    pending = {}  # day offset -> [(symptom, pain effect, cause)]
+
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        weekday = day.weekday() < 5
+
+        # Causes happen whether or not the day gets written down
+        foods = rng.sample(persona.usual_foods[:6], rng.randint(2, 4))
+        if rng.random() < 0.3:
+            foods.append(rng.choice(persona.usual_foods[6:]))
+        behaviours = []
+        for trigger in persona.triggers:
+            if trigger.is_food:
+                if trigger.cause in foods and rng.random() < trigger.probability:
+                    pending.setdefault(offset + trigger.lag_days, []).append((trigger.symptom, trigger.pain_effect, trigger.cause))
+            elif rng.random() < (0.2 if weekday else 0.08):
+                behaviours.append(trigger.cause)
+                if rng.random() < trigger.probability:
+                    pending.setdefault(offset + trigger.lag_days, []).append((trigger.symptom, trigger.pain_effect, trigger.cause))
+
+        crunch = weekday and rng.random() < 0.1
+        stress = persona.stress + persona.carry_over * (stress - persona.stress) + rng.gauss(0, 0.8)
+        stress += (0.6 if weekday else -0.8) + (2.0 if crunch else 0.0)
+        stress = _clip(stress, 0, 10)
+
+        effects = pending.pop(offset, [])
+        pain = persona.pain + persona.carry_over * (pain - persona.pain) + rng.gauss(0, 0.5)
+        pain = _clip(pain + sum(effect for _, effect, _ in effects), 0, 10)
+
+        sleep_hours = _clip(persona.sleep_hours - 0.25 * (stress - persona.stress) + rng.gauss(0, 0.7), 3.0, 11.0)
+        sleep_quality = _clip(5.5 + 1.2 * (sleep_hours - 7) - 0.2 * (stress - 5) + rng.gauss(0, 1.0), 1, 10)
+        energy = _clip(5.5 + 0.8 * (sleep_hours - 7) + 0.3 * (sleep_quality - 5) - 0.3 * pain + rng.gauss(0, 0.8), 1, 10)
+        season = -0.4 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 15) / 365)
+        mood = _clip(persona.mood + 0.3 * (energy - 5.5) - 0.35 * (stress - persona.stress) - 0.3 * pain
+                     + season + rng.gauss(0, 0.7), 1, 10)
+
+        if rng.random() > persona.regularity:
+            continue
+
+        activities = [rng.choice(persona.activities)] if rng.random() < 0.5 else []
+        symptoms = sorted({symptom for symptom, _, _ in effects})
+        metrics = {
+            "mood_score": round(mood),
+            "energy_level": round(energy),
+            "pain_level": round(pain),
+            "sleep_quality": round(sleep_quality),
+            "sleep_hours": round(sleep_hours * 2) / 2,
+            "stress_level": round(stress),
+        }
+        text = _entry_text(rng, persona, metrics, foods, activities, behaviours, symptoms, crunch)
+        yield SyntheticEntry(day, text, metrics, foods, activities, symptoms,
+                             sorted({cause for _, _, cause in effects}))
+
+
+def _entry_text(rng, persona, metrics, foods, activities, behaviours, symptoms, crunch):
+    sentences = [f"Feeling {_mood_word(rng, metrics['mood_score'])} today."]
+    if len(foods) > 1:
+        sentences.append(f"Ate {', '.join(foods[:-1])} and {foods[-1]}.")
+    else:
+        sentences.append(f"Ate {foods[0]}.")
+    for symptom in symptoms:
+        sentences.append(rng.choice([
+            f"Woke up with a {symptom}.", f"Had a {symptom} most of the afternoon.",
+            f"The {symptom} came back in the evening.",
+        ]))
+    if not symptoms and metrics["pain_level"] >= 5:
+        sentences.append("Everything ached for no clear reason.")
+    for behaviour in behaviours:
+        sentences.append(f"Ended up with {behaviour}.")
+    if crunch:
+        sentences.append("Deadline crunch at work, very stressful.")
+    elif metrics["stress_level"] >= 7:
+        sentences.append("Felt stretched thin all day.")
+    for activity in activities:
+        sentences.append(f"Managed {activity}.")
+    sentences.append(f"Slept about {metrics['sleep_hours']:g} hours"
+                     + (", woke up a few times." if metrics["sleep_quality"] <= 4 else "."))
+    if metrics["energy_level"] <= 3:
+        sentences.append("Completely drained by evening.")
+
+    target = max(2, int(rng.gauss(persona.verbosity, persona.verbosity / 3)))
+    while len(sentences) < target:
+        sentences.append(rng.choice(SOCIAL + FILLER))
+
+    # Longer entries get paragraph breaks, which the importer joins back up
+    paragraphs, current = [], []
+    for sentence in sentences:
+        current.append(sentence)
+        if len(current) >= 4 and rng.random() < 0.4:
+            paragraphs.append(" ".join(current))
+            current = []
+    if current:
+        paragraphs.append(" ".join(current))
+    return "\n\n".join(paragraphs)
+
+
+def format_bulk_text(entries, persona, rng=None):
+    """
+    Entries as one diary dump in the persona's date format, parseable by
+    utils.import_utils.iter_bulk_entries. Some headings carry the first line
+    of the entry on the same line, and some use another format, as real
+    pasted diaries do.
+    """
+    rng = rng or random.Random(0)
+    sections = []
+    for entry in entries:
+        pattern = persona.date_format if rng.random() < 0.9 else rng.choice(DATE_FORMATS)
+        heading = format_date_heading(entry.entry_date, pattern)
+        if "**" not in pattern and rng.random() < 0.15:
+            sections.append(f"{heading} {entry.text}")
+        else:
+            sections.append(f"{heading}\n{entry.text}")
+    return "\n\n".join(sections) + "\n"
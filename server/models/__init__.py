@@ -1,3 +1,3 @@
-from .models import db, User, Family, RawEntry, HealthMetric
+from .models import db, User, Family, RawEntry, HealthMetric, EntryEmbedding, IdempotencyKey, ModelUsage, RateLimitBucket
 
-__all__ = ['db', 'User', 'Family', 'RawEntry', 'HealthMetric']
+__all__ = ['db', 'User', 'Family', 'RawEntry', 'HealthMetric', 'EntryEmbedding', 'IdempotencyKey', 'ModelUsage', 'RateLimitBucket']
@@ -1,6 +1,6 @@
 from extensions import db
 from datetime import datetime
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR, ARRAY
 
 class Family(db.Model):
     __tablename__ = 'families'
@@ -11,6 +11,7 @@ class Family(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    data_version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')  # bumped on writes, feeds ETags
 
     # One-to-many: Family -> Users
     users = db.relationship('User', backref='family', lazy=True)
@@ -30,6 +31,7 @@ class User(db.Model):
     role = db.Column(db.String(20), default='user')  # 'user' or 'admin'
     last_active = db.Column(db.DateTime)
     display_name = db.Column(db.String(100))
+    data_version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')  # bumped on writes, feeds ETags
 
     # One-to-many: User -> RawEntries
     raw_entries = db.relationship('RawEntry', backref='user', lazy=True)
@@ -42,8 +44,20 @@ class RawEntry(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     entry_text = db.Column(db.Text)
     entry_date = db.Column(db.Date)
+    content_hash = db.Column(db.String(64))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
+    search_vector = db.Column(
+        TSVECTOR,
+        db.Computed("to_tsvector('english', coalesce(entry_text, ''))", persisted=True)
+    )
+
+    __table_args__ = (
+        db.Index('ix_raw_entries_user_content_hash', 'user_id', 'content_hash', 'entry_date', unique=True),
+        db.Index('ix_raw_entries_user_entry_date', 'user_id', 'entry_date'),
+        db.Index('ix_raw_entries_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('ix_raw_entries_entry_text_trgm', 'entry_text', postgresql_using='gin',
+                 postgresql_ops={'entry_text': 'gin_trgm_ops'}),
+    )
 
     # One-to-one: RawEntry -> HealthMetric
     health_metric = db.relationship('HealthMetric', uselist=False, backref='raw_entry')
@@ -67,4 +81,75 @@ class HealthMetric(db.Model):
     wake_time = db.Column(db.Time)
     ai_confidence = db.Column(db.Float)
     processing_version = db.Column(db.String(50))
+    extraction_details = db.Column(JSONB)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class EntryEmbedding(db.Model):
+    __tablename__ = 'entry_embeddings'
+
+    raw_entry_id = db.Column(db.Integer, db.ForeignKey('raw_entries.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    entry_date = db.Column(db.Date)
+    provider = db.Column(db.String(50), nullable=False)  # e.g. 'hashing-v1-256'
+    dim = db.Column(db.Integer, nullable=False)
+    vector = db.Column(db.LargeBinary, nullable=False)  # float16 little-endian
+    lsh_keys = db.Column(ARRAY(db.Integer), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_entry_embeddings_user_provider', 'user_id', 'provider'),
+    )
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+
+    id = db.Column(db.Integer, primary_key=True)
+    family_id = db.Column(db.Integer, db.ForeignKey('families.id', ondelete='CASCADE'), nullable=False)
+    idempotency_key = db.Column(db.String(255), nullable=False)
+    request_fingerprint = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='in_progress')  # 'in_progress' or 'completed'
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(JSONB)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    heartbeat_at = db.Column(db.DateTime)  # refreshed while the request runs
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('family_id', 'idempotency_key', name='uq_idempotency_keys_family_key'),
+        db.Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+
+class ModelUsage(db.Model):
+    """One model call; append-only, written in batches by utils.model_usage"""
+    __tablename__ = 'model_usage'
+
+    # No foreign keys: the log outlives deleted profiles and never blocks a batch insert
+    id = db.Column(db.BigInteger, primary_key=True)
+    family_id = db.Column(db.Integer)
+    user_id = db.Column(db.Integer)
+    call_site = db.Column(db.String(50), nullable=False)  # categorization, extraction, trigger_analysis, synthesis
+    model = db.Column(db.String(100))
+    source = db.Column(db.String(255), nullable=False)  # request route or 'background'
+    prompt_tokens = db.Column(db.Integer)
+    completion_tokens = db.Column(db.Integer)
+    latency_ms = db.Column(db.Float, nullable=False)
+    outcome = db.Column(db.String(20), nullable=False)  # 'ok' or 'error'
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    usage_date = db.Column(db.Date, db.Computed("(created_at::date)", persisted=True))  # UTC day
+
+    __table_args__ = (
+        db.Index('ix_model_usage_family_usage_date', 'family_id', 'usage_date'),
+        db.Index('ix_model_usage_usage_date', 'usage_date'),
+    )
+
+
+class RateLimitBucket(db.Model):
+    """Shared token bucket state for RATE_LIMIT_BACKEND=postgres (utils.rate_limit)"""
+    __tablename__ = 'rate_limit_buckets'
+
+    bucket_key = db.Column(db.String(100), primary_key=True)  # 'global' or 'family:<id>'
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False)
@@ -2,18 +2,30 @@
 
 from .prompts import (
     ENTRY_CATEGORIZATION_PROMPT_TEMPLATE,
-    ADAPTIVE_PROMPT_HEADER_TEMPLATE,
+    EXTRACTION_ROLE_HEADER,
+    EXTRACTION_CONTEXT_TEMPLATE,
     TEMPORAL_ANALYSIS_GUIDELINES,
     STANDARD_EXTRACTION_FORMAT,
     TEMPORAL_STRUCTURE_BLOCK,
-    SCORING_GUIDELINES
+    SCORING_GUIDELINES,
+    PROMPT_VERSION
+)
+from .assembly import (
+    THEME_FLAGS,
+    build_extraction_prompt,
+    warm_prompt_cache
 )
 
 __all__ = [
     "ENTRY_CATEGORIZATION_PROMPT_TEMPLATE",
-    "ADAPTIVE_PROMPT_HEADER_TEMPLATE",
+    "EXTRACTION_ROLE_HEADER",
+    "EXTRACTION_CONTEXT_TEMPLATE",
     "TEMPORAL_ANALYSIS_GUIDELINES",
     "STANDARD_EXTRACTION_FORMAT",
     "TEMPORAL_STRUCTURE_BLOCK",
-    "SCORING_GUIDELINES"
-]
\ No newline at end of file
+    "SCORING_GUIDELINES",
+    "PROMPT_VERSION",
+    "THEME_FLAGS",
+    "build_extraction_prompt",
+    "warm_prompt_cache"
+]
@@ -0,0 +1,94 @@
+# prompts/assembly.py
+"""
+Single implementation of adaptive extraction prompt assembly.
+
+The instruction part of the prompt depends only on which of the seven theme
+flags are set, so each of the 2^7 combinations is assembled once and cached as
+an immutable prefix. Entry-specific content (temporal context, diary text) is
+appended last, which keeps the long static prefix byte-identical across calls
+and lets provider-side prompt caching hit.
+"""
+
+from functools import lru_cache
+from .prompts import (
+    EXTRACTION_ROLE_HEADER,
+    FOOD_ANALYSIS_INSTRUCTIONS,
+    SOCIAL_ANALYSIS_INSTRUCTIONS,
+    SYMPTOM_ANALYSIS_INSTRUCTIONS,
+    SLEEP_ANALYSIS_INSTRUCTIONS,
+    STRESS_MOOD_ANALYSIS_INSTRUCTIONS,
+    TEMPORAL_ANALYSIS_GUIDELINES,
+    STANDARD_EXTRACTION_FORMAT,
+    FOOD_OUTPUT_SECTION,
+    SOCIAL_OUTPUT_SECTION,
+    SYMPTOM_OUTPUT_SECTION,
+    SLEEP_OUTPUT_SECTION,
+    TEMPORAL_STRUCTURE_BLOCK,
+    SCORING_GUIDELINES,
+    ENHANCED_ANALYSIS_GUIDELINES,
+    EXTRACTION_CONTEXT_TEMPLATE
+)
+
+THEME_FLAGS = (
+    "food_focused",
+    "relationship_focused",
+    "physical_symptoms",
+    "sleep_focused",
+    "work_stress",
+    "exercise_activity",
+    "mood_emotions"
+)
+
+
+def theme_key(themes):
+    """Normalizes a primary_themes dict into a hashable tuple of flags"""
+    themes = themes or {}
+    return tuple(bool(themes.get(flag)) for flag in THEME_FLAGS)
+
+
+@lru_cache(maxsize=2 ** len(THEME_FLAGS))
+def get_static_prefix(key):
+    """Instruction prefix for one theme combination (cached, built once)"""
+    flags = dict(zip(THEME_FLAGS, key))
+
+    instructions = [EXTRACTION_ROLE_HEADER]
+    output_sections = []
+
+    if flags["food_focused"]:
+        instructions.append(FOOD_ANALYSIS_INSTRUCTIONS)
+        output_sections.append(FOOD_OUTPUT_SECTION)
+    if flags["relationship_focused"]:
+        instructions.append(SOCIAL_ANALYSIS_INSTRUCTIONS)
+        output_sections.append(SOCIAL_OUTPUT_SECTION)
+    if flags["physical_symptoms"]:
+        instructions.append(SYMPTOM_ANALYSIS_INSTRUCTIONS)
+        output_sections.append(SYMPTOM_OUTPUT_SECTION)
+    if flags["sleep_focused"]:
+        instructions.append(SLEEP_ANALYSIS_INSTRUCTIONS)
+        output_sections.append(SLEEP_OUTPUT_SECTION)
+    if flags["work_stress"] or flags["mood_emotions"]:
+        instructions.append(STRESS_MOOD_ANALYSIS_INSTRUCTIONS)
+    output_sections.append(TEMPORAL_STRUCTURE_BLOCK)
+
+    template = "".join(instructions) \
+        + TEMPORAL_ANALYSIS_GUIDELINES \
+        + STANDARD_EXTRACTION_FORMAT + "," + ",".join(output_sections) + "\n}}\n" \
+        + SCORING_GUIDELINES \
+        + ENHANCED_ANALYSIS_GUIDELINES
+
+    # Templates escape literal braces for str.format(); resolve them once here
+    return template.format()
+
+
+def warm_prompt_cache():
+    """Assembles all 2^7 prefixes up front (e.g. at worker start)"""
+    for i in range(2 ** len(THEME_FLAGS)):
+        get_static_prefix(tuple(bool(i & (1 << bit)) for bit in range(len(THEME_FLAGS))))
+
+
+def build_extraction_prompt(diary_text, themes, temporal_context_text):
+    """Cached static prefix followed by the entry-specific tail"""
+    return get_static_prefix(theme_key(themes)) + EXTRACTION_CONTEXT_TEMPLATE.format(
+        temporal_context=temporal_context_text,
+        diary_text=diary_text
+    )
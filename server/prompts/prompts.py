@@ -1,16 +1,19 @@
 # prompts.py
+#
+# Templates are ordered static-first: everything that does not depend on the
+# entry comes before the diary text and temporal context, so provider-side
+# prompt caching can reuse the shared prefix. Literal braces are doubled because
+# every template goes through str.format() once during assembly.
 
 ### CATEGORIZATION PROMPT TEMPLATE ###
-ENTRY_CATEGORIZATION_PROMPT_TEMPLATE = """Analyze this diary entry and determine its primary focus areas.
-
-DIARY ENTRY: "{diary_text}"
+ENTRY_CATEGORIZATION_PROMPT_TEMPLATE = """Analyze the diary entry below and determine its primary focus areas.
 
 Categorize the main themes (mark as true/false):
 Return ONLY JSON:
 {{
   "primary_themes": {{
     "food_focused": [true if significant food/eating content],
-    "relationship_focused": [true if family/social interactions prominent],  
+    "relationship_focused": [true if family/social interactions prominent],
     "physical_symptoms": [true if pain/illness prominent],
     "sleep_focused": [true if sleep quality/patterns discussed],
     "work_stress": [true if work/professional stress mentioned],
@@ -19,23 +22,83 @@ Return ONLY JSON:
   }},
   "complexity_level": ["simple", "moderate", "complex"],
   "analysis_depth_needed": ["basic", "enhanced", "comprehensive"]
-}}"""
+}}
+
+DIARY ENTRY: "{diary_text}"
+"""
+
+### ADAPTIVE PROMPT STATIC HEADER ###
+EXTRACTION_ROLE_HEADER = """You are an advanced health data extraction specialist with expertise in temporal health patterns, delayed health effects, and context-aware analysis.
+
+ADAPTIVE ANALYSIS INSTRUCTIONS:
+Based on the entry content, you will provide enhanced analysis for relevant categories.
+Look for both immediate patterns and delayed effects from previous days.
+The temporal context and the diary entry to analyze are given at the end of these instructions.
+"""
+
+### THEME-SPECIFIC ANALYSIS INSTRUCTIONS ###
+FOOD_ANALYSIS_INSTRUCTIONS = """
+🍽️ ENHANCED FOOD ANALYSIS (entry contains significant food content):
+- Categorize foods by macronutrients (proteins, carbohydrates, fats) without cultural bias
+- Note cooking methods and preparation complexity
+- Identify meal timing patterns and frequency
+- Look for food-symptom timing correlations (especially 3-8 hour delays)
+- Compare with recent eating patterns from temporal context
+- Assess food variety vs repetition patterns
+- Consider cultural cuisine patterns naturally emerging from text
+"""
+
+SOCIAL_ANALYSIS_INSTRUCTIONS = """
+👥 ENHANCED SOCIAL ANALYSIS (entry contains significant social content):
+- Analyze family dynamics and interpersonal stress patterns
+- Identify social support vs conflict indicators
+- Note impact of social interactions on mood/stress levels
+- Track social meal contexts and their emotional effects
+- Consider cumulative social stress from previous days
+"""
+
+SYMPTOM_ANALYSIS_INSTRUCTIONS = """
+🩺 ENHANCED SYMPTOM ANALYSIS (entry contains significant physical symptoms):
+- Track symptom timing relative to activities and food consumption
+- Correlate current symptoms with activities from previous days
+- Note pain patterns and potential delayed triggers
+- Identify cumulative physical strain indicators
+- Look for symptom progression or improvement patterns
+"""
+
+SLEEP_ANALYSIS_INSTRUCTIONS = """
+😴 ENHANCED SLEEP ANALYSIS (entry discusses sleep patterns):
+- Analyze sleep quality indicators and duration patterns
+- Correlate sleep with previous day's activities, stress, or food
+- Identify factors affecting sleep quality from temporal context
+- Track sleep consistency and its impact on next-day energy
+"""
+
+STRESS_MOOD_ANALYSIS_INSTRUCTIONS = """
+🧠 ENHANCED STRESS/MOOD ANALYSIS (entry contains stress or emotional content):
+- Analyze stress triggers and emotional response patterns
+- Track mood progression and stress accumulation over time
+- Identify coping mechanisms and their effectiveness
+- Correlate emotional states with physical symptoms or food choices
+"""
 
 ### BASE TEMPORAL ANALYSIS INSTRUCTIONS ###
 TEMPORAL_ANALYSIS_GUIDELINES = """
 TEMPORAL ANALYSIS GUIDELINES:
 - Look for delayed effects: food/activities from yesterday affecting today's symptoms
-- Consider timing: evening activities affecting next morning symptoms  
+- Consider timing: evening activities affecting next morning symptoms
 - Track cumulative effects: repeated exposures building up over days
 - Identify trigger patterns: specific foods/activities consistently followed by symptoms
 """
 
 ### STANDARD JSON RESPONSE FORMAT ###
+# Left open: theme sections and the temporal block are appended before the
+# closing brace during assembly.
 STANDARD_EXTRACTION_FORMAT = """
 Extract and return ONLY valid JSON in this exact format:
 {{
   "mood_score": [1-10 number or null],
-  "energy_level": [1-10 number or null], 
+  "energy_level": [1-10 number or null],
   "pain_level": [0-10 number or null],
   "sleep_quality": [1-10 number or null],
   "sleep_hours": [number of hours or null],
@@ -47,27 +110,65 @@ Extract and return ONLY valid JSON in this exact format:
   "triggers": [array of potential trigger strings or empty array],
   "medications": [array of strings or empty array],
   "locations": [array of strings or empty array],
-  "confidence": [0.0-1.0 number indicating extraction confidence]
-}}
-"""
+  "confidence": [0.0-1.0 number indicating extraction confidence]"""
+
+### THEME-SPECIFIC JSON SECTIONS ###
+FOOD_OUTPUT_SECTION = """
+  "enhanced_food_analysis": {{
+    "macronutrient_breakdown": {{
+      "proteins": [specific protein sources identified],
+      "carbohydrates": [carbohydrate sources],
+      "fats": [fat sources including oils, ghee, nuts]
+    }},
+    "cooking_complexity": "simple/moderate/complex",
+    "meal_timing": {{"breakfast": "time", "lunch": "time", "dinner": "time", "snacks": "times"}},
+    "preparation_methods": [cooking methods like fried, steamed, roasted],
+    "food_variety_today": [unique foods vs repeated from recent days],
+    "potential_delayed_effects": [foods that might cause delayed symptoms based on temporal context]
+  }}"""
+
+SOCIAL_OUTPUT_SECTION = """
+  "enhanced_social_analysis": {{
+    "relationship_dynamics": "description of family/social interactions quality",
+    "social_stress_level": [1-10 rating of social stress intensity],
+    "support_vs_conflict": "supportive/neutral/conflicted",
+    "social_meal_context": "description if meals involved social dynamics",
+    "family_appreciation_level": "description of recognition/criticism patterns"
+  }}"""
+
+SYMPTOM_OUTPUT_SECTION = """
+  "enhanced_symptom_analysis": {{
+    "symptom_timing": "when symptoms occurred relative to activities",
+    "potential_delayed_triggers": [activities/foods from previous days that may have caused current symptoms],
+    "symptom_severity_trend": "improving/stable/worsening compared to recent days",
+    "cumulative_strain_indicators": [signs of building physical stress],
+    "pain_location_specificity": [specific body areas affected]
+  }}"""
+
+SLEEP_OUTPUT_SECTION = """
+  "enhanced_sleep_analysis": {{
+    "sleep_factors": [factors mentioned that affected sleep quality],
+    "sleep_consistency": "regular/irregular compared to recent pattern",
+    "next_day_energy_correlation": "how sleep affected today's energy levels",
+    "sleep_environment_factors": [bedroom conditions, noise, temperature etc]
+  }}"""
 
 ### TEMPORAL STRUCTURE BLOCK ###
 TEMPORAL_STRUCTURE_BLOCK = """
-"temporal_analysis": {{
-  "delayed_food_effects": [
-    {{"food": "specific food", "consumed_when": "yesterday evening/this morning", "potential_symptom": "current symptom", "confidence": "low/medium/high"}}
-  ],
-  "cumulative_stress_effects": [
-    {{"stressor": "ongoing situation", "building_since": "timeframe", "current_impact": "how it affects today"}}
-  ],
-  "pattern_recognition": {{
-    "repeated_food_symptom_pattern": "description of any recurring food-symptom timing patterns",
-    "behavioral_health_pattern": "recurring activity-health outcome patterns",
-    "trigger_confidence_level": "low/medium/high based on pattern consistency across days"
-  }},
-  "recovery_indicators": [signs of improvement or positive changes from previous days]
-}}
-"""
+  "temporal_analysis": {{
+    "delayed_food_effects": [
+      {{"food": "specific food", "consumed_when": "yesterday evening/this morning", "potential_symptom": "current symptom", "confidence": "low/medium/high"}}
+    ],
+    "cumulative_stress_effects": [
+      {{"stressor": "ongoing situation", "building_since": "timeframe", "current_impact": "how it affects today"}}
+    ],
+    "pattern_recognition": {{
+      "repeated_food_symptom_pattern": "description of any recurring food-symptom timing patterns",
+      "behavioral_health_pattern": "recurring activity-health outcome patterns",
+      "trigger_confidence_level": "low/medium/high based on pattern consistency across days"
+    }},
+    "recovery_indicators": [signs of improvement or positive changes from previous days]
+  }}"""
 
 ### SCORING GUIDELINES (used in both prompts and tooltips) ###
 SCORING_GUIDELINES = """
@@ -80,16 +181,40 @@ CRITICAL SCORING GUIDELINES:
 - stress_level: 0=completely relaxed/no stress, 5=normal stress, 10=extremely stressed
 """
 
-### ADAPTIVE PROMPT BASE HEADER ###
-ADAPTIVE_PROMPT_HEADER_TEMPLATE = """You are an advanced health data extraction specialist with expertise in temporal health patterns, delayed health effects, and context-aware analysis.
+ENHANCED_ANALYSIS_GUIDELINES = """
+ENHANCED ANALYSIS GUIDELINES:
+- Only provide enhanced analysis for categories relevant to this specific entry
+- Use culture-neutral food analysis - let cuisine patterns emerge naturally
+- Focus on timing relationships and delayed correlations
+- Consider cumulative effects and daily routine impacts
+- Look for patterns across multiple days, not just today
+- Identify both positive and negative health patterns
+
+If information is not mentioned or unclear, use null for numbers and empty arrays for lists.
+"""
 
+### VARIABLE TAIL (always last) ###
+EXTRACTION_CONTEXT_TEMPLATE = """
 TEMPORAL CONTEXT (for identifying delayed effects):
 {temporal_context}
 
 CURRENT DIARY ENTRY TO ANALYZE: "{diary_text}"
-
-ADAPTIVE ANALYSIS INSTRUCTIONS:
-Based on the entry content, you will provide enhanced analysis for relevant categories.
-Look for both immediate patterns and delayed effects from previous days.
 """
 
+
+### PROMPT VERSION ###
+# Short hash over every template in this module. It changes whenever any prompt
+# text changes and is stored as health_metrics.processing_version, so entries
+# scored by older prompts can be found and re-extracted.
+def _compute_prompt_version(namespace):
+    import hashlib
+    templates = sorted((name, value) for name, value in namespace.items()
+                       if name.isupper() and isinstance(value, str))
+    digest = hashlib.sha256()
+    for name, value in templates:
+        digest.update(name.encode("utf-8"))
+        digest.update(value.encode("utf-8"))
+    return "p-" + digest.hexdigest()[:12]
+
+
+PROMPT_VERSION = _compute_prompt_version(globals())
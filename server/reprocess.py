@@ -0,0 +1,285 @@
+# reprocess.py
+"""
+Offline reprocessing of historical entries through a batch provider.
+
+    python reprocess.py plan
+    python reprocess.py submit --stale --limit 5000 [--per-user-limit 200]
+    python reprocess.py submit --from-version unversioned [--provider local]
+    python reprocess.py advance <job_id>
+    python reprocess.py status <job_id>
+    python reprocess.py retry <job_id>
+    python reprocess.py embed [--user-id 3]
+
+`plan` reports how many entries per user are on stale prompt versions.
+`submit` snapshots the matching entries and submits the categorization batch;
+with --stale it takes the most recent stale entries first, so a prompt change
+can be rolled out in scheduled slices.
+`advance` moves a job forward once its current batch has completed: it turns
+categorization results into the extraction batch, and applies extraction
+results to health_metrics in bulk. Run it (e.g. from cron) until the job is done
+or failed.
+`retry` submits a new job for the entries of a finished job that got no
+result: those whose extraction result failed or was unusable, or every entry
+when a batch of the job failed.
+`embed` backfills similarity-search embeddings for entries that have none
+from the configured embedding provider.
+"""
+
+import argparse
+import json
+import os
+import sys
+import uuid
+from datetime import date, datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.batch_utils import (
+    OpenAIBatchProvider,
+    LocalFileBatchProvider,
+    PHASE_CATEGORIZE,
+    PHASE_EXTRACT,
+    build_categorization_batch,
+    build_extraction_batch,
+    write_batch_file,
+    parse_batch_results,
+    fetch_entries_for_version,
+    apply_extraction_results
+)
+from utils.vector_index import backfill_embeddings
+from utils.recompute_planner import get_stale_version_report, plan_recompute
+from prompts import PROMPT_VERSION
+
+DEFAULT_WORK_DIR = os.getenv('REPROCESS_WORK_DIR', 'reprocess_jobs')
+UNVERSIONED = "unversioned"
+TERMINAL_PHASES = ("done", "failed")
+
+
+def get_provider(name, work_dir):
+    if name == "local":
+        return LocalFileBatchProvider(os.path.join(work_dir, "_local_batches"))
+    return OpenAIBatchProvider()
+
+
+def job_dir(work_dir, job_id):
+    return os.path.join(work_dir, job_id)
+
+
+def load_manifest(work_dir, job_id):
+    with open(os.path.join(job_dir(work_dir, job_id), "manifest.json")) as f:
+        return json.load(f)
+
+
+def save_manifest(work_dir, manifest):
+    manifest["updated_at"] = datetime.now().isoformat()
+    with open(os.path.join(job_dir(work_dir, manifest["job_id"]), "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_entries(work_dir, job_id):
+    entries = []
+    with open(os.path.join(job_dir(work_dir, job_id), "entries.jsonl")) as f:
+        for line in f:
+            entry = json.loads(line)
+            entry["entry_date"] = date.fromisoformat(entry["entry_date"]) if entry["entry_date"] else None
+            entries.append(entry)
+    return entries
+
+
+def pending_entry_ids(work_dir):
+    """Entry ids already snapshotted by jobs that have not finished"""
+    pending = set()
+    if not os.path.isdir(work_dir):
+        return pending
+    for job_id in os.listdir(work_dir):
+        manifest_path = os.path.join(work_dir, job_id, "manifest.json")
+        if not os.path.exists(manifest_path):
+            continue
+        if load_manifest(work_dir, job_id)["phase"] in TERMINAL_PHASES:
+            continue
+        pending.update(entry["raw_entry_id"] for entry in load_entries(work_dir, job_id))
+    return pending
+
+
+def submit_job(args):
+    if args.stale:
+        from_version = None
+        entries = plan_recompute(
+            args.limit or 1000,
+            current_version=args.to_version,
+            user_id=args.user_id,
+            per_user_limit=args.per_user_limit,
+            exclude_ids=pending_entry_ids(args.work_dir)
+        )
+    else:
+        from_version = None if args.from_version == UNVERSIONED else args.from_version
+        entries = fetch_entries_for_version(from_version, user_id=args.user_id, limit=args.limit)
+    if not entries:
+        print("Nothing to reprocess")
+        return None
+    return create_job(args.work_dir, args.provider, entries,
+                      "stale" if args.stale else from_version, args.to_version)
+
+
+def create_job(work_dir, provider_name, entries, from_version, to_version, retry_of=None):
+    """Snapshots `entries` into a new job directory and submits its categorization batch"""
+    job_id = f"job-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    path = job_dir(work_dir, job_id)
+    os.makedirs(path)
+
+    with open(os.path.join(path, "entries.jsonl"), "w") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, default=str) + "\n")
+
+    provider = get_provider(provider_name, work_dir)
+    input_path = write_batch_file(os.path.join(path, f"{PHASE_CATEGORIZE}.jsonl"), build_categorization_batch(entries))
+    batch_id = provider.submit(input_path, description=f"{job_id} {PHASE_CATEGORIZE}")
+
+    manifest = {
+        "job_id": job_id,
+        "provider": provider_name,
+        "from_version": from_version,
+        "to_version": to_version,
+        "entry_count": len(entries),
+        "phase": PHASE_CATEGORIZE,
+        "batches": {PHASE_CATEGORIZE: batch_id},
+        "applied": 0,
+        "created_at": datetime.now().isoformat()
+    }
+    if retry_of:
+        manifest["retry_of"] = retry_of
+    save_manifest(work_dir, manifest)
+    print(f"✅ Submitted {job_id}: {len(entries)} entries, categorization batch {batch_id}")
+    return job_id
+
+
+def advance_job(args):
+    manifest = load_manifest(args.work_dir, args.job_id)
+    if manifest["phase"] in TERMINAL_PHASES:
+        print(f"{args.job_id} is already {manifest['phase']} ({manifest['applied']} entries applied)")
+        return manifest
+
+    provider = get_provider(manifest["provider"], args.work_dir)
+    batch_id = manifest["batches"][manifest["phase"]]
+    status = provider.get_status(batch_id)
+    if status != "completed":
+        print(f"{args.job_id}: {manifest['phase']} batch {batch_id} is {status}")
+        if status == "failed":
+            manifest["phase"] = "failed"
+            save_manifest(args.work_dir, manifest)
+        return manifest
+
+    entries = load_entries(args.work_dir, args.job_id)
+    results = parse_batch_results(provider.fetch_results(batch_id))
+
+    if manifest["phase"] == PHASE_CATEGORIZE:
+        path = job_dir(args.work_dir, args.job_id)
+        input_path = write_batch_file(
+            os.path.join(path, f"{PHASE_EXTRACT}.jsonl"),
+            build_extraction_batch(entries, results)
+        )
+        manifest["batches"][PHASE_EXTRACT] = provider.submit(input_path, description=f"{args.job_id} {PHASE_EXTRACT}")
+        manifest["phase"] = PHASE_EXTRACT
+        print(f"✅ {args.job_id}: categorized {len(results)}/{len(entries)}, extraction batch submitted")
+    else:
+        manifest["applied"] = apply_extraction_results(entries, results, manifest["to_version"])
+        manifest["unapplied"] = [entry["raw_entry_id"] for entry in entries if entry["raw_entry_id"] not in results]
+        manifest["phase"] = "done"
+        print(f"✅ {args.job_id}: applied {manifest['applied']}/{len(entries)} results as {manifest['to_version']}")
+
+    save_manifest(args.work_dir, manifest)
+    return manifest
+
+
+def retry_job(args):
+    manifest = load_manifest(args.work_dir, args.job_id)
+    if manifest["phase"] not in TERMINAL_PHASES:
+        print(f"{args.job_id} is still in {manifest['phase']}; advance it until it is done or failed")
+        return None
+    if manifest.get("retried_by"):
+        print(f"{args.job_id} was already retried as {manifest['retried_by']}")
+        return None
+
+    entries = load_entries(args.work_dir, args.job_id)
+    if manifest["phase"] == "done":
+        unapplied = set(manifest.get("unapplied", []))
+        entries = [entry for entry in entries if entry["raw_entry_id"] in unapplied]
+    if not entries:
+        print(f"{args.job_id}: every entry was applied, nothing to retry")
+        return None
+
+    retry_id = create_job(args.work_dir, manifest["provider"], entries, manifest["from_version"],
+                          manifest["to_version"], retry_of=args.job_id)
+    manifest["retried_by"] = retry_id
+    save_manifest(args.work_dir, manifest)
+    return retry_id
+
+
+def show_plan(args):
+    report = get_stale_version_report(args.version, user_id=args.user_id)
+    total_stale = sum(row["stale_entries"] for row in report)
+    print(f"Current prompt version: {args.version}")
+    print(f"Stale entries: {total_stale} across {len([r for r in report if r['stale_entries']])} users")
+    for row in report:
+        if not row["stale_entries"]:
+            continue
+        print(f"  user {row['user_id']}: {row['stale_entries']}/{row['total_entries']} stale "
+              f"({row['oldest_stale_date']} .. {row['newest_stale_date']}) versions={row['versions']}")
+
+
+def show_status(args):
+    print(json.dumps(load_manifest(args.work_dir, args.job_id), indent=2))
+
+
+def embed_entries(args):
+    embedded = backfill_embeddings(user_id=args.user_id, batch_size=args.batch_size)
+    print(f"✅ Embedded {embedded} entries")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch reprocessing of historical diary entries")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    plan = subparsers.add_parser("plan", help="Report entries per user on stale prompt versions")
+    plan.add_argument("--version", default=PROMPT_VERSION, help="prompt version considered current")
+    plan.add_argument("--user-id", type=int)
+    plan.set_defaults(func=show_plan)
+
+    submit = subparsers.add_parser("submit", help="Snapshot entries and submit the categorization batch")
+    submit.add_argument("--stale", action="store_true",
+                        help="take the most recent entries not on --to-version (ignores --from-version)")
+    submit.add_argument("--from-version", default=UNVERSIONED,
+                        help=f"processing_version to reprocess ('{UNVERSIONED}' for entries without one)")
+    submit.add_argument("--to-version", default=PROMPT_VERSION,
+                        help="processing_version recorded on the new results (defaults to the current prompts)")
+    submit.add_argument("--provider", choices=["openai", "local"], default="openai")
+    submit.add_argument("--user-id", type=int)
+    submit.add_argument("--limit", type=int)
+    submit.add_argument("--per-user-limit", type=int, help="with --stale, cap entries taken from one user")
+    submit.set_defaults(func=submit_job)
+
+    advance = subparsers.add_parser("advance", help="Move a job to its next phase once its batch completed")
+    advance.add_argument("job_id")
+    advance.set_defaults(func=advance_job)
+
+    retry = subparsers.add_parser("retry", help="Resubmit the entries of a finished job that got no result")
+    retry.add_argument("job_id")
+    retry.set_defaults(func=retry_job)
+
+    status = subparsers.add_parser("status", help="Print a job manifest")
+    status.add_argument("job_id")
+    status.set_defaults(func=show_status)
+
+    embed = subparsers.add_parser("embed", help="Backfill similarity-search embeddings")
+    embed.add_argument("--user-id", type=int)
+    embed.add_argument("--batch-size", type=int, default=200)
+    embed.set_defaults(func=embed_entries)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,8 +4,13 @@ from flask import Blueprint, request, jsonify
 from utils.db_utils import get_db_connection
 from openai import OpenAI
 import os
+import logging
 from datetime import datetime
 from analytics_engine import HealthAnalyticsEngine
+from utils.etag import conditional_get, USER_SCOPE
+from utils.rate_limit import model_rate_limited
+
+logger = logging.getLogger(__name__)
 
 analytics_bp = Blueprint("analytics", __name__, url_prefix="/api/analytics")
 openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
@@ -17,10 +22,11 @@ analytics_engine = HealthAnalyticsEngine(
 def register_analytics_routes(app):
     """Register the analytics blueprint with the app"""
     app.register_blueprint(analytics_bp)
-    print("✅ Analytics routes registered")
+    logger.info("Analytics routes registered")
     return app
 
 @analytics_bp.route('/summary', methods=['GET'])
+@conditional_get(USER_SCOPE, daily=True, default_user_id=1)
 def get_health_summary():
     """Get health analytics summary"""
     try:
@@ -61,10 +67,12 @@ def get_health_summary():
             conn.close()
             
     except Exception as e:
-        print(f"Error fetching summary: {e}")
+        logger.exception("Fetching summary failed", extra={"user_id": user_id})
         return jsonify({"error": "Failed to fetch summary"}), 500
 
 @analytics_bp.route('/weekly-summary', methods=['GET'])
+@conditional_get(USER_SCOPE, daily=True, default_user_id=1)
+@model_rate_limited(cost=2)
 def get_weekly_summary():
     """
     Generate comprehensive weekly health summary with AI insights
@@ -73,11 +81,8 @@ def get_weekly_summary():
     try:
         user_id = request.args.get('user_id', 1, type=int)
         
-        print(f"🔄 Generating weekly summary for user {user_id}")
-        
         # Generate the complete analysis
         summary = analytics_engine.generate_weekly_summary(user_id)
-        print(f"🔍 Raw summary object: {summary}")
         
         # FIXED: Corrected data mapping to match frontend expectations
         response_data = {
@@ -127,11 +132,10 @@ def get_weekly_summary():
             "generated_at": datetime.now().isoformat()
         }
         
-        print("✅ Weekly summary response data:", response_data)
         return jsonify(response_data)
         
     except Exception as e:
-        print(f"❌ Error generating weekly summary: {e}")
+        logger.exception("Generating weekly summary failed")
         return jsonify({
             "success": False,
             "error": "Failed to generate weekly summary",
@@ -139,6 +143,7 @@ def get_weekly_summary():
         }), 500
 
 @analytics_bp.route('/correlations', methods=['GET'])
+@conditional_get(USER_SCOPE, daily=True, default_user_id=1)
 def get_health_correlations():
     """
     Get just the correlation analysis - useful for debugging or focused analysis
@@ -159,13 +164,14 @@ def get_health_correlations():
         })
         
     except Exception as e:
-        print(f"❌ Error getting correlations: {e}")
+        logger.exception("Correlation analysis failed")
         return jsonify({
             "success": False, 
             "error": "Failed to analyze correlations"
         }), 500
 
 @analytics_bp.route('/trends', methods=['GET'])
+@conditional_get(USER_SCOPE, daily=True, default_user_id=1)
 def get_health_trends():
     """
     Get trend analysis for the past several weeks - for charts and graphs
@@ -201,7 +207,7 @@ def get_health_trends():
         })
         
     except Exception as e:
-        print(f"❌ Error getting trends: {e}")
+        logger.exception("Trend analysis failed")
         return jsonify({
             "success": False,
             "error": "Failed to analyze trends"
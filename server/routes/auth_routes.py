@@ -2,16 +2,18 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity
 import bcrypt
 from psycopg2.extras import RealDictCursor
-import traceback
+import logging
 from utils.db_utils import get_db_connection
 
+logger = logging.getLogger(__name__)
+
 # Create a Blueprint for auth routes
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 def register_auth_routes(app):
     """Register the auth blueprint with the app"""
     app.register_blueprint(auth_bp)
-    print("✅ Authentication routes registered")
+    logger.info("Authentication routes registered")
     return app
 
 @auth_bp.route('/register', methods=['POST'])
@@ -23,8 +25,6 @@ def register():
         password = data.get('password', '')
         family_name = data.get('familyName', '')
         
-        print(f"🔄 Registration attempt for email: {email}, family: {family_name}")
-        
         # Validation
         if not email or not password or not family_name:
             return jsonify({"error": "All fields are required"}), 400
@@ -63,7 +63,6 @@ def register():
             
         family_id = family['id']
         family_name = family['family_name']
-        print(f"✅ Family created with ID: {family_id}")
         
         # Create admin user for the family with unique username and explicit UUID
         base_username = email.split('@')[0].lower()
@@ -81,8 +80,6 @@ def register():
             username = f"{base_username}{counter}"
             counter += 1
         
-        print(f"🔄 Creating admin user with username: {username}")
-        
         # Create first family member profile (admin)
         cursor.execute("""
             INSERT INTO users (family_id, username, display_name, avatar, color, role, last_active)
@@ -91,7 +88,6 @@ def register():
         """, (family_id, username, "Admin", "👑", "#6c5ce7", "admin"))
         
         admin_profile = cursor.fetchone()
-        print(f"✅ Admin profile created with ID: {admin_profile['id']}")
         
         conn.commit()
         
@@ -109,12 +105,11 @@ def register():
             "message": f"Welcome to the {family_name} family health diary!"
         }
         
-        print(f"✅ Registration successful for family: {family_name}")
+        logger.info("Family registered", extra={"family_id": family_id, "user_id": admin_profile['id']})
         return jsonify(response_data)
         
     except Exception as e:
-        print(f"❌ Registration error: {e}")
-        print(f"🔍 Full traceback: {traceback.format_exc()}")
+        logger.exception("Registration failed")
         return jsonify({"error": "Registration failed. Please try again."}), 500
     finally:
         if 'conn' in locals():
@@ -167,7 +162,7 @@ def login():
         })
         
     except Exception as e:
-        print(f"Login error: {e}")
+        logger.exception("Login failed")
         return jsonify({"error": "Login failed. Please try again."}), 500
     finally:
         if 'conn' in locals():
@@ -207,7 +202,7 @@ def verify_token():
         })
         
     except Exception as e:
-        print(f"Token verification error: {e}")
+        logger.exception("Token verification failed")
         return jsonify({"error": "Token verification failed"}), 500
     finally:
         if 'conn' in locals():
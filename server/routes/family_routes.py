@@ -1,8 +1,13 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from psycopg2.extras import RealDictCursor
-import traceback
+import logging
 from utils.db_utils import get_db_connection
+from utils.temporal_cache import temporal_cache
+from utils.etag import conditional_get, bump_data_version, FAMILY_SCOPE
+from utils.model_usage import family_daily_usage
+
+logger = logging.getLogger(__name__)
 
 # Create a Blueprint for family routes
 family_bp = Blueprint('family', __name__, url_prefix='/api/family')
@@ -10,20 +15,19 @@ family_bp = Blueprint('family', __name__, url_prefix='/api/family')
 def register_family_routes(app):
     """Register the family blueprint with the app"""
     app.register_blueprint(family_bp)
-    print("✅ Family routes registered")
+    logger.info("Family routes registered")
     return app
 
 @family_bp.route('/profiles', methods=['GET'])
 @jwt_required()
+@conditional_get(FAMILY_SCOPE)
 def get_family_profiles():
     """Get all family profiles for the authenticated family"""
     try:
         family_id = get_jwt_identity()
-        print(f"🔍 Getting profiles for family_id: {family_id}")
         
         conn = get_db_connection()
         if not conn:
-            print("❌ Database connection failed")
             return jsonify({"error": "Database connection failed"}), 500
         
         cursor = conn.cursor(cursor_factory=RealDictCursor)
@@ -32,11 +36,9 @@ def get_family_profiles():
         cursor.execute("SELECT id, family_name FROM families WHERE id = %s", (family_id,))
         family = cursor.fetchone()
         if not family:
-            print(f"❌ Family not found for ID: {family_id}")
+            logger.warning("Family not found", extra={"family_id": family_id})
             return jsonify({"error": "Family not found"}), 404
         
-        print(f"✅ Family found: {family['family_name']}")
-        
         # Get all profiles for this family with entry counts and health scores
         cursor.execute("""
             SELECT 
@@ -59,13 +61,10 @@ def get_family_profiles():
         """, (family_id,))
         
         profiles = cursor.fetchall()
-        print(f"📊 Found {len(profiles)} profiles for family")
         
         # Calculate health score for each profile
         formatted_profiles = []
         for profile in profiles:
-            print(f"🔄 Processing profile: {profile['name']} (ID: {profile['id']})")
-            
             # Simple health score calculation (0-100)
             if profile['entry_count'] > 0:
                 health_score = int((profile['avg_mood'] + profile['avg_energy']) * 5)
@@ -86,19 +85,42 @@ def get_family_profiles():
             }
             
             formatted_profiles.append(formatted_profile)
-            print(f"✅ Formatted profile: {formatted_profile}")
         
-        print(f"✅ Returning {len(formatted_profiles)} profiles")
+        logger.debug("Returning family profiles", extra={"family_id": family_id, "profiles": len(formatted_profiles)})
         return jsonify(formatted_profiles)
         
     except Exception as e:
-        print(f"❌ Get profiles error: {e}")
-        print(f"🔍 Full traceback: {traceback.format_exc()}")
+        logger.exception("Getting family profiles failed")
         return jsonify({"error": "Failed to get profiles"}), 500
     finally:
         if 'conn' in locals():
             conn.close()
 
+@family_bp.route('/usage', methods=['GET'])
+@jwt_required()
+def get_family_usage():
+    """Model calls, tokens, latency and estimated cost per day for the authenticated family"""
+    try:
+        family_id = get_jwt_identity()
+        days = max(1, min(request.args.get('days', 30, type=int), 366))
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({"error": "Database connection failed"}), 500
+
+        rows = family_daily_usage(conn.cursor(cursor_factory=RealDictCursor), family_id, days)
+        totals = {field: sum(row[field] or 0 for row in rows)
+                  for field in ("calls", "errors", "prompt_tokens", "completion_tokens", "total_tokens")}
+        totals["estimated_cost_usd"] = round(sum(row["estimated_cost_usd"] or 0 for row in rows), 6)
+        return jsonify({"period_days": days, "totals": totals, "days": rows})
+
+    except Exception as e:
+        logger.exception("Getting model usage failed", extra={"family_id": family_id})
+        return jsonify({"error": "Failed to get usage"}), 500
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
 @family_bp.route('/profiles', methods=['POST'])
 @jwt_required()
 def create_family_profile():
@@ -160,6 +182,7 @@ def create_family_profile():
         """, (family_id, username, name, avatar, color, 'user'))
         
         new_profile = cursor.fetchone()
+        bump_data_version(cursor, family_id=family_id)
         conn.commit()
         
         # Format the response
@@ -178,8 +201,7 @@ def create_family_profile():
         })
         
     except Exception as e:
-        print(f"Create profile error: {e}")
-        print(f" Full traceback: {traceback.format_exc()}")
+        logger.exception("Creating profile failed")
         return jsonify({"error": "Failed to create profile"}), 500
     finally:
         if 'conn' in locals():
@@ -240,6 +262,7 @@ def update_family_profile(profile_id):
         
         cursor.execute(query, params)
         updated_profile = cursor.fetchone()
+        bump_data_version(cursor, [profile_id])
         conn.commit()
         
         return jsonify({
@@ -249,7 +272,7 @@ def update_family_profile(profile_id):
         })
         
     except Exception as e:
-        print(f"Update profile error: {e}")
+        logger.exception("Updating profile failed", extra={"profile_id": profile_id})
         return jsonify({"error": "Failed to update profile"}), 500
     finally:
         if 'conn' in locals():
@@ -293,8 +316,10 @@ def delete_family_profile(profile_id):
         cursor.execute("DELETE FROM health_metrics WHERE user_id = %s", (profile_id,))
         cursor.execute("DELETE FROM raw_entries WHERE user_id = %s", (profile_id,))
         cursor.execute("DELETE FROM users WHERE id = %s", (profile_id,))
+        bump_data_version(cursor, family_id=family_id)
         
         conn.commit()
+        temporal_cache.invalidate(profile_id)
         
         return jsonify({
             "success": True,
@@ -302,10 +327,8 @@ def delete_family_profile(profile_id):
         })
         
     except Exception as e:
-        print(f"Delete profile error: {e}")
+        logger.exception("Deleting profile failed", extra={"profile_id": profile_id})
         return jsonify({"error": "Failed to delete profile"}), 500
     finally:
         if 'conn' in locals():
             conn.close()
-
-print(" Family routes registered")
\ No newline at end of file
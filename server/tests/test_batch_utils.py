@@ -0,0 +1,57 @@
+import json
+from utils.batch_utils import (
+    LocalFileBatchProvider,
+    PHASE_CATEGORIZE,
+    build_categorization_batch,
+    write_batch_file,
+    parse_batch_results,
+    parse_custom_id
+)
+
+
+ENTRIES = [
+    {"raw_entry_id": 11, "user_id": 1, "entry_text": "Ate spicy food, headache later", "entry_date": None},
+    {"raw_entry_id": 12, "user_id": 1, "entry_text": "Slept 8 hours, feeling great", "entry_date": None},
+]
+
+
+def test_categorization_batch_lines():
+    requests = build_categorization_batch(ENTRIES)
+
+    assert len(requests) == 2
+    assert requests[0]["custom_id"] == "categorize-11"
+    assert requests[0]["url"] == "/v1/chat/completions"
+    assert "Ate spicy food" in requests[0]["body"]["messages"][-1]["content"]
+    assert parse_custom_id(requests[1]["custom_id"]) == (PHASE_CATEGORIZE, 12)
+
+
+def test_local_provider_round_trip(tmp_path):
+    provider = LocalFileBatchProvider(
+        str(tmp_path / "batches"),
+        responder=lambda body: '```json\n{"mood_score": 6, "confidence": 0.7}\n```'
+    )
+    input_path = write_batch_file(str(tmp_path / "input.jsonl"), build_categorization_batch(ENTRIES))
+
+    batch_id = provider.submit(input_path)
+    assert provider.get_status(batch_id) == "completed"
+
+    results = parse_batch_results(provider.fetch_results(batch_id))
+    assert results == {
+        11: {"mood_score": 6, "confidence": 0.7},
+        12: {"mood_score": 6, "confidence": 0.7},
+    }
+
+
+def test_parse_batch_results_skips_failures():
+    lines = [
+        json.dumps({"custom_id": "extract-1", "response": {"status_code": 500, "body": {}}, "error": None}),
+        json.dumps({"custom_id": "extract-2", "response": None, "error": {"message": "rate limited"}}),
+        json.dumps({"custom_id": "extract-3", "response": {"status_code": 200, "body": {
+            "choices": [{"message": {"content": "not json"}}]
+        }}, "error": None}),
+        json.dumps({"custom_id": "extract-4", "response": {"status_code": 200, "body": {
+            "choices": [{"message": {"content": '{"stress_level": 3}'}}]
+        }}, "error": None}),
+    ]
+
+    assert parse_batch_results(lines) == {4: {"stress_level": 3}}
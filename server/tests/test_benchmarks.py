@@ -0,0 +1,50 @@
+import pytest
+
+from benchmarks.fake_model import FakeModelClient, detect_call_site
+from benchmarks.run import BenchContext, bench_similar_days, compare, percentile, run_benchmark, summarize
+from utils import ai_utils
+
+
+def test_fake_model_serves_the_extraction_pipeline(monkeypatch):
+    fake = FakeModelClient(latency_seconds=0)
+    monkeypatch.setattr(ai_utils, "openai_client", fake)
+    monkeypatch.setattr(ai_utils, "get_temporal_context", lambda *args, **kwargs: [])
+    monkeypatch.setattr(ai_utils, "get_similar_days", lambda *args, **kwargs: [])
+
+    result = ai_utils.extract_health_data_with_ai("Slept 6 hours, headache after lunch", user_id=1)
+
+    assert fake.calls == {"categorization": 1, "extraction": 1}
+    assert 3 <= result["mood_score"] <= 9
+    assert result["entry_categorization"]["primary_themes"]["sleep_focused"] is True
+
+
+def test_call_sites_are_detected_from_prompts():
+    assert detect_call_site([{"role": "user", "content": "TRIGGER ANALYSIS RESULTS: {}"}]) == "synthesis"
+    assert detect_call_site([{"role": "user", "content": "Extract metrics"}]) == "extraction"
+
+
+def test_summary_percentiles():
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    result = summarize([float(value) for value in range(1, 101)], errors=2, wall_seconds=2.0)
+    assert result["p50_ms"] == 50.5
+    assert result["p99_ms"] == pytest.approx(99.01)
+    assert result["throughput_rps"] == 50.0
+    assert result["errors"] == 2
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {"benchmarks": {"a": {"p50_ms": 10.0, "p99_ms": 20.0}, "gone": {"p50_ms": 1.0}}}
+    current = {"benchmarks": {"a": {"p50_ms": 10.5, "p99_ms": 30.0}, "new": {"p50_ms": 5.0}}}
+
+    rows = compare(baseline, current, max_regression_pct=10)
+
+    assert [(row["metric"], row["change_pct"], row["regression"]) for row in rows] == [
+        ("p50_ms", 5.0, False), ("p99_ms", 50.0, True)]
+
+
+def test_similar_days_benchmark_runs_in_process():
+    ctx = BenchContext(client=None, tag="t", families=[], headers={}, import_entries=0, index_entries=300)
+    result = run_benchmark(ctx, bench_similar_days, iterations=5, warmup=1)
+
+    assert 0 < len(ctx.similarity_index()[0]) <= 300  # not every day is written
+    assert result["iterations"] == 5 and result["errors"] == 0
@@ -0,0 +1,26 @@
+from datetime import date
+
+import pytest
+
+from routes.entry_routes import parse_calendar_range
+
+
+def test_month_covers_whole_month():
+    assert parse_calendar_range({"month": "2024-02"}) == (date(2024, 2, 1), date(2024, 3, 1))
+    assert parse_calendar_range({"month": "2024-12"}) == (date(2024, 12, 1), date(2025, 1, 1))
+
+
+def test_explicit_range_is_inclusive():
+    args = {"start_date": "2025-06-01", "end_date": "2025-06-07"}
+    assert parse_calendar_range(args) == (date(2025, 6, 1), date(2025, 6, 8))
+
+
+@pytest.mark.parametrize("args", [
+    {},
+    {"month": "June"},
+    {"start_date": "2025-06-07", "end_date": "2025-06-01"},
+    {"start_date": "2024-01-01", "end_date": "2025-06-01"}
+])
+def test_invalid_ranges_are_rejected(args):
+    with pytest.raises(ValueError):
+        parse_calendar_range(args)
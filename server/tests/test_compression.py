@@ -0,0 +1,86 @@
+import gzip
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask import Flask, jsonify
+
+from config import Config
+from utils import etag
+from utils.compression import init_compression
+from utils.etag import conditional_get, FAMILY_SCOPE
+from utils.json_provider import FastJSONProvider, orjson
+
+
+ROW = {"entry_date": date(2025, 6, 8), "created_at": datetime(2025, 6, 8, 9, 30),
+       "sleep_hours": Decimal("6.5"), "text": "Slept badly – headache"}
+
+
+class FixedVersions:
+    def get(self, scope, scope_id, family_id=None):
+        return 1
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(etag, "data_versions", FixedVersions())
+    monkeypatch.setattr(etag, "_current_family_id", lambda: 1)
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.json = FastJSONProvider(app)
+    init_compression(app)
+
+    @app.route("/entries")
+    def entries():
+        return jsonify({"entries": [ROW] * 200})
+
+    @app.route("/small")
+    def small():
+        return jsonify({"ok": True})
+
+    @app.route("/profiles")
+    @conditional_get(FAMILY_SCOPE)
+    def profiles():
+        return jsonify([ROW] * 50)
+
+    return app
+
+
+@pytest.mark.parametrize("use_orjson", [True, False] if orjson else [False])
+def test_provider_serializes_dates_and_decimals_natively(app, use_orjson):
+    provider = FastJSONProvider(app, use_orjson=use_orjson)
+    payload = json.loads(provider.dumps(ROW))
+
+    assert payload == {"entry_date": "2025-06-08", "created_at": "2025-06-08T09:30:00",
+                       "sleep_hours": 6.5, "text": "Slept badly – headache"}
+    assert provider.loads('{"a": [1, 2]}') == {"a": [1, 2]}
+
+
+def test_large_json_is_gzipped_when_accepted(app):
+    client = app.test_client()
+    compressed = client.get("/entries", headers={"Accept-Encoding": "gzip"})
+    plain = client.get("/entries")
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert gzip.decompress(compressed.data) == plain.data
+    assert len(compressed.data) < len(plain.data) / 5
+    assert "Content-Encoding" not in plain.headers
+
+
+def test_small_responses_are_not_compressed(app):
+    response = app.test_client().get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_compressed_etag_is_distinct_and_still_revalidates(app):
+    client = app.test_client()
+    plain_etag = client.get("/profiles").headers["ETag"]
+    gzip_etag = client.get("/profiles", headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+
+    assert gzip_etag == plain_etag[:-1] + '-gzip"'
+    revalidated = client.get("/profiles", headers={"Accept-Encoding": "gzip", "If-None-Match": gzip_etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == gzip_etag
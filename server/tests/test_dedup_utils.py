@@ -0,0 +1,56 @@
+from datetime import date
+
+from utils.dedup_utils import compute_content_hash, DuplicateChecker, REASON_DUPLICATE_EXISTING, REASON_DUPLICATE_IN_IMPORT
+from utils.import_pipeline import ImportPipeline
+
+
+def test_hash_ignores_case_whitespace_and_compatibility_forms():
+    original = compute_content_hash("Slept  well.\nRan 5 km")
+
+    assert compute_content_hash("  slept well. ran 5 km ") == original
+    assert compute_content_hash("Slept well. Ran ５ km") == original
+    assert compute_content_hash("Slept badly. Ran 5 km") != original
+
+
+class StubChecker(DuplicateChecker):
+    def __init__(self, stored):
+        super().__init__(user_id=1)
+        self.stored = stored
+        self.queries = 0
+
+    def _existing(self, hashes):
+        self.queries += 1
+        return {key for key in self.stored if key[1] in hashes}
+
+
+def test_checker_flags_stored_and_repeated_entries():
+    day = date(2025, 6, 1)
+    checker = StubChecker({(day, compute_content_hash("already stored"))})
+    entries = [
+        {"text": "Already stored", "date": day},
+        {"text": "new entry", "date": day},
+        {"text": "New   entry", "date": day},
+        {"text": "already stored", "date": date(2025, 6, 2)}
+    ]
+
+    assert checker(entries) == [REASON_DUPLICATE_EXISTING, None, REASON_DUPLICATE_IN_IMPORT, None]
+    assert checker.queries == 1
+
+
+def test_dry_run_reports_duplicates_without_model_calls():
+    day = date(2025, 6, 1)
+    checker = StubChecker({(day, compute_content_hash("old entry text"))})
+
+    def extract(*args, **kwargs):
+        raise AssertionError("dry run must not call the model")
+
+    pipeline = ImportPipeline(None, 1, dedup=checker, dedup_chunk_size=2, extract=extract)
+    result = pipeline.preview([
+        {"text": "old entry text", "date": day},
+        {"text": "fresh entry text", "date": day},
+        {"text": "fresh entry text", "date": day}
+    ])
+
+    assert (result.total_found, result.processed, result.duplicates) == (3, 1, 2)
+    assert [e["text_preview"] for e in result.processed_entries] == ["fresh entry text"]
+    assert checker.queries == 2
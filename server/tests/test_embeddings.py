@@ -0,0 +1,120 @@
+import random
+from datetime import date
+
+from utils.embeddings import HashingEmbeddingProvider, pack_vector, unpack_vector
+from utils.vector_index import (
+    UserVectorIndex, VectorIndexRegistry, dot, index_embeddings, lsh_keys, lsh_sketch, store_embeddings,
+    LSH_BITS, LSH_TABLES
+)
+from utils.ai_utils import format_temporal_context
+
+
+provider = HashingEmbeddingProvider(dim=256)
+
+
+def embed(text):
+    return provider.embed([text])[0]
+
+
+def test_hashing_embeddings_rank_related_entries_higher():
+    probe = embed("Ate ghee rice for dinner and woke up with a headache")
+    related = embed("Headache again this morning after ghee rice last night")
+    unrelated = embed("Long walk in the park, slept well, calm day at work")
+
+    assert abs(dot(probe, probe) - 1.0) < 1e-5
+    assert dot(probe, related) > dot(probe, unrelated) + 0.1
+
+
+def test_float16_packing_round_trips_closely():
+    vector = embed("Migraine after coffee and skipped lunch")
+    packed = pack_vector(vector)
+
+    assert len(packed) == 2 * len(vector)
+    restored = unpack_vector(packed)
+    assert max(abs(a - b) for a, b in zip(vector, restored)) < 1e-3
+
+
+def test_lsh_keys_are_stable_and_one_per_table():
+    vector = embed("Stomach ache after spicy food")
+
+    assert lsh_keys(vector, provider.name) == lsh_keys(vector, provider.name)
+    assert len(set(key >> LSH_BITS for key in lsh_keys(vector, provider.name))) == LSH_TABLES
+
+
+def test_index_query_orders_by_similarity_and_filters(monkeypatch):
+    monkeypatch.setattr("utils.vector_index.BRUTE_FORCE_LIMIT", 0)
+    rng = random.Random(3)
+    words = ["walk", "work", "meeting", "tea", "rain", "reading", "garden", "phone", "bus", "laundry"]
+
+    index = UserVectorIndex()
+    for entry_id in range(1, 301):
+        text = " ".join(rng.choice(words) for _ in range(12))
+        vector = embed(text)
+        index.add(entry_id, date(2025, 1, 1 + entry_id % 28), vector, lsh_keys(vector, provider.name))
+
+    target = embed("Ate ghee rice for dinner and woke up with a headache")
+    index.add(500, date(2025, 1, 10), target, lsh_keys(target, provider.name))
+    index.add(501, date(2025, 2, 10), target, lsh_keys(target, provider.name))
+
+    probe = embed("Ate ghee rice for dinner, woke up with a bad headache")
+    keys = lsh_keys(probe, provider.name)
+    results = index.query(probe, keys, k=3)
+    assert {results[0][0], results[1][0]} == {500, 501}
+    assert results[0][2] >= results[1][2] >= results[2][2]
+
+    filtered = index.query(probe, keys, k=3, exclude_ids={500}, before_date=date(2025, 2, 1))
+    assert 500 not in [entry_id for entry_id, _, _ in filtered]
+    assert 501 not in [entry_id for entry_id, _, _ in filtered]
+
+
+def test_large_candidate_sets_are_cut_by_sketch_distance(monkeypatch):
+    monkeypatch.setattr("utils.vector_index.BRUTE_FORCE_LIMIT", 0)
+    monkeypatch.setattr("utils.vector_index.MAX_RERANK", 8)
+    rng = random.Random(5)
+    words = ["walk", "work", "tea", "rain", "headache", "ghee", "rice", "dinner", "slept", "coffee"]
+
+    index = UserVectorIndex()
+    for entry_id in range(1, 201):
+        vector = embed(" ".join(rng.choice(words) for _ in range(12)))
+        index.add(entry_id, date(2025, 1, 1), vector, lsh_keys(vector, provider.name))
+    target = embed("Ate ghee rice for dinner and woke up with a headache")
+    index.add(500, date(2025, 1, 1), target, lsh_keys(target, provider.name))
+
+    keys = lsh_keys(target, provider.name)
+    scored = []
+    real_dot = dot
+    monkeypatch.setattr("utils.vector_index.dot", lambda a, b: scored.append(1) or real_dot(a, b))
+    results = index.query(target, keys, k=3)
+
+    assert results[0][0] == 500
+    assert len(scored) == 8
+    assert lsh_sketch(keys).bit_length() <= LSH_TABLES * LSH_BITS
+
+
+def test_similar_days_use_leftover_context_budget():
+    recent = [{"entry_date": date(2025, 6, 20), "mood_score": 5, "extraction_details": {"symptoms": ["headache"]}}]
+    similar = [{"entry_date": date(2025, 3, 2), "pain_level": 6, "similarity": 0.71,
+                "extraction_details": {"food_intake": ["ghee rice"]}}]
+
+    context = format_temporal_context(recent, similar_days=similar)
+    assert context.splitlines()[-2].startswith("SIMILAR PAST DAYS")
+    assert context.splitlines()[-1] == "2025-03-02 | p6 | food: ghee rice | sim 0.71"
+
+    assert "SIMILAR" not in format_temporal_context(recent, max_tokens=45, similar_days=similar)
+    assert format_temporal_context([], similar_days=similar).startswith("SIMILAR PAST DAYS")
+
+
+def test_stored_embeddings_reach_the_index_only_when_indexed(monkeypatch):
+    monkeypatch.setattr("utils.vector_index.execute_values", lambda cursor, sql, rows: None)
+    registry = VectorIndexRegistry()
+    registry._indexes[7] = UserVectorIndex()
+    monkeypatch.setattr("utils.vector_index.vector_index", registry)
+
+    rows = store_embeddings(None, [
+        {"raw_entry_id": 1, "user_id": 7, "entry_date": "2025-06-01", "entry_text": "ghee rice, headache later"}
+    ])
+    # Not committed yet: a rollback must not leave the id in the index
+    assert len(registry._indexes[7]) == 0
+
+    index_embeddings(rows)
+    assert registry._indexes[7].entries[1][0] == date(2025, 6, 1)
@@ -72,6 +72,22 @@ def test_get_entries_success(client, auth_token, sample_family_user):
     assert any(e["id"] == entry_id for e in data["entries"])
 
 
+@patch("routes.entry_routes.extract_health_data_with_ai")
+def test_get_entries_revalidates_until_a_write(mock_ai, client, auth_token, sample_family_user):
+    mock_ai.return_value = {"mood_score": 6, "confidence": 0.8}
+    user_id = sample_family_user['user_id']
+    headers = {"Authorization": f"Bearer {auth_token}"}
+
+    first = client.get(f"/api/entries?user_id={user_id}", headers=headers)
+    etag = first.headers["ETag"]
+    assert client.get(f"/api/entries?user_id={user_id}", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    client.post("/api/entries", json={"text": "New entry", "user_id": user_id}, headers=headers)
+    after_write = client.get(f"/api/entries?user_id={user_id}", headers={**headers, "If-None-Match": etag})
+    assert after_write.status_code == 200
+    assert after_write.get_json()["count"] == first.get_json()["count"] + 1
+
+
 def test_get_entries_missing_user_id(client, auth_token, sample_family_user):
     response = client.get(
         "/api/entries",
@@ -191,3 +207,77 @@ def test_bulk_delete_entries_success(client, auth_token, sample_family_user):
     assert response.status_code == 200
     assert data["success"] is True
     assert f"{len(entry_ids)} entries deleted" in data["message"]
+
+
+# ---------------------------
+# CALENDAR TESTS
+# ---------------------------
+
+def test_calendar_month_aggregates_per_day(client, auth_token, sample_family_user):
+    user_id = sample_family_user['user_id']
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO raw_entries (user_id, entry_text, entry_date, created_at)
+        VALUES (%s, 'Morning entry', '2025-06-03', NOW()),
+               (%s, 'Evening entry', '2025-06-03', NOW()),
+               (%s, 'Next month', '2025-07-01', NOW())
+        RETURNING id
+    """, (user_id, user_id, user_id))
+    entry_ids = [row['id'] for row in cursor.fetchall()]
+    cursor.execute("""
+        INSERT INTO health_metrics (user_id, raw_entry_id, entry_date, mood_score)
+        VALUES (%s, %s, '2025-06-03', 6), (%s, %s, '2025-06-03', 8)
+    """, (user_id, entry_ids[0], user_id, entry_ids[1]))
+    conn.commit()
+    conn.close()
+
+    response = client.get(
+        f"/api/entries/calendar?user_id={user_id}&month=2025-06",
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data["total_entries"] == 2
+    assert data["days"] == [{
+        "date": "2025-06-03", "entry_count": 2, "avg_mood_score": 7.0,
+        "avg_energy_level": None, "avg_pain_level": None, "avg_sleep_quality": None,
+        "avg_sleep_hours": None, "avg_stress_level": None
+    }]
+
+
+def test_calendar_requires_a_range(client, auth_token, sample_family_user):
+    response = client.get(
+        f"/api/entries/calendar?user_id={sample_family_user['user_id']}",
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == 400
+
+
+# ---------------------------
+# SEARCH TESTS
+# ---------------------------
+
+def test_search_returns_ranked_snippets(client, auth_token, sample_family_user):
+    user_id = sample_family_user['user_id']
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO raw_entries (user_id, entry_text, entry_date, created_at)
+        VALUES (%s, 'Bad migraine after the ghee rice dinner', '2025-06-03', NOW()),
+               (%s, 'Quiet day, long walk in the park', '2025-06-04', NOW())
+    """, (user_id, user_id))
+    conn.commit()
+    conn.close()
+
+    response = client.get(
+        "/api/entries/search?q=migraine",
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data["count"] == 1
+    assert "<mark>migraine</mark>" in data["results"][0]["snippet"]
+    assert data["next_cursor"] is None
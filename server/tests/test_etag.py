@@ -0,0 +1,148 @@
+import pytest
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required
+from psycopg2.extras import RealDictRow
+
+from config import Config
+from utils import etag
+from utils.etag import conditional_get, bump_data_version, DataVersions, USER_SCOPE, FAMILY_SCOPE
+
+
+class MemoryVersions:
+    def __init__(self):
+        self.versions = {(USER_SCOPE, 7): 3, (FAMILY_SCOPE, 1): 10}
+        self.members = {7: 1}
+
+    def get(self, scope, scope_id, family_id=None):
+        if scope == USER_SCOPE and family_id is not None and self.members.get(scope_id) != int(family_id):
+            return None
+        return self.versions.get((scope, scope_id))
+
+
+class RecordingCursor:
+    def __init__(self, rows=()):
+        self.statements = []
+        self.rows = list(rows)
+
+    def execute(self, sql, params=None):
+        self.statements.append((" ".join(sql.split()), params))
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+
+class VersionConnection:
+    """get_db_connection() stand-in; its cursors return RealDictRows like the real ones"""
+
+    def __init__(self, rows):
+        self.cursor_ = RecordingCursor(rows)
+        self.closed = False
+
+    def cursor(self):
+        return self.cursor_
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(etag, "data_versions", MemoryVersions())
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(JWT_SECRET_KEY="test-secret")
+    JWTManager(app)
+    app.calls = 0
+
+    @app.route("/entries")
+    @jwt_required()
+    @conditional_get(USER_SCOPE)
+    def entries():
+        app.calls += 1
+        return jsonify({"entries": [], "calls": app.calls})
+
+    @app.route("/profiles")
+    @jwt_required()
+    @conditional_get(FAMILY_SCOPE)
+    def profiles():
+        app.calls += 1
+        return jsonify([])
+
+    @app.route("/summary")
+    @conditional_get(USER_SCOPE, daily=True, default_user_id=7)
+    def summary():
+        app.calls += 1
+        return jsonify({"summary": {}})
+
+    return app
+
+
+@pytest.fixture
+def auth(app):
+    with app.app_context():
+        token = create_access_token(identity="1")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_matching_etag_short_circuits_to_304(app, auth):
+    client = app.test_client()
+    first = client.get("/entries?user_id=7", headers=auth)
+    etag_value = first.headers["ETag"]
+
+    second = client.get("/entries?user_id=7", headers={**auth, "If-None-Match": etag_value})
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag_value
+    assert second.headers["Cache-Control"] == "private, no-cache"
+    assert app.calls == 1
+
+
+def test_bumped_version_or_other_query_changes_the_etag(app, auth):
+    client = app.test_client()
+    etag_value = client.get("/entries?user_id=7", headers=auth).headers["ETag"]
+
+    other_page = client.get("/entries?user_id=7&limit=5", headers={**auth, "If-None-Match": etag_value})
+    assert other_page.status_code == 200
+
+    etag.data_versions.versions[(USER_SCOPE, 7)] += 1
+    assert client.get("/entries?user_id=7", headers={**auth, "If-None-Match": etag_value}).status_code == 200
+
+
+def test_foreign_profile_is_served_without_etag(app, auth):
+    etag.data_versions.members[7] = 2
+    response = app.test_client().get("/entries?user_id=7", headers=auth)
+
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+
+
+def test_family_scope_and_unauthenticated_daily_scope(app, auth):
+    client = app.test_client()
+    family_etag = client.get("/profiles", headers=auth).headers["ETag"]
+    assert client.get("/profiles", headers={**auth, "If-None-Match": family_etag}).status_code == 304
+
+    summary_etag = client.get("/summary").headers["ETag"]
+    assert client.get("/summary", headers={"If-None-Match": f'W/{summary_etag}'}).status_code == 304
+
+
+def test_bump_updates_users_and_their_families_in_one_statement():
+    cursor = RecordingCursor()
+    bump_data_version(cursor, [9, 7, 9, None])
+    bump_data_version(cursor, family_id=4)
+
+    (user_sql, user_params), (family_sql, family_params) = cursor.statements
+    assert user_sql.startswith("WITH bumped AS ( UPDATE users SET data_version = data_version + 1")
+    assert user_params == ([7, 9],)
+    assert family_params == (4,)
+
+
+def test_versions_are_read_by_column_name(monkeypatch):
+    conn = VersionConnection([RealDictRow(data_version=12), RealDictRow(data_version=3), None])
+    monkeypatch.setattr(etag, "get_db_connection", lambda: conn)
+    versions = DataVersions()
+
+    assert versions.get(FAMILY_SCOPE, 1) == 12
+    assert versions.get(USER_SCOPE, 7, family_id=1) == 3
+    assert versions.get(USER_SCOPE, 8, family_id=1) is None
+    assert conn.cursor_.statements[1][1] == (7, 1)
+    assert conn.closed
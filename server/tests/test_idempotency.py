@@ -0,0 +1,153 @@
+import io
+import threading
+import time
+
+import pytest
+from flask import Flask, jsonify, request
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required
+
+from config import Config
+from utils import idempotency
+from utils.idempotency import idempotent, ACQUIRED, IN_PROGRESS, COMPLETED, MISMATCH
+
+
+class MemoryStore:
+    def __init__(self):
+        self.records = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, family_id, key, fingerprint, ttl_seconds, lock_seconds):
+        with self.lock:
+            record = self.records.get((family_id, key))
+            if record is None:
+                self.records[(family_id, key)] = {"request_fingerprint": fingerprint, "status": IN_PROGRESS}
+                return ACQUIRED, None
+            if record["request_fingerprint"] != fingerprint:
+                return MISMATCH, record
+            return record["status"], record
+
+    def heartbeat(self, family_id, key, fingerprint):
+        self.heartbeats = getattr(self, "heartbeats", 0) + 1
+
+    def complete(self, family_id, key, status_code, body):
+        self.records[(family_id, key)].update(status=COMPLETED, response_status=status_code, response_body=body)
+
+    def release(self, family_id, key):
+        self.records.pop((family_id, key), None)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(idempotency, "idempotency_store", MemoryStore())
+    monkeypatch.setattr(idempotency, "POLL_INTERVAL_SECONDS", 0.01)
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(JWT_SECRET_KEY="test-secret", IDEMPOTENCY_WAIT_SECONDS=0.05)
+    JWTManager(app)
+    app.calls = 0
+
+    @app.route("/entries", methods=["POST"])
+    @jwt_required()
+    @idempotent
+    def create():
+        app.calls += 1
+        if app.config.get("FAIL_NEXT"):
+            app.config["FAIL_NEXT"] = False
+            return jsonify({"error": "boom"}), 500
+        return jsonify({"entry_id": app.calls}), 201
+
+    @app.route("/import", methods=["POST"])
+    @jwt_required()
+    @idempotent
+    def upload():
+        app.calls += 1
+        time.sleep(app.config.get("VIEW_SECONDS", 0))
+        return jsonify({"size": len(request.files["file"].read()), "call": app.calls}), 201
+
+    return app
+
+
+@pytest.fixture
+def headers(app):
+    with app.app_context():
+        token = create_access_token(identity="1")
+    return {"Authorization": f"Bearer {token}", "Idempotency-Key": "retry-123"}
+
+
+def test_retry_returns_original_response(app, headers):
+    client = app.test_client()
+    first = client.post("/entries", json={"text": "hello"}, headers=headers)
+    second = client.post("/entries", json={"text": "hello"}, headers=headers)
+
+    assert first.status_code == second.status_code == 201
+    assert second.get_json() == first.get_json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert app.calls == 1
+
+
+def test_key_reused_for_different_request_is_rejected(app, headers):
+    client = app.test_client()
+    client.post("/entries", json={"text": "hello"}, headers=headers)
+
+    assert client.post("/entries", json={"text": "other"}, headers=headers).status_code == 422
+
+
+def test_in_flight_request_returns_409_with_retry_after(app, headers):
+    client = app.test_client()
+    client.post("/entries", json={"text": "hello"}, headers=headers)
+    idempotency.idempotency_store.records[(1, "retry-123")]["status"] = IN_PROGRESS
+
+    response = client.post("/entries", json={"text": "hello"}, headers=headers)
+    assert response.status_code == 409
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_server_error_releases_key(app, headers):
+    client = app.test_client()
+    app.config["FAIL_NEXT"] = True
+
+    assert client.post("/entries", json={"text": "hello"}, headers=headers).status_code == 500
+    assert client.post("/entries", json={"text": "hello"}, headers=headers).status_code == 201
+    assert app.calls == 2
+
+
+def test_requests_without_key_are_not_tracked(app, headers):
+    client = app.test_client()
+    headers = {"Authorization": headers["Authorization"]}
+    client.post("/entries", json={"text": "hello"}, headers=headers)
+    client.post("/entries", json={"text": "hello"}, headers=headers)
+
+    assert app.calls == 2
+
+
+def test_uploads_are_fingerprinted_by_content(app, headers):
+    client = app.test_client()
+
+    def upload(content):
+        return client.post("/import", headers=headers, content_type="multipart/form-data",
+                           data={"file": (io.BytesIO(content), "diary.txt")})
+
+    first = upload(b"2025-01-01 slept well")
+    assert first.get_json() == {"size": 21, "call": 1}
+    assert upload(b"2025-01-01 slept well").headers["Idempotent-Replayed"] == "true"
+    assert upload(b"2025-01-02 slept okay").status_code == 422  # same name and size, other content
+
+
+def test_oversized_upload_is_rejected_before_parsing(app, headers):
+    app.config.update(MAX_CONTENT_LENGTH=1024)
+    response = app.test_client().post("/import", headers=headers, content_type="multipart/form-data",
+                                      data={"file": (io.BytesIO(b"x" * 4096), "diary.txt")})
+
+    assert response.status_code == 413
+    assert app.calls == 0
+    assert idempotency.idempotency_store.records == {}
+
+
+def test_long_running_request_keeps_its_key_alive(app, headers):
+    app.config.update(IDEMPOTENCY_LOCK_SECONDS=0.06, VIEW_SECONDS=0.1)
+    response = app.test_client().post("/import", headers=headers, content_type="multipart/form-data",
+                                      data={"file": (io.BytesIO(b"entry"), "diary.txt")})
+
+    assert response.status_code == 201
+    assert idempotency.idempotency_store.heartbeats >= 2
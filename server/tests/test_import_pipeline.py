@@ -0,0 +1,226 @@
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+from psycopg2.extras import RealDictRow
+
+from utils.dedup_utils import compute_content_hash
+from utils.import_pipeline import ImportPipeline, active_pipeline_stats
+from utils.temporal_cache import TemporalContextCache
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, fail_batches=0, stored=(), fail_commits=0):
+        self.stored = set(stored)
+        self.fail_commits = fail_commits
+        self.batches = []
+        self.embedded_ids = []
+        self.commits = 0
+        self.fail_batches = fail_batches
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        if self.fail_commits:
+            self.fail_commits -= 1
+            raise RuntimeError("commit failed")
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def fake_execute_values(monkeypatch):
+    ids = iter(range(1, 10_000))
+    indexed = []
+
+    def execute_values(cursor, sql, rows, fetch=False, **kwargs):
+        conn = cursor.conn
+        if "raw_entries" in sql:
+            if conn.fail_batches:
+                conn.fail_batches -= 1
+                raise RuntimeError("write failed")
+            # ON CONFLICT DO NOTHING returns only the rows it inserted
+            rows = [row for row in rows if (row[2], row[3]) not in conn.stored]
+            conn.stored.update((row[2], row[3]) for row in rows)
+            conn.batches.append(len(rows))
+            # get_db_connection cursors return RealDictRows, which have no positional access
+            return [RealDictRow(id=next(ids), entry_date=row[2], content_hash=row[3]) for row in rows]
+
+    def store_embeddings(cursor, entries):
+        cursor.conn.embedded_ids.extend(entry["raw_entry_id"] for entry in entries)
+        return [entry["raw_entry_id"] for entry in entries]
+
+    def index_embeddings(raw_entry_ids):
+        indexed.extend(raw_entry_ids)
+
+    monkeypatch.setattr("utils.import_pipeline.execute_values", execute_values)
+    monkeypatch.setattr("utils.import_pipeline.store_embeddings_safely", store_embeddings)
+    monkeypatch.setattr("utils.import_pipeline.index_embeddings", index_embeddings)
+    monkeypatch.setattr("utils.import_pipeline.bump_data_version", lambda cursor, user_ids: None)
+    return indexed
+
+
+def make_entries(count):
+    return [{"text": f"Diary entry number {i} with enough text", "date": date(2025, 1, 1 + i % 28)}
+            for i in range(count)]
+
+
+def fake_extract(delay=0.0):
+    def extract(text, user_id, entry_date, import_batch=None):
+        time.sleep(delay)
+        return {"mood_score": 5, "confidence": 0.9, "processing_version": "p-test"}
+    return extract
+
+
+def test_all_entries_are_written_in_batches(fake_execute_values):
+    conn = FakeConnection()
+    pipeline = ImportPipeline(conn, 7, workers=3, queue_size=4, write_batch_size=10,
+                              extract=fake_extract())
+    result = pipeline.run(make_entries(45))
+
+    assert result.processed == 45
+    assert sum(conn.batches) == 45
+    assert max(conn.batches) <= 10
+    assert len(result.processed_entries) == 10
+    assert sorted(conn.embedded_ids) == list(range(1, 46))
+    assert {entry["id"] for entry in result.processed_entries} <= set(conn.embedded_ids)
+    assert result.stats["stages"]["write"]["processed"] == 45
+    assert result.stats["queues"]["parsed"]["peak_depth"] <= 4
+    assert active_pipeline_stats() == []
+
+
+def test_written_entries_leave_the_import_batch(fake_execute_values):
+    batch = TemporalContextCache().start_batch(7)
+    pipeline = ImportPipeline(FakeConnection(), 7, import_batch=batch, workers=2, write_batch_size=4,
+                              extract=fake_extract())
+    result = pipeline.run(make_entries(10))
+
+    assert result.processed == 10
+    assert batch.pending == []
+
+
+def daily_entries(count):
+    return [{"text": f"Diary entry for day {i} with enough text", "date": date(2025, 1, 1) + timedelta(days=i)}
+            for i in range(count)]
+
+
+def context_extract(cache):
+    def extract(text, user_id, entry_date, import_batch=None):
+        cache.get_entries(user_id, entry_date, days_back=3, batch=import_batch)
+        return {"mood_score": 5, "confidence": 0.9, "processing_version": "p-test"}
+    return extract
+
+
+@pytest.mark.parametrize("primed, max_loads", [(True, 0), (False, 4)])
+def test_write_batches_keep_the_temporal_window(fake_execute_values, monkeypatch, primed, max_loads):
+    loads = []
+    monkeypatch.setattr("utils.temporal_cache._load_entries", lambda *args: loads.append(args) or [])
+    cache = TemporalContextCache()
+    if primed:
+        cache.prime(7, date(2024, 12, 29), date(2025, 4, 11))
+        loads.clear()
+    batch = cache.start_batch(7)
+
+    pipeline = ImportPipeline(FakeConnection(), 7, import_batch=batch, workers=1, write_batch_size=25,
+                              flush_interval=0.01, extract=context_extract(cache))
+    result = pipeline.run(daily_entries(100))
+
+    assert result.processed == 100
+    assert len(loads) <= max_loads
+    # Committed entries are served from the window, not reloaded
+    entries = cache.get_entries(7, date(2025, 4, 11), days_back=3)
+    assert [e["id"] for e in entries] == [100, 99, 98]
+    assert len(loads) <= max_loads
+
+
+def test_result_counts_batches_written_before_a_parser_error(fake_execute_values):
+    def entries():
+        yield from make_entries(10)
+        time.sleep(0.3)
+        raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+    conn = FakeConnection()
+    pipeline = ImportPipeline(conn, 7, workers=2, write_batch_size=5, flush_interval=0.02, dedup_chunk_size=5,
+                              extract=fake_extract())
+    with pytest.raises(UnicodeDecodeError):
+        pipeline.run(entries())
+
+    assert pipeline.result.processed == sum(conn.batches) == 10
+
+
+def test_entries_stored_concurrently_are_counted_as_duplicates(fake_execute_values):
+    entries = make_entries(6)
+    # Stored by another request after this import's dedup stage ran
+    conn = FakeConnection(stored=[(entries[1]["date"], compute_content_hash(entries[1]["text"]))])
+    batch = TemporalContextCache().start_batch(7)
+    pipeline = ImportPipeline(conn, 7, import_batch=batch, workers=1, write_batch_size=3,
+                              extract=fake_extract())
+    result = pipeline.run(entries)
+
+    assert (result.processed, result.duplicates) == (5, 1)
+    assert result.skipped_reasons == ["Entry 2: Duplicate of an existing entry"]
+    assert len(conn.embedded_ids) == 5
+    assert batch.pending == []
+
+
+def test_extraction_runs_concurrently(fake_execute_values):
+    pipeline = ImportPipeline(FakeConnection(), 7, workers=8, write_batch_size=5,
+                              extract=fake_extract(delay=0.05))
+    started = time.monotonic()
+    result = pipeline.run(make_entries(40))
+
+    assert result.processed == 40
+    # 40 calls of 50ms each take 2s sequentially
+    assert time.monotonic() - started < 1.0
+
+
+def test_duplicates_and_short_entries_are_skipped(fake_execute_values):
+    entries = make_entries(3) + make_entries(2) + [{"text": "short", "date": date(2025, 1, 1)}]
+    pipeline = ImportPipeline(FakeConnection(), 7, min_length=20, extract=fake_extract())
+    result = pipeline.run(entries)
+
+    assert result.total_found == 6
+    assert result.processed == 3
+    assert result.skipped == 3
+
+
+def test_failed_write_batch_is_counted_and_import_continues(fake_execute_values):
+    conn = FakeConnection(fail_batches=1)
+    pipeline = ImportPipeline(conn, 7, workers=1, write_batch_size=5, extract=fake_extract())
+    result = pipeline.run(make_entries(12))
+
+    assert result.failed == 5
+    assert result.processed == 7
+
+
+def test_rolled_back_batch_is_not_indexed(fake_execute_values):
+    conn = FakeConnection(fail_commits=1)
+    pipeline = ImportPipeline(conn, 7, workers=1, write_batch_size=5, extract=fake_extract())
+    result = pipeline.run(make_entries(12))
+
+    assert (result.failed, result.processed) == (5, 7)
+    assert len(conn.embedded_ids) == 12
+    assert sorted(fake_execute_values) == [entry["id"] for entry in result.processed_entries]
+
+
+def test_parser_errors_are_raised_after_shutdown(fake_execute_values):
+    def entries():
+        yield from make_entries(3)
+        raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+    pipeline = ImportPipeline(FakeConnection(), 7, extract=fake_extract())
+    with pytest.raises(UnicodeDecodeError):
+        pipeline.run(entries())
+    assert not [t for t in threading.enumerate() if t.name.startswith(f"import-{pipeline.id}")]
@@ -0,0 +1,96 @@
+import io
+from datetime import date
+
+import pytest
+
+from utils.import_utils import (
+    ImportTooLarge,
+    iter_batches,
+    iter_bulk_entries,
+    iter_csv_entries,
+    open_text_stream,
+    split_bulk_text_into_entries
+)
+
+DUMP = """**June 19, 2025**
+Woke up tired, headache after lunch.
+
+June 20, 2025 Better sleep, walked 30 minutes.
+Ate dal and rice.
+06/21/2025
+Stressful meeting.
+2025-06-22: Quiet Sunday.
+"""
+
+
+def test_splits_all_supported_date_headings():
+    entries = split_bulk_text_into_entries(DUMP)
+
+    assert [e['date'] for e in entries] == [
+        date(2025, 6, 19), date(2025, 6, 20), date(2025, 6, 21), date(2025, 6, 22)
+    ]
+    assert entries[0]['text'] == "Woke up tired, headache after lunch."
+    assert entries[1]['text'] == "Better sleep, walked 30 minutes.\nAte dal and rice."
+    assert entries[3]['text'] == ": Quiet Sunday."
+
+
+def test_text_before_first_date_uses_default_date():
+    entries = split_bulk_text_into_entries("Some notes\nJun 3 2025\nEntry body")
+
+    assert entries[0] == {'text': "Some notes", 'date': date.today()}
+    assert entries[1] == {'text': "Entry body", 'date': date(2025, 6, 3)}
+
+
+def test_bold_text_without_a_date_is_not_a_heading():
+    entries = split_bulk_text_into_entries("June 1, 2025\n**Breakfast** toast\nfelt fine")
+
+    assert entries == [{'text': "**Breakfast** toast\nfelt fine", 'date': date(2025, 6, 1)}]
+
+
+def test_entries_are_yielded_incrementally():
+    lines = iter(["June 1, 2025\n", "first\n", "June 2, 2025\n", "second\n"])
+    entries = iter_bulk_entries(lines)
+
+    assert next(entries) == {'text': "first", 'date': date(2025, 6, 1)}
+    # The first entry is closed by the second heading; the rest is still unread
+    assert next(lines) == "second\n"
+
+
+def test_reads_from_file_like_stream():
+    entries = list(iter_bulk_entries(io.StringIO(DUMP * 200)))
+
+    assert len(entries) == 800
+
+
+def test_csv_with_header_uses_text_and_date_columns():
+    stream = io.StringIO('Date,Mood,Entry\n2025-06-01,ok,"Slept well, ran 5k"\n2025-06-02,,\n06/03/2025,low,Headache\n')
+    entries = list(iter_csv_entries(stream))
+
+    assert entries == [
+        {'text': "Slept well, ran 5k", 'date': date(2025, 6, 1)},
+        {'text': "Headache", 'date': date(2025, 6, 3)}
+    ]
+
+
+def test_csv_without_header_uses_first_column():
+    entries = list(iter_csv_entries(io.StringIO("Tired today,x\nBetter\n"), default_date=date(2025, 1, 1)))
+
+    assert [e['text'] for e in entries] == ["Tired today", "Better"]
+
+
+def test_upload_stream_enforces_size_limit_while_reading():
+    stream = open_text_stream(io.BytesIO(b"June 1, 2025\n" + b"a" * 100_000), max_bytes=50_000)
+
+    with pytest.raises(ImportTooLarge):
+        list(iter_bulk_entries(stream))
+
+
+def test_upload_stream_rejects_invalid_utf8():
+    stream = open_text_stream(io.BytesIO("﻿June 1, 2025\nok\n".encode("utf-8") + b"\xff\xfe bad\n"))
+
+    with pytest.raises(UnicodeDecodeError):
+        list(iter_bulk_entries(stream))
+
+
+def test_batches_have_fixed_size():
+    assert [len(b) for b in iter_batches(range(7), 3)] == [3, 3, 1]
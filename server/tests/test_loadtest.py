@@ -0,0 +1,90 @@
+import json
+import random
+import urllib.error
+import urllib.request
+
+import pytest
+from openai import OpenAI
+
+from benchmarks import loadtest
+from benchmarks.fake_openai_server import parse_latency, start_server
+
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(**kwargs):
+        server = start_server(latency="fixed:0", seed=1, **kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_latency_specs():
+    rng = random.Random(0)
+    assert parse_latency("fixed:250")(rng) == 0.25
+    assert all(0.02 <= parse_latency("uniform:20:40")(rng) <= 0.04 for _ in range(50))
+    draws = sorted(parse_latency("lognormal:100:0.5")(rng) for _ in range(2001))
+    assert draws[1000] == pytest.approx(0.1, rel=0.1)
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1:2")
+
+
+def test_openai_client_talks_to_fake_server(fake_server):
+    server = fake_server()
+    client = OpenAI(api_key="test", base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0)
+
+    response = client.chat.completions.create(
+        model="gpt-4o-mini", messages=[{"role": "user", "content": "Extract metrics from: slept badly"}]
+    )
+
+    assert "mood_score" in json.loads(response.choices[0].message.content)
+    assert response.usage.total_tokens == response.usage.prompt_tokens + response.usage.completion_tokens
+    stats = server.state.snapshot()
+    assert stats["calls"] == {"extraction": 1}
+    assert stats["completion_tokens"] == response.usage.completion_tokens
+
+
+def test_fake_server_injects_errors(fake_server):
+    server = fake_server(error_rate=1.0)
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{server.server_port}/v1/chat/completions", method="POST",
+        data=json.dumps({"messages": [{"role": "user", "content": "hi"}]}).encode("utf-8"),
+    )
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(request, timeout=5)
+
+    assert error.value.code in (429, 500)
+    assert server.state.snapshot()["errors"] == 1
+
+
+def test_mix_and_schedule():
+    mix = loadtest.parse_mix("create_entry=3, profiles=1,summary=0")
+    assert list(mix) == ["create_entry", "profiles"]
+    with pytest.raises(ValueError):
+        loadtest.parse_mix("delete_everything=1")
+
+    plan = loadtest.schedule(rps=50, duration=20, mix=mix, seed=3)
+    assert 900 <= len(plan) <= 1100
+    assert all(0 < offset < 20 for offset, _ in plan)
+    assert sum(1 for _, name in plan if name == "create_entry") / len(plan) == pytest.approx(0.75, abs=0.05)
+    assert loadtest.schedule(rps=10, duration=1, mix=mix, poisson=False)[-1][0] == pytest.approx(0.9)
+
+
+def test_drive_reports_latency_and_errors(monkeypatch):
+    statuses = iter([200, 500, 201, 0])
+    monkeypatch.setitem(loadtest.OPERATIONS, "profiles", lambda ctx, rng, i: next(statuses))
+    plan = [(0.0, "profiles"), (0.001, "profiles"), (0.002, "profiles"), (0.003, "profiles")]
+
+    samples, wall_seconds = loadtest.drive(ctx=None, plan=plan, concurrency=1)
+    results = loadtest.report(samples, wall_seconds)
+
+    assert results["profiles"]["iterations"] == 4
+    assert results["profiles"]["error_rate"] == 0.5
+    assert results["overall"]["statuses"] == {"0": 1, "200": 1, "201": 1, "500": 1}
@@ -0,0 +1,79 @@
+import io
+import json
+import logging
+import os
+import queue
+import sys
+
+from utils.logging_utils import (
+    JsonFormatter, TextFormatter, SamplingFilter, NonBlockingQueueHandler, parse_module_levels
+)
+
+
+def make_record(level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord("utils.test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    line = JsonFormatter().format(make_record(user_id=3, entries=12))
+    payload = json.loads(line)
+    assert payload["msg"] == "hello world"
+    assert payload["level"] == "INFO"
+    assert payload["logger"] == "utils.test"
+    assert payload["user_id"] == 3 and payload["entries"] == 12
+    assert "args" not in payload and "sample_rate" not in payload
+
+
+def test_json_formatter_includes_traceback():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("x", logging.ERROR, __file__, 1, "failed", None, sys.exc_info())
+    payload = json.loads(JsonFormatter().format(record))
+    assert "ValueError: boom" in payload["exc"]
+
+
+def test_text_formatter_appends_fields():
+    assert TextFormatter().format(make_record(entry_id=7)).endswith("hello world entry_id=7")
+
+
+def test_sampling_filter():
+    debug = make_record(level=logging.DEBUG)
+    assert not SamplingFilter(debug_rate=0.0).filter(debug)
+    assert SamplingFilter(debug_rate=1.0).filter(debug)
+    # Other levels are only sampled when the call asks for it
+    assert SamplingFilter(debug_rate=0.0).filter(make_record(level=logging.INFO))
+    assert not SamplingFilter().filter(make_record(level=logging.WARNING, sample_rate=0.0))
+
+
+def test_parse_module_levels():
+    assert parse_module_levels("a=debug, b.c=WARNING,,bogus") == {"a": "DEBUG", "b.c": "WARNING"}
+    assert parse_module_levels(None) == {}
+
+
+def test_queue_handler_writes_in_background():
+    stream = io.StringIO()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(JsonFormatter())
+    handler = NonBlockingQueueHandler(queue.Queue(10), target)
+    logger = logging.getLogger("tests.logging.background")
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        logger.warning("stored %d entries", 4, extra={"user_id": 1})
+    finally:
+        logger.removeHandler(handler)
+        handler.stop()
+    payload = json.loads(stream.getvalue())
+    assert payload["msg"] == "stored 4 entries"
+    assert payload["user_id"] == 1
+
+
+def test_queue_handler_drops_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(1), logging.NullHandler())
+    handler._listener_pid = os.getpid()  # no listener draining the queue
+    handler.handle(make_record())
+    handler.handle(make_record())
+    assert handler.dropped == 1
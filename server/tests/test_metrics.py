@@ -0,0 +1,131 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask, jsonify
+
+from utils import metrics
+from utils.ai_utils import create_chat_completion
+from utils.db_utils import add_query_observer, remove_query_observer, observed_cursor_class
+from utils.metrics import MetricsRegistry, SnapshotExporter, merge_snapshots, render_prometheus
+
+
+@pytest.fixture
+def exporter(tmp_path, monkeypatch):
+    exporter = SnapshotExporter(metrics.registry, directory=str(tmp_path), interval=3600)
+    monkeypatch.setattr(metrics, "exporter", exporter)
+    return exporter
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("work_seconds", "Work", ("site",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 3.0):
+        latency.observe(value, site="a")
+
+    text = render_prometheus(merge_snapshots({os.getpid(): registry.snapshot()}))
+    assert '# TYPE work_seconds histogram' in text
+    assert 'work_seconds_bucket{site="a",le="0.1"} 1' in text
+    assert 'work_seconds_bucket{site="a",le="1.0"} 2' in text
+    assert 'work_seconds_bucket{site="a",le="+Inf"} 3' in text
+    assert 'work_seconds_count{site="a"} 3' in text
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_worker_snapshots_are_merged_and_dead_ones_dropped(exporter):
+    registry = MetricsRegistry()
+    registry.counter("jobs_total", "Jobs", ("kind",)).inc(2, kind="x")
+    other_worker = registry.snapshot()
+    live_pid, exited_pid = os.getppid(), dead_pid()
+    for pid in (live_pid, exited_pid):
+        with open(exporter.path(pid=pid), "w") as f:
+            json.dump(other_worker, f)
+
+    metrics.registry.counter("jobs_total", "Jobs", ("kind",)).inc(1, kind="x")
+    merged = exporter.collect()
+    assert merged["jobs_total"]["samples"][("x",)] == 3
+    assert not os.path.exists(exporter.path(pid=exited_pid))
+
+    old = time.time() - metrics.METRICS_STALE_SECONDS - 10
+    os.utime(exporter.path(pid=live_pid), (old, old))
+    assert exporter.collect()["jobs_total"]["samples"][("x",)] == 1
+    assert not os.path.exists(exporter.path(pid=live_pid))
+
+
+def test_gauges_merge_by_their_mode():
+    snapshots = {}
+    for pid, value in ((101, 0.5), (102, 1.0)):
+        registry = MetricsRegistry()
+        registry.gauge("queue_depth", "Depth", ("queue",), merge="sum").set(value * 4, queue="parsed")
+        registry.gauge("peak", "Peak", merge="max").set(value)
+        registry.gauge("factor", "Factor").set(value)
+        snapshots[pid] = registry.snapshot()
+
+    merged = merge_snapshots(snapshots)
+    assert merged["queue_depth"]["samples"] == {("parsed",): 6.0}
+    assert merged["peak"]["samples"] == {(): 1.0}
+    assert merged["factor"]["samples"] == {("101",): 0.5, ("102",): 1.0}
+    assert 'factor{pid="102"} 1.0' in render_prometheus(merged)
+    with pytest.raises(ValueError):
+        MetricsRegistry().gauge("bad", "Bad", merge="avg")
+
+
+def test_requests_are_timed_per_route(exporter):
+    app = Flask(__name__)
+    metrics.init_metrics(app)
+
+    @app.route("/items/<int:item_id>")
+    def item(item_id):
+        return jsonify({"id": item_id})
+
+    client = app.test_client()
+    client.get("/items/1")
+    client.get("/items/2")
+    text = client.get("/metrics").get_data(as_text=True)
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/<int:item_id>",status="200"}' in text
+    assert 'http_request_db_queries_bucket{route="/items/<int:item_id>",le="0"}' in text
+
+
+def test_observed_cursors_report_every_statement():
+    class FakeCursor:
+        def execute(self, query, vars=None):
+            self.rowcount = 1
+
+    seen = []
+    observer = lambda cursor, query, params, seconds: seen.append((query, params))
+    add_query_observer(observer)
+    try:
+        observed_cursor_class(FakeCursor)().execute("SELECT 1 WHERE %s", (True,))
+    finally:
+        remove_query_observer(observer)
+
+    assert seen == [("SELECT 1 WHERE %s", (True,))]
+
+
+def test_chat_completions_record_latency_tokens_and_errors():
+    def create(**request):
+        if request.get("fail"):
+            raise RuntimeError("rate limited")
+        return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30))
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    create_chat_completion("unit_test", client=client, model="m")
+    with pytest.raises(RuntimeError):
+        create_chat_completion("unit_test", client=client, model="m", fail=True)
+
+    snapshot = metrics.registry.snapshot()
+    tokens = dict((tuple(labels), value) for labels, value in snapshot["openai_tokens_total"]["samples"])
+    outcomes = dict((tuple(labels), value) for labels, value in snapshot["openai_requests_total"]["samples"])
+    assert tokens[("unit_test", "m", "prompt")] == 120
+    assert outcomes[("unit_test", "m", "ok")] == 1
+    assert outcomes[("unit_test", "m", "error")] == 1
@@ -0,0 +1,187 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+from benchmarks.fake_model import FakeModelClient
+from config import TestingConfig
+from routes import entry_routes
+from utils import ai_utils
+from utils.model_scheduler import (
+    BACKGROUND, INTERACTIVE, ModelCallScheduler, ModelQueueTimeout, current_priority, init_model_scheduler,
+    model_priority
+)
+
+
+def hold_slot(scheduler, priority, started, release, order=None, name=None):
+    def run():
+        with scheduler.slot(priority):
+            if order is not None:
+                order.append(name)
+            started.set()
+            release.wait(5)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_for_queue(scheduler, priority, length):
+    deadline = time.monotonic() + 5
+    while scheduler.stats()["queued"][priority] < length:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_priority_follows_the_context():
+    assert current_priority() == INTERACTIVE
+    with model_priority(BACKGROUND):
+        assert current_priority() == BACKGROUND
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(current_priority()))
+        thread.start()
+        thread.join()
+        assert seen == [INTERACTIVE]  # new threads start interactive
+    assert current_priority() == INTERACTIVE
+    with pytest.raises(ValueError):
+        with model_priority("urgent"):
+            pass
+
+
+def test_background_work_leaves_reserved_slots_free():
+    scheduler = ModelCallScheduler(capacity=3, interactive_reserved=1)
+    release = threading.Event()
+    threads = []
+    for _ in range(2):
+        started = threading.Event()
+        threads.append(hold_slot(scheduler, BACKGROUND, started, release))
+        assert started.wait(5)
+
+    with pytest.raises(ModelQueueTimeout):
+        with scheduler.slot(BACKGROUND, timeout=0.05):
+            pass
+    with scheduler.slot(INTERACTIVE) as waited:
+        assert waited < 0.5
+        assert scheduler.stats()["running"] == {INTERACTIVE: 1, BACKGROUND: 2}
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert scheduler.stats()["running"] == {INTERACTIVE: 0, BACKGROUND: 0}
+
+
+def test_interactive_calls_jump_queued_background_calls():
+    scheduler = ModelCallScheduler(capacity=1, interactive_reserved=0)
+    order, release_first, release_rest = [], threading.Event(), threading.Event()
+    first_started = threading.Event()
+    hold_slot(scheduler, BACKGROUND, first_started, release_first)
+    assert first_started.wait(5)
+
+    queued = [hold_slot(scheduler, BACKGROUND, threading.Event(), release_rest, order, f"background-{i}")
+              for i in range(2)]
+    wait_for_queue(scheduler, BACKGROUND, 2)
+    interactive = hold_slot(scheduler, INTERACTIVE, threading.Event(), release_rest, order, "interactive")
+    wait_for_queue(scheduler, INTERACTIVE, 1)
+
+    release_first.set()
+    release_rest.set()
+    for thread in queued + [interactive]:
+        thread.join(5)
+    assert order == ["interactive", "background-0", "background-1"]
+
+
+def test_interactive_calls_time_out_instead_of_waiting_forever():
+    scheduler = ModelCallScheduler(capacity=1, interactive_reserved=0, interactive_timeout=0.05)
+    release, started = threading.Event(), threading.Event()
+    thread = hold_slot(scheduler, BACKGROUND, started, release)
+    assert started.wait(5)
+
+    with pytest.raises(ModelQueueTimeout):
+        with scheduler.slot():
+            pass
+    assert scheduler.stats()["queued"] == {INTERACTIVE: 0, BACKGROUND: 0}
+    release.set()
+    thread.join(5)
+
+
+def test_model_calls_go_through_the_scheduler(monkeypatch):
+    scheduler = ModelCallScheduler(capacity=2, interactive_reserved=1)
+    seen = []
+
+    class RecordingClient(FakeModelClient):
+        def complete(self, messages, model=None):
+            seen.append(scheduler.stats()["running"])
+            return super().complete(messages, model)
+
+    monkeypatch.setattr(ai_utils, "model_scheduler", scheduler)
+    client = RecordingClient(latency_seconds=0)
+    messages = [{"role": "user", "content": "Extract metrics"}]
+
+    ai_utils.create_chat_completion("extraction", client=client, model="gpt-4o", messages=messages)
+    with model_priority(BACKGROUND):
+        ai_utils.create_chat_completion("extraction", client=client, model="gpt-4o", messages=messages)
+
+    assert seen == [{INTERACTIVE: 1, BACKGROUND: 0}, {INTERACTIVE: 0, BACKGROUND: 1}]
+
+
+def test_queue_timeouts_reach_the_caller_instead_of_fallback_data(monkeypatch):
+    scheduler = ModelCallScheduler(capacity=1, interactive_reserved=0, interactive_timeout=0.01)
+    monkeypatch.setattr(ai_utils, "model_scheduler", scheduler)
+    monkeypatch.setattr(ai_utils, "openai_client", FakeModelClient(latency_seconds=0))
+    release, started = threading.Event(), threading.Event()
+    thread = hold_slot(scheduler, BACKGROUND, started, release)
+    assert started.wait(5)
+
+    with pytest.raises(ModelQueueTimeout):
+        ai_utils.extract_health_data_with_ai("Slept 6 hours, headache after lunch", user_id=9)
+    release.set()
+    thread.join(5)
+
+
+class UserCursor:
+    def execute(self, query, params=None):
+        pass
+
+    def fetchone(self):
+        return {"id": 3}
+
+
+class UserConnection:
+    def cursor(self, cursor_factory=None):
+        return UserCursor()
+
+    def close(self):
+        pass
+
+
+def test_entry_save_without_a_model_slot_answers_503(monkeypatch):
+    def busy(*args, **kwargs):
+        raise ModelQueueTimeout(INTERACTIVE, 5)
+
+    monkeypatch.setattr(entry_routes, "get_db_connection", UserConnection)
+    monkeypatch.setattr(entry_routes, "find_duplicate_entry", lambda *args: None)
+    monkeypatch.setattr(entry_routes, "extract_health_data_with_ai", busy)
+    app = Flask(__name__)
+    app.config.from_object(TestingConfig)
+    JWTManager(app)
+    entry_routes.register_entry_routes(app)
+    with app.app_context():
+        token = create_access_token(identity="1")
+
+    response = app.test_client().post("/api/entries", json={"text": "Slept badly", "user_id": 3},
+                                      headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_scheduler_is_sized_from_app_config(monkeypatch):
+    scheduler = ModelCallScheduler()
+    monkeypatch.setattr("utils.model_scheduler.model_scheduler", scheduler)
+    app = Flask(__name__)
+    app.config.from_object(TestingConfig)
+    app.config.update(MODEL_CONCURRENCY=4, MODEL_INTERACTIVE_RESERVED=3)
+    init_model_scheduler(app)
+
+    assert (scheduler.capacity, scheduler.background_capacity) == (4, 1)
+    assert scheduler.timeouts[INTERACTIVE] == TestingConfig.MODEL_INTERACTIVE_QUEUE_TIMEOUT
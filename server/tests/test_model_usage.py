@@ -0,0 +1,188 @@
+import queue
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required
+
+from benchmarks.fake_model import FakeModelClient
+from utils import ai_utils, model_usage
+from utils.embeddings import OpenAIEmbeddingProvider
+from utils.model_usage import (
+    UsageRecorder, current_attribution, estimate_cost, model_usage_scope, parse_model_prices, top_usage
+)
+
+
+class CapturingRecorder:
+    def __init__(self):
+        self.calls = []
+
+    def record(self, call_site, model, seconds, usage=None, error=None):
+        self.calls.append((call_site, model, current_attribution(),
+                           getattr(usage, "prompt_tokens", None), error is not None))
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+
+    def cursor(self):
+        return object()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, query, params=None):
+        self.query = query
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_costs_use_per_million_prices():
+    prices = parse_model_prices("gpt-4o=5:20, local-model=0")
+    assert prices["gpt-4o"] == (5.0, 20.0)
+    assert prices["gpt-4o-mini"] == (0.15, 0.60)
+    assert estimate_cost("gpt-4o", 1_000_000, 500_000, prices) == 15.0
+    assert estimate_cost("local-model", 1000, 1000, prices) == 0.0
+    assert estimate_cost("unknown", 1000, 1000, prices) is None
+
+
+def test_attribution_from_scope_and_request():
+    assert current_attribution() == (None, None, "background")
+    with model_usage_scope(user_id="7", source="reprocess"):
+        with model_usage_scope(family_id=3):
+            assert current_attribution() == (3, 7, "reprocess")
+        assert current_attribution() == (None, 7, "reprocess")
+
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = "test-secret"
+    JWTManager(app)
+
+    @app.route("/api/entries", methods=["POST"])
+    @jwt_required()
+    def create():
+        return jsonify(current_attribution())
+
+    with app.app_context():
+        token = create_access_token(identity="42")
+    response = app.test_client().post("/api/entries", headers={"Authorization": f"Bearer {token}"})
+    assert response.get_json() == [42, None, "/api/entries"]
+
+
+def test_extraction_calls_are_recorded_with_user_and_tokens(monkeypatch):
+    recorder = CapturingRecorder()
+    monkeypatch.setattr(ai_utils, "usage_recorder", recorder)
+    monkeypatch.setattr(ai_utils, "openai_client", FakeModelClient(latency_seconds=0))
+    monkeypatch.setattr(ai_utils, "get_temporal_context", lambda *args, **kwargs: [])
+    monkeypatch.setattr(ai_utils, "get_similar_days", lambda *args, **kwargs: [])
+
+    ai_utils.extract_health_data_with_ai("Slept 6 hours, headache after lunch", user_id=9)
+
+    assert [call[0] for call in recorder.calls] == ["categorization", "extraction"]
+    assert all(call[1] == ai_utils.EXTRACTION_MODEL and call[2] == (None, 9, "background") for call in recorder.calls)
+    assert all(call[3] > 0 and not call[4] for call in recorder.calls)
+
+
+def test_failed_calls_are_recorded_as_errors(monkeypatch):
+    recorder = CapturingRecorder()
+    monkeypatch.setattr(ai_utils, "usage_recorder", recorder)
+
+    class Broken:
+        class chat:
+            class completions:
+                @staticmethod
+                def create(**request):
+                    raise RuntimeError("rate limited")
+
+    with pytest.raises(RuntimeError):
+        ai_utils.create_chat_completion("synthesis", client=Broken, model="gpt-4o", messages=[])
+    assert recorder.calls == [("synthesis", "gpt-4o", (None, None, "background"), None, True)]
+
+
+def test_openai_embeddings_are_scheduled_and_recorded(monkeypatch):
+    recorder = CapturingRecorder()
+    monkeypatch.setattr(ai_utils, "usage_recorder", recorder)
+    real_slot, slots = ai_utils.model_scheduler.slot, []
+
+    def slot(*args, **kwargs):
+        slots.append(1)
+        return real_slot(*args, **kwargs)
+    monkeypatch.setattr(ai_utils.model_scheduler, "slot", slot)
+
+    def create(**request):
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[3.0, 4.0]) for _ in request["input"]],
+                               usage=SimpleNamespace(prompt_tokens=12, total_tokens=12))
+
+    client = SimpleNamespace(embeddings=SimpleNamespace(create=create))
+    with model_usage_scope(user_id=5, family_id=2, source="interactive"):
+        vectors = OpenAIEmbeddingProvider(dim=2, client=client).embed(["pickles", "headache"])
+
+    assert [list(vector) for vector in vectors] == [[0.6000000238418579, 0.800000011920929]] * 2
+    assert slots == [1]
+    assert recorder.calls == [("embedding", "text-embedding-3-small", (2, 5, "interactive"), 12, False)]
+    assert estimate_cost("text-embedding-3-small", 1_000_000, None) == 0.02
+
+
+def test_recorder_writes_in_batches(monkeypatch):
+    written = []
+    monkeypatch.setattr(model_usage, "execute_values",
+                        lambda cursor, sql, rows, template=None, page_size=None: written.append(list(rows)))
+    conn = FakeConnection()
+    recorder = UsageRecorder(batch_size=2, connect=lambda: conn)
+    monkeypatch.setattr(recorder, "_ensure_running", lambda: None)
+
+    for i in range(5):
+        with model_usage_scope(user_id=i):
+            recorder.record("extraction", "gpt-4o", 0.25, usage=type("Usage", (), {"prompt_tokens": 10, "completion_tokens": 5}))
+    recorder.flush()
+
+    assert [len(batch) for batch in written] == [2, 2, 1]
+    assert conn.commits == 3
+    row = written[0][1]
+    assert row[:8] == (None, 1, "extraction", "gpt-4o", "background", 10, 5, 250.0)
+    assert row[8] == "ok"
+
+
+def test_recorder_drops_instead_of_blocking():
+    recorder = UsageRecorder(queue_size=1, connect=lambda: None)
+    recorder._ensure_running = lambda: None
+    recorder.record("extraction", "gpt-4o", 0.1)
+    recorder.record("extraction", "gpt-4o", 0.1)
+    assert recorder.dropped == 1
+
+    recorder.flush()  # no database: the queued record is dropped too
+    assert recorder.dropped == 2
+    with pytest.raises(queue.Empty):
+        recorder.queue.get_nowait()
+
+
+def test_top_usage_folds_models_and_ranks_by_cost():
+    cursor = FakeCursor([
+        {"key": 1, "model": "gpt-4o", "calls": 10, "errors": 1, "prompt_tokens": 100_000,
+         "completion_tokens": 10_000, "total_latency_ms": 5000.0, "max_latency_ms": 900.0},
+        {"key": 1, "model": "gpt-4o-mini", "calls": 10, "errors": 0, "prompt_tokens": 100_000,
+         "completion_tokens": 0, "total_latency_ms": 1000.0, "max_latency_ms": 200.0},
+        {"key": 2, "model": "gpt-4o", "calls": 50, "errors": 0, "prompt_tokens": 1_000_000,
+         "completion_tokens": 0, "total_latency_ms": 25000.0, "max_latency_ms": 1200.0},
+    ])
+
+    ranked = top_usage(cursor, "family_id", days=7)
+
+    assert [group["family_id"] for group in ranked] == [2, 1]
+    assert ranked[1]["calls"] == 20
+    assert ranked[1]["estimated_cost_usd"] == pytest.approx(0.35 + 0.015)
+    assert ranked[1]["avg_latency_ms"] == 300.0
+    with pytest.raises(ValueError):
+        top_usage(cursor, "password_hash")
@@ -0,0 +1,35 @@
+from prompts import build_extraction_prompt, warm_prompt_cache, THEME_FLAGS
+from prompts.assembly import get_static_prefix, theme_key
+
+
+def test_static_prefix_comes_before_entry_content():
+    prompt = build_extraction_prompt("Had ghee rice, headache at night", {"food_focused": True}, "No recent entries")
+    prefix = get_static_prefix(theme_key({"food_focused": True}))
+
+    assert prompt.startswith(prefix)
+    assert "ENHANCED FOOD ANALYSIS" in prefix
+    assert "Had ghee rice" not in prefix
+    assert prompt.rstrip().endswith('"Had ghee rice, headache at night"')
+
+
+def test_prefix_is_shared_across_entries():
+    first = build_extraction_prompt("entry one", {"sleep_focused": True}, "ctx one")
+    second = build_extraction_prompt("entry two", {"sleep_focused": True, "exercise_activity": False}, "ctx two")
+    prefix = get_static_prefix(theme_key({"sleep_focused": True}))
+
+    assert first.startswith(prefix) and second.startswith(prefix)
+
+
+def test_all_theme_combinations_are_cached_once():
+    get_static_prefix.cache_clear()
+    warm_prompt_cache()
+
+    assert get_static_prefix.cache_info().currsize == 2 ** len(THEME_FLAGS)
+
+
+def test_format_braces_are_resolved():
+    prompt = build_extraction_prompt("text with {braces}", {"relationship_focused": True}, "ctx")
+
+    assert "{{" not in prompt.replace("{braces}", "")
+    assert '"enhanced_social_analysis": {' in prompt
+    assert "text with {braces}" in prompt
@@ -0,0 +1,87 @@
+import pytest
+from flask import Flask, jsonify
+
+from utils import query_profiler
+from utils.db_utils import observed_cursor_class
+from utils.query_profiler import ProfileStore, QueryProfile, statement_shape, init_query_profiler
+
+
+class FakeCursor:
+    def execute(self, query, vars=None):
+        self.rowcount = 1
+
+
+def make_app(debug=False, admin_token="secret", sample_rate=0.0):
+    app = Flask(__name__)
+    app.debug = debug
+    app.config.update(ADMIN_API_TOKEN=admin_token, QUERY_PROFILE_SAMPLE_RATE=sample_rate, QUERY_PROFILE_N_PLUS_ONE=3)
+    init_query_profiler(app)
+
+    @app.route("/profiles")
+    def profiles():
+        cursor = observed_cursor_class(FakeCursor)()
+        cursor.execute("SELECT id FROM users WHERE family_id = %s", (1,))
+        for user_id in range(4):
+            cursor.execute("SELECT COUNT(*) FROM raw_entries WHERE user_id = %s", (user_id,))
+        return jsonify([])
+
+    return app
+
+
+@pytest.fixture(autouse=True)
+def store(monkeypatch):
+    store = ProfileStore(size=10)
+    monkeypatch.setattr(query_profiler, "profile_store", store)
+    return store
+
+
+def test_statement_shapes_ignore_values():
+    assert statement_shape("SELECT * FROM users WHERE username = %s") == statement_shape(
+        "SELECT *  FROM users\n WHERE username = 'bob'")
+    assert statement_shape("DELETE FROM x WHERE id IN (%s, %s, %s)") == "DELETE FROM x WHERE id IN (...)"
+    assert statement_shape("INSERT INTO t (a) VALUES (1), (2) RETURNING id") == "INSERT INTO t (a) VALUES (...) RETURNING id"
+
+
+def test_report_groups_shapes_and_flags_n_plus_one():
+    profile = QueryProfile("GET", "/x", "/x")
+    for rows in (1, 2, 3):
+        profile.record("SELECT ? FROM t WHERE id = ?", 0.002, rows)
+    profile.record("SELECT ? FROM u", 0.001, None)
+
+    report = profile.report(200, n_plus_one_threshold=3)
+    assert report["queries"] == 4
+    assert report["shapes"][0] == {"sql": "SELECT ? FROM t WHERE id = ?", "count": 3, "total_ms": 6.0, "max_ms": 2.0, "rows": 6}
+    assert report["n_plus_one"] == [{"sql": "SELECT ? FROM t WHERE id = ?", "count": 3}]
+
+
+def test_admin_can_profile_a_request_on_demand(store):
+    client = make_app().test_client()
+
+    response = client.get("/profiles", headers={"X-Query-Profile": "1", "X-Admin-Token": "secret"})
+    assert response.headers["X-Query-Profile"].startswith("queries=5;")
+    assert response.headers["X-Query-Profile"].endswith("n_plus_one=1")
+
+    profile_id = response.headers["X-Query-Profile-Id"]
+    report = client.get(f"/debug/query-profiles/{profile_id}", headers={"X-Admin-Token": "secret"}).get_json()
+    assert report["route"] == "/profiles"
+    assert len(report["statements"]) == 5
+    assert report["n_plus_one"][0]["count"] == 4
+
+
+def test_profiling_is_not_exposed_to_other_callers(store):
+    client = make_app().test_client()
+
+    response = client.get("/profiles", headers={"X-Query-Profile": "1", "X-Admin-Token": "wrong"})
+    assert "X-Query-Profile" not in response.headers
+    assert store.recent() == []
+    assert client.get("/debug/query-profiles", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert make_app(admin_token=None).test_client().get("/debug/query-profiles").status_code == 404
+
+
+def test_sampled_requests_are_stored_without_headers(store):
+    client = make_app(sample_rate=1.0).test_client()
+
+    response = client.get("/profiles")
+    assert "X-Query-Profile" not in response.headers
+    listed = client.get("/debug/query-profiles?n_plus_one=1", headers={"X-Admin-Token": "secret"}).get_json()
+    assert len(listed) == 1 and "statements" not in listed[0]
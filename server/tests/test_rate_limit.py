@@ -0,0 +1,121 @@
+import pytest
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required
+
+from utils import rate_limit
+from utils.rate_limit import (
+    MemoryBucketStore, PostgresBucketStore, RateLimiter, RateLimitExceeded, model_rate_limited
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_limiter(clock, **kwargs):
+    settings = dict(family_per_minute=60, family_burst=4, global_per_minute=600, global_burst=10, borrow_headroom=0.5)
+    settings.update(kwargs)
+    return RateLimiter(MemoryBucketStore(clock=clock), **settings)
+
+
+def test_bucket_refills_at_its_rate():
+    clock = FakeClock()
+    store = MemoryBucketStore(clock=clock)
+
+    assert store.take("k", rate=1.0, burst=2, cost=2) == 0
+    assert store.take("k", rate=1.0, burst=2, cost=1) == pytest.approx(1.0)
+    clock.now = 1.5
+    assert store.take("k", rate=1.0, burst=2, cost=1) == 0
+    assert store.take("k", rate=1.0, burst=2, cost=1) == pytest.approx(0.5)
+
+
+def test_families_are_limited_independently():
+    limiter = make_limiter(FakeClock())
+
+    assert limiter.try_acquire(1, cost=2) == 0
+    assert limiter.try_acquire(1, cost=2) == 0
+    assert limiter.try_acquire(1, cost=2) == pytest.approx(2.0)
+    assert limiter.try_acquire(2, cost=2) == 0
+
+
+def test_global_bucket_caps_all_families_and_refunds_family_tokens():
+    clock = FakeClock()
+    limiter = make_limiter(clock, global_burst=4)
+
+    assert limiter.try_acquire(1, cost=2) == 0
+    assert limiter.try_acquire(2, cost=2) == 0
+    assert limiter.try_acquire(3, cost=2) == pytest.approx(0.2)
+    # Family 3 was not charged for the rejected call
+    clock.now = 0.2
+    assert limiter.try_acquire(3, cost=2) == 0
+    assert limiter.store.take("family:3", limiter.family_rate, limiter.family_burst, 2) == 0
+
+
+def test_background_work_borrows_idle_global_capacity_only():
+    limiter = make_limiter(FakeClock())
+
+    assert limiter.try_acquire(1, cost=4) == 0            # family bucket empty, global 6/10
+    assert limiter.try_acquire(1, cost=1) > 0             # interactive: held to the family rate
+    assert limiter.try_acquire(1, cost=1, borrow=True) == 0   # global 5/10 left, headroom 5
+    assert limiter.try_acquire(1, cost=1, borrow=True) > 0    # would dip into the headroom
+
+
+def test_upstream_throttling_halves_the_global_rate():
+    limiter = make_limiter(FakeClock())
+    limiter.upstream_throttled()
+    limiter.upstream_throttled()
+    assert limiter.factor == 0.25
+    for _ in range(10):
+        limiter.upstream_ok()
+    assert limiter.factor == pytest.approx(0.45)
+    for _ in range(10 ** 3):
+        limiter.upstream_throttled()
+    assert limiter.factor == rate_limit.MIN_RATE_FACTOR
+
+
+def test_acquire_waits_for_tokens_or_times_out():
+    limiter = RateLimiter(MemoryBucketStore(), family_per_minute=1200, family_burst=1,
+                          global_per_minute=6000, global_burst=100)
+    assert limiter.acquire(1, borrow=False) == 0
+    assert 0.03 < limiter.acquire(1, borrow=False) < 0.5
+
+    slow = RateLimiter(MemoryBucketStore(), family_per_minute=1, family_burst=1, global_per_minute=1, global_burst=1)
+    slow.acquire(1)
+    with pytest.raises(RateLimitExceeded) as error:
+        slow.acquire(1, timeout=0.05)
+    assert error.value.retry_after > 1
+
+
+def test_interactive_endpoints_get_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(rate_limit, "rate_limiter", make_limiter(FakeClock(), family_burst=2))
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = "test-secret"
+    JWTManager(app)
+
+    @app.route("/entries", methods=["POST"])
+    @jwt_required()
+    @model_rate_limited(cost=2)
+    def create():
+        return jsonify({"success": True})
+
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity='5')}"}
+    client = app.test_client()
+
+    assert client.post("/entries", headers=headers).status_code == 200
+    response = client.post("/entries", headers=headers)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert response.get_json()["retry_after"] == 2
+
+
+def test_disabled_limiter_and_unreachable_store_admit(monkeypatch):
+    monkeypatch.setattr(rate_limit, "rate_limiter", None)
+    assert rate_limit.background_extract(len, 1, cost=2, timeout=1) is len
+
+    store = PostgresBucketStore(connect=lambda: None)
+    assert store.take("global", rate=1.0, burst=1, cost=1) == 0
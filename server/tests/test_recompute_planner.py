@@ -0,0 +1,89 @@
+import uuid
+from datetime import date
+
+import pytest
+
+from utils.db_utils import get_db_connection
+from utils.recompute_planner import get_stale_version_report, plan_recompute
+
+CURRENT = "p-planner-current"
+
+
+@pytest.fixture
+def stale_entries(test_app, sample_family_user):
+    """
+    Two profiles with entries far in the future, so they sort ahead of any
+    other test data: user A has one entry on CURRENT, two on an old version,
+    one without a recorded version and one without metrics; user B has three
+    entries on the old version.
+    """
+    user_a = sample_family_user['user_id']
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO users (family_id, username, display_name, avatar, color, role, last_active)
+            VALUES (%s, %s, 'Second User', '👤', '#ff9800', 'user', NOW())
+            RETURNING id
+        """, (sample_family_user['family_id'], f"testuser-{uuid.uuid4().hex[:8]}"))
+        user_b = cursor.fetchone()['id']
+
+        ids = {}
+        versions = {1: CURRENT, 2: "p-old", 3: "no metrics", 4: "p-old", 5: None}
+        for user_id, days in ((user_a, versions), (user_b, {1: "p-old", 2: "p-old", 3: "p-old"})):
+            for day, version in days.items():
+                cursor.execute("""
+                    INSERT INTO raw_entries (user_id, entry_text, entry_date, created_at)
+                    VALUES (%s, %s, %s, NOW()) RETURNING id
+                """, (user_id, f"entry {day}", date(2999, 1, day)))
+                raw_entry_id = cursor.fetchone()['id']
+                ids[(user_id, day)] = raw_entry_id
+                if version != "no metrics":
+                    cursor.execute("""
+                        INSERT INTO health_metrics (user_id, raw_entry_id, entry_date, processing_version, created_at)
+                        VALUES (%s, %s, %s, %s, NOW())
+                    """, (user_id, raw_entry_id, date(2999, 1, day), version))
+        conn.commit()
+        yield user_a, user_b, ids
+    finally:
+        conn.close()
+
+
+def test_plan_takes_newest_stale_entries_first(stale_entries):
+    user_a, user_b, ids = stale_entries
+
+    planned = plan_recompute(4, current_version=CURRENT)
+
+    # Same-day entries fall back to the newest id
+    assert [row['raw_entry_id'] for row in planned] == [
+        ids[(user_a, 5)], ids[(user_a, 4)], ids[(user_b, 3)], ids[(user_a, 3)]]
+    assert planned[0]['processing_version'] is None
+    assert ids[(user_a, 1)] not in [row['raw_entry_id'] for row in planned]
+
+
+def test_per_user_limit_caps_each_profile(stale_entries):
+    user_a, user_b, ids = stale_entries
+
+    planned = plan_recompute(4, current_version=CURRENT, per_user_limit=2)
+
+    assert [row['raw_entry_id'] for row in planned] == [
+        ids[(user_a, 5)], ids[(user_a, 4)], ids[(user_b, 3)], ids[(user_b, 2)]]
+
+
+def test_user_filter_and_excluded_ids(stale_entries):
+    user_a, _, ids = stale_entries
+
+    planned = plan_recompute(10, current_version=CURRENT, user_id=user_a,
+                             exclude_ids={ids[(user_a, 5)]})
+
+    assert [row['raw_entry_id'] for row in planned] == [ids[(user_a, 4)], ids[(user_a, 3)], ids[(user_a, 2)]]
+
+
+def test_report_counts_stale_versions_per_user(stale_entries):
+    user_a, _, _ = stale_entries
+
+    (report,) = get_stale_version_report(CURRENT, user_id=user_a)
+
+    assert (report['total_entries'], report['current_entries'], report['stale_entries']) == (5, 1, 4)
+    assert (report['oldest_stale_date'], report['newest_stale_date']) == (date(2999, 1, 2), date(2999, 1, 5))
+    assert sorted(report['versions']) == sorted([CURRENT, "p-old", "unversioned"])
@@ -0,0 +1,53 @@
+import argparse
+import os
+import shutil
+
+import reprocess
+from reprocess import advance_job, create_job, load_entries, load_manifest, retry_job
+
+
+ENTRIES = [
+    {"raw_entry_id": 11, "user_id": 1, "entry_text": "Ate spicy food, headache later", "entry_date": "2025-03-01"},
+    {"raw_entry_id": 12, "user_id": 1, "entry_text": "Slept 8 hours, feeling great", "entry_date": "2025-03-02"},
+]
+
+
+def job_args(work_dir, job_id):
+    return argparse.Namespace(work_dir=str(work_dir), job_id=job_id)
+
+
+def fail_current_batch(work_dir, job_id):
+    manifest = load_manifest(str(work_dir), job_id)
+    batch_id = manifest["batches"][manifest["phase"]]
+    shutil.rmtree(os.path.join(str(work_dir), "_local_batches", batch_id))
+
+
+def test_failed_job_stays_failed_and_is_retried_whole(tmp_path):
+    job_id = create_job(str(tmp_path), "local", ENTRIES, "stale", "p-test")
+    fail_current_batch(tmp_path, job_id)
+
+    assert advance_job(job_args(tmp_path, job_id))["phase"] == "failed"
+    assert advance_job(job_args(tmp_path, job_id))["phase"] == "failed"
+
+    retry_id = retry_job(job_args(tmp_path, job_id))
+    assert load_manifest(str(tmp_path), retry_id)["retry_of"] == job_id
+    assert [entry["raw_entry_id"] for entry in load_entries(str(tmp_path), retry_id)] == [11, 12]
+    assert retry_job(job_args(tmp_path, job_id)) is None
+
+
+def test_retry_resubmits_only_unapplied_entries(tmp_path):
+    job_id = create_job(str(tmp_path), "local", ENTRIES, None, "p-test")
+    manifest = load_manifest(str(tmp_path), job_id)
+    manifest.update(phase="done", applied=1, unapplied=[12])
+    reprocess.save_manifest(str(tmp_path), manifest)
+
+    retry_id = retry_job(job_args(tmp_path, job_id))
+    retried = load_manifest(str(tmp_path), retry_id)
+    assert retried["entry_count"] == 1
+    assert (retried["from_version"], retried["to_version"]) == (None, "p-test")
+    assert [entry["raw_entry_id"] for entry in load_entries(str(tmp_path), retry_id)] == [12]
+
+
+def test_running_job_is_not_retried(tmp_path):
+    job_id = create_job(str(tmp_path), "local", ENTRIES, None, "p-test")
+    assert retry_job(job_args(tmp_path, job_id)) is None
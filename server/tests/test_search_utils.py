@@ -0,0 +1,53 @@
+import pytest
+
+from utils.search_utils import decode_cursor, encode_cursor, search_entries
+
+
+class RecordingCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = None
+
+    def execute(self, sql, params):
+        self.executed = (sql, params)
+
+    def fetchall(self):
+        return self.rows
+
+
+class RecordingConnection:
+    def __init__(self, rows):
+        self.db_cursor = RecordingCursor(rows)
+
+    def cursor(self, cursor_factory=None):
+        return self.db_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(0.0607927, 42)
+
+    assert decode_cursor(cursor) == (0.0607927, 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_extra_row_produces_next_cursor():
+    rows = [{"id": i, "score": 0.5, "entry_date": None} for i in (9, 8, 7)]
+    conn = RecordingConnection(rows)
+
+    results, next_cursor = search_entries(conn, 1, "headache", limit=2)
+
+    assert [r["id"] for r in results] == [9, 8]
+    assert decode_cursor(next_cursor) == (0.5, 8)
+    assert conn.db_cursor.executed[1]["limit"] == 3
+
+
+def test_cursor_and_filters_are_applied_in_query():
+    conn = RecordingConnection([])
+    search_entries(conn, 1, "sleep", user_id=5, start_date="2025-01-01",
+                   cursor=encode_cursor(0.25, 100), fuzzy=True)
+    sql, params = conn.db_cursor.executed
+
+    assert "word_similarity" in sql and "ts_headline" not in sql
+    assert "(%(cursor_score)s::real, %(cursor_id)s)" in sql
+    assert (params["user_id"], params["start_date"], params["cursor_id"]) == (5, "2025-01-01", 100)
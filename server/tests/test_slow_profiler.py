@@ -0,0 +1,97 @@
+import threading
+import time
+import sys
+
+import pytest
+from flask import Flask, jsonify
+
+from utils import slow_profiler
+from utils.slow_profiler import RequestSamples, collapse_stack, init_slow_request_profiler, sampled_thread, request_samples
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+def wait_in_model_call(seconds):
+    time.sleep(seconds)
+
+
+def make_app(tmp_path, threshold_ms=30):
+    app = Flask(__name__)
+    app.config.update(ADMIN_API_TOKEN="secret", SLOW_REQUEST_PROFILE_MS=threshold_ms,
+                      SLOW_REQUEST_SAMPLE_INTERVAL_MS=1, SLOW_REQUEST_PROFILE_DIR=str(tmp_path))
+    init_slow_request_profiler(app)
+
+    @app.route("/slow")
+    def slow():
+        samples = request_samples()
+        worker = threading.Thread(target=lambda: _in_worker(samples))
+        worker.start()
+        wait_in_model_call(0.08)
+        worker.join()
+        return jsonify({})
+
+    @app.route("/fast")
+    def fast():
+        return jsonify({})
+
+    return app
+
+
+def _in_worker(samples):
+    with sampled_thread(samples, "import-extract"):
+        wait_in_model_call(0.05)
+
+
+@pytest.fixture(autouse=True)
+def fresh_sampler(monkeypatch):
+    monkeypatch.setattr(slow_profiler, "_sampler", None)
+
+
+def test_collapsed_stacks_run_from_root_to_leaf():
+    stack = collapse_stack(sys._getframe(), root="request")
+    assert stack.startswith("request;")
+    assert stack.endswith(f"{__name__}:test_collapsed_stacks_run_from_root_to_leaf")
+
+
+def test_report_ranks_hot_frames():
+    samples = RequestSamples("GET", "/x", "/x")
+    for _ in range(3):
+        samples.add("request;a:view;b:wait", "request")
+    samples.add("request;a:view;c:parse", "request")
+
+    report = samples.report(200, interval_ms=10)
+    assert report["samples"] == 4
+    assert report["hot_frames"][0] == {"frame": "b:wait", "samples": 3, "share": 0.75}
+
+
+def test_slow_requests_are_saved_and_listed(tmp_path):
+    client = make_app(tmp_path).test_client()
+
+    assert client.get("/fast").status_code == 200
+    assert client.get("/slow").status_code == 200
+
+    listed = client.get("/debug/slow-requests", headers=ADMIN).get_json()
+    assert [report["route"] for report in listed] == ["/slow"]
+    assert "stacks" not in listed[0]
+    assert listed[0]["threads"] == ["import-extract", "request"]
+
+    report = client.get(f"/debug/slow-requests/{listed[0]['id']}", headers=ADMIN).get_json()
+    assert any(stack.startswith("request;") and "wait_in_model_call" in stack for stack in report["stacks"])
+    assert any(stack.startswith("import-extract;") for stack in report["stacks"])
+
+    folded = client.get(f"/debug/slow-requests/{listed[0]['id']}?format=folded", headers=ADMIN)
+    assert folded.mimetype == "text/plain"
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded.get_data(as_text=True).splitlines())
+
+
+def test_endpoints_need_admin_token(tmp_path):
+    client = make_app(tmp_path).test_client()
+    assert client.get("/debug/slow-requests").status_code == 403
+    assert client.get("/debug/slow-requests/../../etc", headers=ADMIN).status_code == 404
+
+
+def test_disabled_without_threshold(tmp_path):
+    client = make_app(tmp_path, threshold_ms=0).test_client()
+    assert client.get("/slow").status_code == 200
+    assert client.get("/debug/slow-requests", headers=ADMIN).status_code == 404
+    assert slow_profiler._sampler is None
@@ -0,0 +1,56 @@
+import io
+import random
+import statistics
+from datetime import date, timedelta
+
+from benchmarks.synthetic import Trigger, make_persona, generate_diary, format_bulk_text
+from utils.import_utils import iter_bulk_entries
+
+
+def make_diary(seed=3, days=365):
+    rng = random.Random(seed)
+    persona = make_persona(rng)
+    return persona, list(generate_diary(persona, date(2024, 1, 1), days, rng)), rng
+
+
+def test_generation_is_reproducible():
+    _, first, _ = make_diary()
+    _, second, _ = make_diary()
+    assert [(e.entry_date, e.text, e.metrics) for e in first] == [(e.entry_date, e.text, e.metrics) for e in second]
+
+
+def test_bulk_text_parses_back_into_the_same_days():
+    persona, entries, rng = make_diary(days=120)
+    for pattern in ("{month} {day}, {year}", "**{month} {day}, {year}**", "{m:02d}/{d:02d}/{year}", "{year}/{m}/{d}"):
+        persona.date_format = pattern
+        parsed = list(iter_bulk_entries(io.StringIO(format_bulk_text(entries, persona, rng))))
+        assert [entry["date"] for entry in parsed] == [entry.entry_date for entry in entries]
+        assert [entry["text"] for entry in parsed] == [entry.text.replace("\n\n", "\n") for entry in entries]
+
+
+def test_metrics_are_correlated_and_in_range():
+    _, entries, _ = make_diary(days=730)
+    for entry in entries:
+        assert 1 <= entry.metrics["mood_score"] <= 10
+        assert 0 <= entry.metrics["pain_level"] <= 10
+        assert 3 <= entry.metrics["sleep_hours"] <= 11
+
+    sleep = [entry.metrics["sleep_hours"] for entry in entries]
+    energy = [entry.metrics["energy_level"] for entry in entries]
+    assert statistics.correlation(sleep, energy) > 0.3
+
+
+def test_triggers_have_lagged_effects_mentioned_in_text():
+    rng = random.Random(5)
+    persona = make_persona(rng)
+    persona.regularity = 1.0
+    persona.triggers = [Trigger(persona.usual_foods[0], "migraine", lag_days=1, pain_effect=4.0, probability=1.0)]
+    entries = list(generate_diary(persona, date(2024, 1, 1), 400, rng))
+    by_date = {entry.entry_date: entry for entry in entries}
+
+    after_trigger = [by_date[e.entry_date + timedelta(days=1)] for e in entries
+                     if persona.usual_foods[0] in e.foods and e.entry_date + timedelta(days=1) in by_date]
+    others = [e for e in entries if "migraine" not in e.symptoms]
+    assert after_trigger and all("migraine" in e.symptoms and "migraine" in e.text for e in after_trigger)
+    assert statistics.mean(e.metrics["pain_level"] for e in after_trigger) > \
+        statistics.mean(e.metrics["pain_level"] for e in others) + 2
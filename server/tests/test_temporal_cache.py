@@ -0,0 +1,113 @@
+from datetime import date
+from unittest.mock import patch
+from utils.temporal_cache import TemporalContextCache
+
+
+def _row(day, text, mood=None):
+    return {"entry_date": date(2025, 6, day), "entry_text": text, "content_hash": f"hash-{text}",
+            "created_at": None, "mood_score": mood}
+
+
+@patch("utils.temporal_cache._load_entries")
+def test_window_serves_consecutive_days_from_one_query(mock_load):
+    mock_load.return_value = [_row(d, f"day {d}") for d in range(1, 11)]
+    cache = TemporalContextCache()
+    cache.prime(1, date(2025, 6, 1), date(2025, 6, 11))
+
+    for day in range(4, 11):
+        entries = cache.get_entries(1, date(2025, 6, day), days_back=3)
+        assert [e["entry_text"] for e in entries] == [f"day {day - 1}", f"day {day - 2}", f"day {day - 3}"]
+
+    assert mock_load.call_count == 1
+
+
+@patch("utils.temporal_cache._load_entries")
+def test_lookup_outside_window_extends_it(mock_load):
+    mock_load.return_value = []
+    cache = TemporalContextCache()
+    cache.get_entries(1, date(2025, 6, 10), days_back=3)
+    cache.get_entries(1, date(2025, 6, 11), days_back=3)
+
+    assert mock_load.call_args_list[-1].args == (1, date(2025, 6, 7), date(2025, 6, 11))
+    cache.get_entries(1, date(2025, 6, 10), days_back=2)
+    assert mock_load.call_count == 2
+
+
+@patch("utils.temporal_cache._load_entries")
+def test_import_batch_entries_visible_until_closed(mock_load):
+    mock_load.return_value = [_row(1, "committed", mood=5)]
+    cache = TemporalContextCache()
+    batch = cache.start_batch(1)
+    batch.add(_row(2, "pending", mood=7))
+
+    with_batch = cache.get_entries(1, date(2025, 6, 3), days_back=3, batch=batch)
+    without_batch = cache.get_entries(1, date(2025, 6, 3), days_back=3)
+
+    assert [e["entry_text"] for e in with_batch] == ["pending", "committed"]
+    assert [e["entry_text"] for e in without_batch] == ["committed"]
+
+    batch.close()
+    cache.get_entries(1, date(2025, 6, 3), days_back=3)
+    assert mock_load.call_count == 2
+
+
+@patch("utils.temporal_cache._load_entries")
+def test_invalidate_forces_reload(mock_load):
+    mock_load.return_value = []
+    cache = TemporalContextCache()
+    cache.get_entries(7, date(2025, 6, 3))
+    cache.invalidate(7)
+    cache.get_entries(7, date(2025, 6, 3))
+
+    assert mock_load.call_count == 2
+
+
+@patch("utils.temporal_cache._load_entries")
+def test_committed_batch_entries_are_not_merged_twice(mock_load):
+    mock_load.return_value = []
+    cache = TemporalContextCache()
+    batch = cache.start_batch(1)
+    batch.add(_row(1, "first"))
+    batch.add(_row(2, "second"))
+    cache.get_entries(1, date(2025, 6, 3), days_back=3, batch=batch)
+
+    # The window expires while the rows are committed but still pending
+    mock_load.return_value = [_row(1, "first"), _row(2, "second")]
+    cache.invalidate(1)
+    entries = cache.get_entries(1, date(2025, 6, 3), days_back=3, batch=batch)
+    assert [e["entry_text"] for e in entries] == ["second", "first"]
+
+    batch.committed({(date(2025, 6, 1), "hash-first"): 11})
+    assert [e["entry_text"] for e in batch.pending] == ["second"]
+    entries = cache.get_entries(1, date(2025, 6, 3), days_back=3, batch=batch)
+    assert [e["entry_text"] for e in entries] == ["second", "first"]
+    assert mock_load.call_count == 2
+
+
+@patch("utils.temporal_cache._load_entries")
+def test_committed_entries_move_into_the_window(mock_load):
+    mock_load.return_value = [_row(1, "stored")]
+    cache = TemporalContextCache()
+    cache.prime(1, date(2025, 5, 29), date(2025, 6, 10))
+    batch = cache.start_batch(1)
+    batch.add(_row(2, "imported", mood=6))
+
+    batch.committed({(date(2025, 6, 2), "hash-imported"): 42})
+
+    assert batch.pending == []
+    entries = cache.get_entries(1, date(2025, 6, 3), days_back=3)
+    assert [(e["entry_text"], e.get("id")) for e in entries] == [("imported", 42), ("stored", None)]
+    assert mock_load.call_count == 1
+
+
+@patch("utils.temporal_cache._load_entries")
+def test_import_lookups_read_ahead(mock_load):
+    mock_load.return_value = []
+    cache = TemporalContextCache()
+    batch = cache.start_batch(1)
+
+    for day in range(1, 31):
+        cache.get_entries(1, date(2025, 6, day), days_back=3, batch=batch)
+
+    assert mock_load.call_count == 1
+    assert mock_load.call_args.args == (1, date(2025, 5, 29), date(2025, 7, 1))
@@ -0,0 +1,74 @@
+from datetime import date
+
+from utils.ai_utils import format_temporal_context, summarize_extraction, estimate_tokens
+
+
+def make_entry(day, **fields):
+    entry = {"entry_date": date(2025, 6, day), "entry_text": "Long day at work, " * 20, "extraction_details": None}
+    entry.update(fields)
+    return entry
+
+
+def test_summarize_keeps_structured_fields_only():
+    details = summarize_extraction({
+        "confidence": 0.8,
+        "mood_score": 6,
+        "symptoms": ["headache"],
+        "food_intake": ["ghee rice", "dal"],
+        "locations": ["office"],
+        "temporal_analysis": {"delayed_food_effects": [
+            {"food": "ghee", "consumed_when": "last night", "potential_symptom": "headache", "confidence": "medium"}
+        ]}
+    })
+
+    assert details == {
+        "symptoms": ["headache"],
+        "food_intake": ["ghee rice", "dal"],
+        "delayed_effects": [{"food": "ghee", "symptom": "headache", "confidence": "medium"}]
+    }
+    assert summarize_extraction({"confidence": 0.0, "symptoms": ["x"]}) is None
+
+
+def test_structured_entries_are_encoded_without_raw_text():
+    context = format_temporal_context([make_entry(
+        18, mood_score=7, pain_level=0, sleep_hours=6.5,
+        extraction_details={"symptoms": ["headache"], "delayed_effects": [
+            {"food": "ghee", "symptom": "headache", "confidence": "medium"}
+        ]}
+    )])
+
+    line = context.splitlines()[1]
+    assert line == "2025-06-18 | m7 p0 sh6.5 | sym: headache | delayed: ghee->headache(med)"
+    assert "Long day" not in context
+
+
+def test_numeric_delayed_effect_confidence_is_encoded():
+    details = summarize_extraction({
+        "confidence": 0.8,
+        "temporal_analysis": {"delayed_food_effects": [
+            {"food": "pickles", "potential_symptom": "bloating", "confidence": 0.7}
+        ]}
+    })
+    assert details["delayed_effects"] == [{"food": "pickles", "symptom": "bloating", "confidence": "0.7"}]
+
+    # Rows stored before confidences were saved as text
+    context = format_temporal_context([make_entry(18, extraction_details={"delayed_effects": [
+        {"food": "pickles", "symptom": "bloating", "confidence": 0.7}
+    ]})])
+    assert context.splitlines()[1] == "2025-06-18 | delayed: pickles->bloating(0.7)"
+
+
+def test_entries_without_details_fall_back_to_short_preview():
+    line = format_temporal_context([make_entry(17, mood_score=4)]).splitlines()[1]
+
+    assert line.startswith("2025-06-17 | m4 | note: Long day at work")
+    assert len(line) < 120
+
+
+def test_token_cap_keeps_newest_entries():
+    entries = [make_entry(day, mood_score=5) for day in (20, 19, 18, 17, 16)]
+    context = format_temporal_context(entries, max_tokens=80)
+
+    assert estimate_tokens(context) <= 80
+    assert "2025-06-20" in context
+    assert "2025-06-16" not in context
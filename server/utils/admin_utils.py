@@ -0,0 +1,33 @@
+# utils/admin_utils.py
+"""
+Access control for operator-only (debug and profiling) endpoints.
+
+These endpoints are not tied to a family, so they are guarded by a shared
+secret instead of a JWT: the caller sends ADMIN_API_TOKEN in the
+X-Admin-Token header. Without a configured token the endpoints do not exist
+(404).
+"""
+
+import hmac
+from functools import wraps
+from flask import current_app, jsonify, request
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def is_admin_request():
+    token = current_app.config.get('ADMIN_API_TOKEN')
+    supplied = request.headers.get(ADMIN_TOKEN_HEADER, "")
+    return bool(token) and hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8"))
+
+
+def admin_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_app.config.get('ADMIN_API_TOKEN'):
+            return jsonify({"error": "Not found"}), 404
+        if not is_admin_request():
+            return jsonify({"error": "Admin token required"}), 403
+        return view(*args, **kwargs)
+
+    return wrapper
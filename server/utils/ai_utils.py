@@ -1,181 +1,304 @@
 # utils/ai_utils.py
 
 import json
+import logging
+import time
 from datetime import datetime, timedelta
 from openai import OpenAI
 import os
-from psycopg2.extras import RealDictCursor
-from .db_utils import get_db_connection
+from .temporal_cache import temporal_cache, load_entries_by_id
+from .vector_index import find_similar_entries
+from .metrics import observe_model_call
+from .model_usage import usage_recorder, model_usage_scope
+from . import rate_limit
+from .model_scheduler import model_scheduler, ModelQueueTimeout
 from prompts import (
     ENTRY_CATEGORIZATION_PROMPT_TEMPLATE,
-    ADAPTIVE_PROMPT_HEADER_TEMPLATE,
-    TEMPORAL_ANALYSIS_GUIDELINES,
-    STANDARD_EXTRACTION_FORMAT,
-    TEMPORAL_STRUCTURE_BLOCK,
-    SCORING_GUIDELINES
+    PROMPT_VERSION,
+    build_extraction_prompt
 )
 
 openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
-def extract_health_data_with_ai(diary_text, user_id=1, entry_date=None):
-    """Full AI-driven health analysis pipeline"""
+logger = logging.getLogger(__name__)
+
+EXTRACTION_MODEL = "gpt-4o"
+
+# How many previous days feed the temporal context, and its token budget
+TEMPORAL_CONTEXT_DAYS = int(os.getenv('TEMPORAL_CONTEXT_DAYS', 3))
+TEMPORAL_CONTEXT_MAX_TOKENS = int(os.getenv('TEMPORAL_CONTEXT_MAX_TOKENS', 400))
+# Older days whose entries read most like the current one (0 disables)
+TEMPORAL_SIMILAR_DAYS = int(os.getenv('TEMPORAL_SIMILAR_DAYS', 2))
+SIMILAR_DAY_MIN_SCORE = 0.3
+
+
+def build_categorization_request(diary_text):
+    """Chat completion arguments for the categorization step"""
+    return {
+        "model": EXTRACTION_MODEL,
+        "messages": [{"role": "user", "content": ENTRY_CATEGORIZATION_PROMPT_TEMPLATE.format(diary_text=diary_text)}],
+        "temperature": 0.1,
+        "max_tokens": 300
+    }
+
+
+def build_extraction_request(diary_text, themes, temporal_context, similar_days=None):
+    """Chat completion arguments for the adaptive extraction step"""
+    prompt = build_complete_adaptive_prompt(diary_text, themes, temporal_context, similar_days)
+    return {
+        "model": EXTRACTION_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.1,
+        "max_tokens": 2000
+    }
+
+
+def create_chat_completion(call_site, client=None, **request):
+    """
+    chat.completions.create with latency, token and error metrics per call
+    site, and a usage record (utils.model_usage) for cost accounting.
+    Waits for a slot of the model call scheduler first (utils.model_scheduler);
+    the latency excludes that wait.
+    """
+    client = client or openai_client
+    return _call_model(call_site, request, client.chat.completions.create)
+
+
+def create_embedding(call_site, client=None, **request):
+    """embeddings.create with the same scheduling, metrics and usage records"""
+    client = client or openai_client
+    return _call_model(call_site, request, client.embeddings.create)
+
+
+def _call_model(call_site, request, create):
+    with model_scheduler.slot():
+        started = time.perf_counter()
+        try:
+            response = create(**request)
+        except Exception as e:
+            seconds = time.perf_counter() - started
+            observe_model_call(call_site, request.get("model"), seconds, error=e)
+            usage_recorder.record(call_site, request.get("model"), seconds, error=e)
+            if rate_limit.rate_limiter is not None and getattr(e, "status_code", None) == 429:
+                rate_limit.rate_limiter.upstream_throttled()
+            raise
+        seconds = time.perf_counter() - started
+    observe_model_call(call_site, request.get("model"), seconds, response=response)
+    usage_recorder.record(call_site, request.get("model"), seconds, usage=getattr(response, "usage", None))
+    if rate_limit.rate_limiter is not None:
+        rate_limit.rate_limiter.upstream_ok()
+    return response
+
+
+def parse_model_json(raw_text):
+    """Strips markdown code fences from a model reply and parses the JSON inside"""
+    raw_text = raw_text.strip()
+    if raw_text.startswith("```json"):
+        raw_text = raw_text.strip("```json").strip("```")
+    elif raw_text.startswith("```"):
+        raw_text = raw_text.strip("```")
+    return json.loads(raw_text)
+
+
+def extract_health_data_with_ai(diary_text, user_id=1, entry_date=None, import_batch=None):
+    """
+    Full AI-driven health analysis pipeline.
+    `import_batch` makes not-yet-committed entries of a bulk import visible
+    to the temporal context. ModelQueueTimeout is raised rather than answered
+    with fallback data, so callers can ask the client to retry.
+    """
     try:
-        # Step 1: Categorize entry
-        categorization_prompt = ENTRY_CATEGORIZATION_PROMPT_TEMPLATE.format(diary_text=diary_text)
-
-        categorization_response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": categorization_prompt}],
-            temperature=0.1,
-            max_tokens=300
-        )
-        raw_categorization = categorization_response.choices[0].message.content.strip()
-        if raw_categorization.startswith("```json"):
-            raw_categorization = raw_categorization.strip("```json").strip("```")
-        themes_data = json.loads(raw_categorization)
-        themes = themes_data.get("primary_themes", {})
-
-        # Step 2: Temporal context
-        temporal_context = get_temporal_context(user_id, entry_date)
-
-        # Step 3: Adaptive prompt
-        adaptive_prompt = build_complete_adaptive_prompt(diary_text, themes, temporal_context)
-
-        # Step 4: Final AI extraction
-        final_response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": adaptive_prompt}],
-            temperature=0.1,
-            max_tokens=2000
-        )
-        ai_text = final_response.choices[0].message.content.strip()
-        if ai_text.startswith("```json"):
-            ai_text = ai_text.strip("```json").strip("```")
-
-        result = json.loads(ai_text)
+        with model_usage_scope(user_id=user_id):
+            # Step 1: Categorize entry
+            categorization_response = create_chat_completion(
+                "categorization", **build_categorization_request(diary_text)
+            )
+            themes_data = parse_model_json(categorization_response.choices[0].message.content)
+            themes = themes_data.get("primary_themes", {})
+
+            # Step 2: Temporal context
+            temporal_context = get_temporal_context(user_id, entry_date, import_batch=import_batch)
+            similar_days = get_similar_days(user_id, diary_text, entry_date)
+
+            # Step 3 + 4: Adaptive prompt and final AI extraction
+            final_response = create_chat_completion(
+                "extraction", **build_extraction_request(diary_text, themes, temporal_context, similar_days)
+            )
+        result = parse_model_json(final_response.choices[0].message.content)
         result["entry_categorization"] = themes_data
         result["temporal_context_used"] = len(temporal_context)
+        result["similar_days_used"] = len(similar_days)
+        result["processing_version"] = PROMPT_VERSION
 
         return result
 
+    except ModelQueueTimeout:
+        raise
     except Exception as e:
-        print(f"❌ AI error: {e}")
+        logger.exception("Health data extraction failed, using fallback", extra={"user_id": user_id})
         return get_enhanced_fallback_data()
 
 
-def build_complete_adaptive_prompt(diary_text, themes, temporal_context):
+def build_complete_adaptive_prompt(diary_text, themes, temporal_context, similar_days=None):
     """Builds smart adaptive prompt using categories + temporal context"""
-    prompt = ADAPTIVE_PROMPT_HEADER_TEMPLATE.format(
-        diary_text=diary_text,
-        temporal_context=format_temporal_context(temporal_context)
-    )
-
-    if themes.get("food_focused"):
-        prompt += """
-🍽️ ENHANCED FOOD ANALYSIS:
-- Categorize foods by macronutrients
-- Identify meal timing patterns and delays
-- Track food variety vs repetition and delayed symptom correlations
-"""
-
-    if themes.get("relationship_focused"):
-        prompt += """
-👥 ENHANCED SOCIAL ANALYSIS:
-- Assess social support/conflict and emotional impact
-"""
-
-    if themes.get("physical_symptoms"):
-        prompt += """
-🩺 ENHANCED SYMPTOM ANALYSIS:
-- Identify pain/symptom timing, triggers, and trends
-"""
-
-    if themes.get("sleep_focused"):
-        prompt += """
-😴 ENHANCED SLEEP ANALYSIS:
-- Connect sleep quality with stress, food, or late activities
-"""
-
-    if themes.get("mood_emotions") or themes.get("work_stress"):
-        prompt += """
-🧠 STRESS/MOOD ANALYSIS:
-- Identify mood triggers, stress accumulation, and emotional coping patterns
-"""
-
-    prompt += "\n" + TEMPORAL_ANALYSIS_GUIDELINES
-    prompt += "\n" + STANDARD_EXTRACTION_FORMAT
-    prompt += "," + TEMPORAL_STRUCTURE_BLOCK
-    prompt += "\n" + SCORING_GUIDELINES
-
-    return prompt
-
-
-def get_temporal_context(user_id, current_entry_date=None, days_back=3):
-    """Returns previous diary entries with health scores"""
+    return build_extraction_prompt(diary_text, themes, format_temporal_context(temporal_context, similar_days=similar_days))
+
+
+def _as_date(value):
+    if value is None:
+        return datetime.now().date()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def get_temporal_context(user_id, current_entry_date=None, days_back=None, import_batch=None):
+    """Returns previous diary entries with health scores (served from the temporal cache)"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return []
-
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        if current_entry_date is None:
-            current_entry_date = datetime.now().date()
-        elif isinstance(current_entry_date, str):
-            current_entry_date = datetime.fromisoformat(current_entry_date).date()
-
-        start_date = current_entry_date - timedelta(days=days_back)
-        end_date = current_entry_date
-
-        cursor.execute("""
-            SELECT 
-                re.entry_date,
-                re.entry_text,
-                re.created_at,
-                hm.mood_score,
-                hm.energy_level,
-                hm.pain_level,
-                hm.sleep_quality,
-                hm.sleep_hours,
-                hm.stress_level
-            FROM raw_entries re
-            LEFT JOIN health_metrics hm ON re.id = hm.raw_entry_id
-            WHERE re.user_id = %s 
-            AND re.entry_date >= %s 
-            AND re.entry_date < %s
-            ORDER BY re.entry_date DESC, re.created_at DESC
-        """, (user_id, start_date, end_date))
-
-        return [dict(row) for row in cursor.fetchall()]
+        current_entry_date = _as_date(current_entry_date)
+        if days_back is None:
+            days_back = TEMPORAL_CONTEXT_DAYS
+
+        return temporal_cache.get_entries(user_id, current_entry_date, days_back, batch=import_batch)
 
     except Exception as e:
-        print(f"❌ Temporal context error: {e}")
+        logger.warning("Loading temporal context failed: %s", e)
         return []
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 
-def format_temporal_context(temporal_data):
-    """Formats recent entry history into readable context string"""
-    if not temporal_data:
+# Compact history encoding: short metric keys, capped tag lists, no raw text
+# unless an older entry has no structured extraction stored
+CONTEXT_METRIC_KEYS = [
+    ("mood_score", "m"), ("energy_level", "e"), ("pain_level", "p"),
+    ("sleep_quality", "sq"), ("sleep_hours", "sh"), ("stress_level", "st")
+]
+CONTEXT_TAG_KEYS = [
+    ("symptoms", "sym"), ("food_intake", "food"), ("activities", "act"),
+    ("triggers", "trig"), ("medications", "med")
+]
+CONTEXT_MAX_TAGS = 5
+CONTEXT_TEXT_FALLBACK_CHARS = 80
+
+
+def summarize_extraction(ai_data):
+    """
+    Structured subset of an extraction result stored with the metrics and
+    reused as temporal context. Returns None for fallback (failed) results,
+    which carry zero confidence.
+    """
+    if not ai_data or not ai_data.get("confidence"):
+        return None
+
+    details = {key: [str(v) for v in (ai_data.get(key) or [])][:CONTEXT_MAX_TAGS]
+               for key, _ in CONTEXT_TAG_KEYS}
+    details["delayed_effects"] = [
+        {
+            "food": effect.get("food"),
+            "symptom": effect.get("potential_symptom"),
+            # Models return either a label ("high") or a number (0.7)
+            "confidence": str(effect["confidence"]) if effect.get("confidence") is not None else None
+        }
+        for effect in (ai_data.get("temporal_analysis") or {}).get("delayed_food_effects") or []
+        if isinstance(effect, dict) and effect.get("food")
+    ][:CONTEXT_MAX_TAGS]
+    return {key: value for key, value in details.items() if value}
+
+
+def _format_context_line(entry):
+    parts = [str(entry["entry_date"])]
+    metrics = [f"{short}{entry[key]}" for key, short in CONTEXT_METRIC_KEYS if entry.get(key) is not None]
+    if metrics:
+        parts.append(" ".join(metrics))
+
+    details = entry.get("extraction_details")
+    if details:
+        for key, short in CONTEXT_TAG_KEYS:
+            if details.get(key):
+                parts.append(f"{short}: {', '.join(details[key])}")
+        if details.get("delayed_effects"):
+            parts.append("delayed: " + ", ".join(
+                f"{e['food']}->{e.get('symptom') or '?'}({str(e.get('confidence') or '?')[:3]})"
+                for e in details["delayed_effects"]
+            ))
+    elif entry.get("entry_text"):
+        text = " ".join(entry["entry_text"].split())
+        parts.append("note: " + text[:CONTEXT_TEXT_FALLBACK_CHARS] + ("..." if len(text) > CONTEXT_TEXT_FALLBACK_CHARS else ""))
+
+    return " | ".join(parts)
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) used for the context cap"""
+    return (len(text) + 3) // 4
+
+
+def format_temporal_context(temporal_data, max_tokens=None, similar_days=None):
+    """
+    Formats recent entry history as one compact line per entry, newest first,
+    dropping the oldest lines once the token cap is reached. Similar older
+    days are appended in whatever budget the recent history leaves.
+    """
+    if not temporal_data and not similar_days:
         return "No recent entries available for temporal analysis."
 
-    formatted = "RECENT HEALTH HISTORY:\n"
-    for entry in temporal_data:
-        date = entry["entry_date"]
-        text = entry["entry_text"]
-        metrics = []
-
-        if entry.get("mood_score"): metrics.append(f"mood: {entry['mood_score']}/10")
-        if entry.get("energy_level"): metrics.append(f"energy: {entry['energy_level']}/10")
-        if entry.get("pain_level"): metrics.append(f"pain: {entry['pain_level']}/10")
-        if entry.get("sleep_hours"): metrics.append(f"sleep: {entry['sleep_hours']} hrs")
+    max_tokens = TEMPORAL_CONTEXT_MAX_TOKENS if max_tokens is None else max_tokens
+    lines = []
+    budget = max_tokens
+
+    sections = [
+        ("RECENT HEALTH HISTORY (newest first; m=mood e=energy p=pain sq=sleep quality sh=sleep hours st=stress):",
+         temporal_data or [], _format_context_line),
+        ("SIMILAR PAST DAYS (most similar first, same encoding):",
+         similar_days or [], lambda entry: f"{_format_context_line(entry)} | sim {entry['similarity']}"),
+    ]
+    for header, entries, format_line in sections:
+        if not entries:
+            continue
+        header_cost = estimate_tokens(header) + 1
+        if header_cost > budget:
+            break
+        section = [header]
+        section_budget = budget - header_cost
+        for entry in entries:
+            line = format_line(entry)
+            cost = estimate_tokens(line) + 1
+            if cost > section_budget:
+                break
+            section.append(line)
+            section_budget -= cost
+        if len(section) > 1 or not lines:
+            lines.extend(section)
+            budget = section_budget
+
+    return "\n".join(lines)
+
+
+def get_similar_days(user_id, diary_text, current_entry_date=None, limit=None):
+    """
+    Older entries (before the recent-context window) that read most like
+    `diary_text`, most similar first, in the temporal context row shape plus
+    a `similarity` score.
+    """
+    limit = TEMPORAL_SIMILAR_DAYS if limit is None else limit
+    if limit <= 0 or not diary_text:
+        return []
+    try:
+        window_start = _as_date(current_entry_date) - timedelta(days=TEMPORAL_CONTEXT_DAYS)
+        matches = [match for match in find_similar_entries(user_id, text=diary_text, k=limit, before_date=window_start)
+                   if match[2] >= SIMILAR_DAY_MIN_SCORE]
+        rows = {row["id"]: row for row in load_entries_by_id(user_id, [entry_id for entry_id, _, _ in matches])}
 
-        metrics_str = f" [{', '.join(metrics)}]" if metrics else ""
-        preview = text[:200] + ("..." if len(text) > 200 else "")
-        formatted += f"\n{date}{metrics_str}:\n{preview}\n"
+        similar_days = []
+        for entry_id, _, score in matches:
+            if entry_id in rows:
+                similar_days.append({**rows[entry_id], "similarity": round(score, 2)})
+        return similar_days
 
-    return formatted
+    except Exception as e:
+        logger.warning("Loading similar days failed: %s", e)
+        return []
 
 
 def get_enhanced_fallback_data():
@@ -0,0 +1,307 @@
+# utils/batch_utils.py
+"""
+Batch-API helpers for offline reprocessing of historical entries.
+
+Entries are re-scored in two batch phases that mirror the interactive pipeline
+(categorization, then adaptive extraction). Requests are written as JSONL in the
+OpenAI Batch format, handed to a BatchProvider and the results are applied to
+health_metrics in bulk.
+"""
+
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from psycopg2.extras import RealDictCursor, execute_values
+from .db_utils import get_db_connection, json_param
+from .ai_utils import (
+    openai_client,
+    build_categorization_request,
+    build_extraction_request,
+    parse_model_json,
+    get_temporal_context,
+    get_similar_days,
+    summarize_extraction,
+    TEMPORAL_CONTEXT_DAYS
+)
+from .temporal_cache import temporal_cache
+from .etag import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+
+PHASE_CATEGORIZE = "categorize"
+PHASE_EXTRACT = "extract"
+
+METRIC_FIELDS = [
+    "mood_score", "energy_level", "pain_level",
+    "sleep_quality", "sleep_hours", "stress_level"
+]
+
+
+# ---------------------------
+# PROVIDERS
+# ---------------------------
+
+class BatchProvider:
+    """Interface for batch-style model providers"""
+
+    def submit(self, input_path, description=None):
+        """Submit a JSONL request file and return a batch id"""
+        raise NotImplementedError
+
+    def get_status(self, batch_id):
+        """Return 'in_progress', 'completed' or 'failed'"""
+        raise NotImplementedError
+
+    def fetch_results(self, batch_id):
+        """Return the raw output JSONL lines of a completed batch"""
+        raise NotImplementedError
+
+
+class OpenAIBatchProvider(BatchProvider):
+    """Submits batches through the OpenAI Batch API (24h completion window)"""
+
+    def __init__(self, client=None, completion_window="24h"):
+        self.client = client or openai_client
+        self.completion_window = completion_window
+
+    def submit(self, input_path, description=None):
+        with open(input_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=CHAT_COMPLETIONS_URL,
+            completion_window=self.completion_window,
+            metadata={"description": description or "health diary reprocessing"}
+        )
+        return batch.id
+
+    def get_status(self, batch_id):
+        status = self.client.batches.retrieve(batch_id).status
+        if status == "completed":
+            return "completed"
+        if status in ("failed", "expired", "cancelled"):
+            return "failed"
+        return "in_progress"
+
+    def fetch_results(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        if not batch.output_file_id:
+            return []
+        content = self.client.files.content(batch.output_file_id)
+        return [line for line in content.text.splitlines() if line.strip()]
+
+
+class LocalFileBatchProvider(BatchProvider):
+    """
+    File-based stand-in for testing and local runs.
+    Batches complete immediately; `responder(body)` returns the message content
+    for each request (defaults to an empty JSON object).
+    """
+
+    def __init__(self, work_dir, responder=None):
+        self.work_dir = work_dir
+        self.responder = responder or (lambda body: "{}")
+        os.makedirs(self.work_dir, exist_ok=True)
+
+    def _batch_dir(self, batch_id):
+        return os.path.join(self.work_dir, batch_id)
+
+    def submit(self, input_path, description=None):
+        batch_id = f"local-batch-{uuid.uuid4().hex[:12]}"
+        batch_dir = self._batch_dir(batch_id)
+        os.makedirs(batch_dir)
+        shutil.copy(input_path, os.path.join(batch_dir, "input.jsonl"))
+
+        with open(input_path) as src, open(os.path.join(batch_dir, "output.jsonl"), "w") as out:
+            for line in src:
+                if not line.strip():
+                    continue
+                request_line = json.loads(line)
+                content = self.responder(request_line["body"])
+                out.write(json.dumps({
+                    "custom_id": request_line["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {"role": "assistant", "content": content}}]}
+                    },
+                    "error": None
+                }) + "\n")
+        return batch_id
+
+    def get_status(self, batch_id):
+        if os.path.exists(os.path.join(self._batch_dir(batch_id), "output.jsonl")):
+            return "completed"
+        return "failed"
+
+    def fetch_results(self, batch_id):
+        with open(os.path.join(self._batch_dir(batch_id), "output.jsonl")) as f:
+            return [line for line in f if line.strip()]
+
+
+# ---------------------------
+# REQUEST BUILDING
+# ---------------------------
+
+def make_custom_id(phase, raw_entry_id):
+    return f"{phase}-{raw_entry_id}"
+
+
+def parse_custom_id(custom_id):
+    phase, raw_entry_id = custom_id.rsplit("-", 1)
+    return phase, int(raw_entry_id)
+
+
+def build_categorization_batch(entries):
+    """One categorization request per entry"""
+    return [{
+        "custom_id": make_custom_id(PHASE_CATEGORIZE, entry["raw_entry_id"]),
+        "method": "POST",
+        "url": CHAT_COMPLETIONS_URL,
+        "body": build_categorization_request(entry["entry_text"])
+    } for entry in entries]
+
+
+def build_extraction_batch(entries, categorizations):
+    """One adaptive extraction request per entry, using phase-one themes"""
+    # One window query per user serves every temporal context lookup for that user
+    date_spans = {}
+    for entry in entries:
+        if entry["entry_date"]:
+            first, last = date_spans.get(entry["user_id"], (entry["entry_date"], entry["entry_date"]))
+            date_spans[entry["user_id"]] = (min(first, entry["entry_date"]), max(last, entry["entry_date"]))
+    for user_id, (first, last) in date_spans.items():
+        temporal_cache.prime(user_id, first - timedelta(days=TEMPORAL_CONTEXT_DAYS), last)
+
+    requests = []
+    for entry in entries:
+        themes = categorizations.get(entry["raw_entry_id"], {}).get("primary_themes", {})
+        temporal_context = get_temporal_context(entry["user_id"], entry["entry_date"])
+        similar_days = get_similar_days(entry["user_id"], entry["entry_text"], entry["entry_date"])
+        requests.append({
+            "custom_id": make_custom_id(PHASE_EXTRACT, entry["raw_entry_id"]),
+            "method": "POST",
+            "url": CHAT_COMPLETIONS_URL,
+            "body": build_extraction_request(entry["entry_text"], themes, temporal_context, similar_days)
+        })
+    return requests
+
+
+def write_batch_file(path, requests):
+    with open(path, "w") as f:
+        for request_line in requests:
+            f.write(json.dumps(request_line, default=str) + "\n")
+    return path
+
+
+def parse_batch_results(lines):
+    """
+    Maps raw_entry_id -> parsed JSON content for every successful result line.
+    Failed or unparseable results are left out; `reprocess.py retry` resubmits
+    the entries that ended up without a result.
+    """
+    parsed = {}
+    for line in lines:
+        try:
+            result = json.loads(line)
+            _, raw_entry_id = parse_custom_id(result["custom_id"])
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                continue
+            content = response["body"]["choices"][0]["message"]["content"]
+            parsed[raw_entry_id] = parse_model_json(content)
+        except Exception as e:
+            logger.warning("Skipping unusable batch result: %s", e)
+    return parsed
+
+
+# ---------------------------
+# DATABASE ACCESS
+# ---------------------------
+
+def fetch_entries_for_version(processing_version, user_id=None, limit=None):
+    """
+    Entries whose metrics were produced by `processing_version`.
+    A version of None selects entries that were never versioned (or never scored).
+    """
+    conn = get_db_connection()
+    if not conn:
+        return []
+
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        query = """
+            SELECT re.id AS raw_entry_id, re.user_id, re.entry_text, re.entry_date
+            FROM raw_entries re
+            LEFT JOIN health_metrics hm ON re.id = hm.raw_entry_id
+            WHERE hm.processing_version IS NOT DISTINCT FROM %s
+        """
+        params = [processing_version]
+        if user_id:
+            query += " AND re.user_id = %s"
+            params.append(user_id)
+        query += " ORDER BY re.user_id, re.entry_date"
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def apply_extraction_results(entries, results, processing_version, page_size=500):
+    """
+    Upserts health_metrics for every entry with a result in a single batched
+    statement per page. Returns the number of rows written.
+    """
+    rows = []
+    now = datetime.now()
+    for entry in entries:
+        data = results.get(entry["raw_entry_id"])
+        if data is None:
+            continue
+        rows.append((
+            entry["user_id"], entry["raw_entry_id"], entry["entry_date"],
+            *[data.get(field) for field in METRIC_FIELDS],
+            data.get("confidence", 0.0), processing_version,
+            json_param(summarize_extraction(data)), now
+        ))
+
+    if not rows:
+        return 0
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    try:
+        cursor = conn.cursor()
+        execute_values(cursor, """
+            INSERT INTO health_metrics (
+                user_id, raw_entry_id, entry_date, mood_score, energy_level,
+                pain_level, sleep_quality, sleep_hours, stress_level,
+                ai_confidence, processing_version, extraction_details, created_at
+            ) VALUES %s
+            ON CONFLICT (raw_entry_id) DO UPDATE SET
+                mood_score = EXCLUDED.mood_score,
+                energy_level = EXCLUDED.energy_level,
+                pain_level = EXCLUDED.pain_level,
+                sleep_quality = EXCLUDED.sleep_quality,
+                sleep_hours = EXCLUDED.sleep_hours,
+                stress_level = EXCLUDED.stress_level,
+                ai_confidence = EXCLUDED.ai_confidence,
+                processing_version = EXCLUDED.processing_version,
+                extraction_details = EXCLUDED.extraction_details
+        """, rows, page_size=page_size)
+        bump_data_version(cursor, {row[0] for row in rows})
+        conn.commit()
+        return len(rows)
+    finally:
+        conn.close()
@@ -0,0 +1,74 @@
+# utils/compression.py
+"""
+Response compression negotiated from Accept-Encoding.
+
+Large text responses (JSON, CSV, plain text) are compressed with brotli when
+the `brotli` package is installed and the client accepts it, otherwise with
+gzip. Responses under COMPRESSION_MIN_BYTES, streamed responses and
+responses that already carry a Content-Encoding are left alone.
+
+Compressed bytes are a different representation, so a strong ETag gets the
+coding appended ("<tag>-gzip"); conditional_get accepts either form.
+"""
+
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json", "application/javascript", "text/csv", "text/plain", "text/html", "text/css"
+}
+
+
+def available_codings():
+    """Supported content codings, most preferred first"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def encoded_etag(etag, coding):
+    return f"{etag}-{coding}"
+
+
+def compress(data, coding, level):
+    if coding == "br":
+        # Quality 4 is close to gzip's ratio at a fraction of brotli's default cost
+        return brotli.compress(data, quality=min(level, 4))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def init_compression(app):
+    """Registers the compression hook; configured by COMPRESSION_* settings"""
+
+    @app.after_request
+    def compress_response(response):
+        if not app.config.get('COMPRESSION_ENABLED', True):
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add("Accept-Encoding")
+
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.direct_passthrough
+                or "Content-Encoding" in response.headers):
+            return response
+
+        coding = request.accept_encodings.best_match(available_codings())
+        if not coding:
+            return response
+
+        data = response.get_data()
+        if len(data) < app.config.get('COMPRESSION_MIN_BYTES', 1024):
+            return response
+
+        response.set_data(compress(data, coding, app.config.get('COMPRESSION_LEVEL', 6)))
+        response.headers["Content-Encoding"] = coding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(encoded_etag(etag, coding), weak=weak)
+        return response
+
+    return app
@@ -1,13 +1,80 @@
 # utils/db_utils.py
+import logging
+import time
+from functools import lru_cache
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor, Json
 import os
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Callables notified after every statement: observer(cursor, query, params, seconds)
+_query_observers = []
+
+
+def add_query_observer(observer):
+    if observer not in _query_observers:
+        _query_observers.append(observer)
+
+
+def remove_query_observer(observer):
+    if observer in _query_observers:
+        _query_observers.remove(observer)
+
+
+class ObservedCursorMixin:
+    """Times execute/executemany and reports them to the query observers"""
+
+    def execute(self, query, vars=None):
+        if not _query_observers:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _notify(self, query, vars, time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        if not _query_observers:
+            return super().executemany(query, vars_list)
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _notify(self, query, None, time.perf_counter() - started)
+
+
+def _notify(cursor, query, params, seconds):
+    for observer in list(_query_observers):
+        try:
+            observer(cursor, query, params, seconds)
+        except Exception as e:
+            logger.warning("Query observer failed: %s", e)
+
+
+@lru_cache(maxsize=None)
+def observed_cursor_class(cursor_class):
+    return type(f"Observed{cursor_class.__name__}", (ObservedCursorMixin, cursor_class), {})
+
+
+class ObservedConnection(psycopg2.extensions.connection):
+    """Connection whose cursors (whatever cursor_factory is asked for) are observed"""
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.pop('cursor_factory', None) or self.cursor_factory or psycopg2.extensions.cursor
+        return super().cursor(*args, cursor_factory=observed_cursor_class(factory), **kwargs)
+
+
 def get_db_connection():
     try:
-        return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+        return psycopg2.connect(DATABASE_URL, connection_factory=ObservedConnection, cursor_factory=RealDictCursor)
     except Exception as e:
-        print(f"Database connection error: {e}")
+        logger.error("Database connection error: %s", e)
         return None
+
+def json_param(value):
+    """Adapts a dict for a JSONB column, keeping None as SQL NULL"""
+    return Json(value) if value is not None else None
@@ -0,0 +1,93 @@
+# utils/dedup_utils.py
+"""
+Content fingerprints for diary entries.
+
+An entry's fingerprint is the SHA-256 of its normalized text, stored in
+raw_entries.content_hash and looked up together with user_id and entry_date.
+Normalization (NFKC, lowercase, collapsed whitespace) makes re-pasted or
+re-exported copies of the same entry match while real edits still differ.
+
+The checks here skip the model call for known duplicates. The unique index
+on (user_id, entry_date, content_hash) is what guarantees one copy: writers
+insert with ON CONFLICT DO NOTHING and treat a conflict as a duplicate, so
+two requests that both pass the check still store the entry once.
+"""
+
+import hashlib
+import unicodedata
+from .db_utils import get_db_connection
+
+REASON_DUPLICATE_EXISTING = "Duplicate of an existing entry"
+REASON_DUPLICATE_IN_IMPORT = "Duplicate of an earlier entry in this import"
+
+
+def normalize_entry_text(text):
+    return " ".join(unicodedata.normalize("NFKC", text or "").lower().split())
+
+
+def compute_content_hash(text):
+    return hashlib.sha256(normalize_entry_text(text).encode("utf-8")).hexdigest()
+
+
+def find_duplicate_entry(cursor, user_id, entry_date, content_hash):
+    """Id of an existing entry with the same fingerprint, or None"""
+    cursor.execute("""
+        SELECT id FROM raw_entries
+        WHERE user_id = %s AND entry_date = %s AND content_hash = %s
+        ORDER BY id LIMIT 1
+    """, (user_id, entry_date, content_hash))
+    row = cursor.fetchone()
+    return row['id'] if row else None
+
+
+class DuplicateChecker:
+    """
+    Dedup stage for imports. Called with a chunk of {'text', 'date'} entries,
+    it sets each entry's content_hash and returns a skip reason per entry
+    (None to keep it), using one query per chunk against stored entries.
+    It opens its own connection because it runs on the import's parser thread.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.seen = set()
+        self._conn = None
+
+    def __call__(self, entries):
+        for entry in entries:
+            entry.setdefault('content_hash', compute_content_hash(entry['text']))
+
+        existing = self._existing({entry['content_hash'] for entry in entries})
+        reasons = []
+        for entry in entries:
+            key = (entry['date'], entry['content_hash'])
+            if key in existing:
+                reasons.append(REASON_DUPLICATE_EXISTING)
+            elif key in self.seen:
+                reasons.append(REASON_DUPLICATE_IN_IMPORT)
+            else:
+                self.seen.add(key)
+                reasons.append(None)
+        return reasons
+
+    def _existing(self, hashes):
+        if not hashes:
+            return set()
+        if self._conn is None:
+            self._conn = get_db_connection()
+            if not self._conn:
+                raise RuntimeError("Database connection failed")
+
+        cursor = self._conn.cursor()
+        cursor.execute("""
+            SELECT entry_date, content_hash FROM raw_entries
+            WHERE user_id = %s AND content_hash = ANY(%s)
+        """, (self.user_id, list(hashes)))
+        rows = cursor.fetchall()
+        self._conn.rollback()
+        return {(row['entry_date'], row['content_hash']) for row in rows}
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,150 @@
+# utils/embeddings.py
+"""
+Entry embeddings: pluggable providers and compact storage.
+
+The default provider is a local feature-hashing embedding (unigrams and
+bigrams, sublinear term frequency, signed hashing), which needs no network
+and is good enough to find days with similar foods, symptoms and activities.
+Set EMBEDDING_PROVIDER=openai to use the OpenAI embeddings API instead.
+
+Vectors are L2-normalized and stored as little-endian float16 bytes
+(2 bytes per dimension).
+"""
+
+import hashlib
+import math
+import os
+import re
+import struct
+import threading
+from array import array
+from collections import Counter, OrderedDict
+
+DEFAULT_DIM = int(os.getenv('EMBEDDING_DIM', 256))
+EMBEDDING_CACHE_SIZE = 1024
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+class EmbeddingProvider:
+    """Interface: `name`, `dim` and embed(texts) -> list of normalized vectors"""
+
+    name = None
+    dim = None
+
+    def embed(self, texts):
+        raise NotImplementedError
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """Local stand-in: signed feature hashing of unigrams and bigrams"""
+
+    def __init__(self, dim=DEFAULT_DIM):
+        self.dim = dim
+        self.name = f"hashing-v1-{dim}"
+
+    def embed(self, texts):
+        return [self._embed_one(text) for text in texts]
+
+    def _embed_one(self, text):
+        tokens = _TOKEN_PATTERN.findall((text or "").lower())
+        features = Counter(tokens)
+        features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+
+        vector = [0.0] * self.dim
+        for feature, count in features.items():
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign * (1.0 + math.log(count))
+        return normalize(vector)
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    OpenAI embeddings, shortened to `dim` dimensions by the API. Calls go
+    through ai_utils.create_embedding, so they take a model call slot and
+    show up in the model metrics and usage records like chat completions.
+    """
+
+    def __init__(self, model="text-embedding-3-small", dim=DEFAULT_DIM, client=None):
+        self.client = client
+        self.model = model
+        self.dim = dim
+        self.name = f"openai-{model}-{dim}"
+
+    def embed(self, texts):
+        from .ai_utils import create_embedding
+        response = create_embedding("embedding", client=self.client, model=self.model,
+                                    input=list(texts), dimensions=self.dim)
+        return [normalize(item.embedding) for item in response.data]
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_embedding_provider():
+    """Provider selected by EMBEDDING_PROVIDER (hashing or openai)"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            if os.getenv('EMBEDDING_PROVIDER', 'hashing') == 'openai':
+                _provider = OpenAIEmbeddingProvider()
+            else:
+                _provider = HashingEmbeddingProvider()
+        return _provider
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def embed_texts(texts, provider=None):
+    """
+    Embeds texts with a small LRU in front of the provider, so the vector
+    computed for similarity lookups during extraction is reused when the
+    entry is stored.
+    """
+    provider = provider or get_embedding_provider()
+    keys = [(provider.name, hashlib.sha256((text or "").encode("utf-8")).digest()) for text in texts]
+    results = [None] * len(texts)
+    missing = []
+    with _cache_lock:
+        for i, key in enumerate(keys):
+            if key in _cache:
+                _cache.move_to_end(key)
+                results[i] = _cache[key]
+            else:
+                missing.append(i)
+
+    if missing:
+        vectors = provider.embed([texts[i] for i in missing])
+        with _cache_lock:
+            for i, vector in zip(missing, vectors):
+                results[i] = vector
+                _cache[keys[i]] = vector
+            while len(_cache) > EMBEDDING_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return results
+
+
+def embed_text(text, provider=None):
+    return embed_texts([text], provider)[0]
+
+
+def normalize(vector):
+    norm = math.sqrt(sum(v * v for v in vector))
+    if not norm:
+        return array('f', vector)
+    return array('f', (v / norm for v in vector))
+
+
+def pack_vector(vector):
+    """float16 little-endian bytes"""
+    return struct.pack(f"<{len(vector)}e", *vector)
+
+
+def unpack_vector(data):
+    """Inverse of pack_vector, as a float32 array"""
+    return array('f', struct.unpack(f"<{len(data) // 2}e", data))
@@ -0,0 +1,151 @@
+# utils/etag.py
+"""
+Conditional GET support for read endpoints.
+
+Every user and family row carries a data_version counter that write paths
+bump in the same transaction as the change (`bump_data_version`). Read
+endpoints decorated with `conditional_get` look up the relevant counter with
+one primary-key query, derive a strong ETag from it plus the request URL,
+and answer `If-None-Match` hits with 304 before running the view.
+
+The version is read before the view runs, so a write that commits in between
+can only produce an ETag that is older than the data it was sent with, which
+costs one extra 200 later, never a stale 304.
+"""
+
+import hashlib
+import logging
+from datetime import date
+from functools import wraps
+from flask import request, make_response
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from .db_utils import get_db_connection
+from .compression import available_codings, encoded_etag
+
+logger = logging.getLogger(__name__)
+
+USER_SCOPE = "user"
+FAMILY_SCOPE = "family"
+
+# Bump when the shape of cached responses changes so old ETags stop matching
+ETAG_FORMAT_VERSION = 1
+CACHE_CONTROL = "private, no-cache"
+
+
+def bump_data_version(cursor, user_ids=(), family_id=None):
+    """
+    Marks data of the given users (and so their families) or of a whole
+    family as changed. Runs in the caller's transaction.
+    """
+    user_ids = sorted({int(user_id) for user_id in user_ids if user_id is not None})
+    if user_ids:
+        cursor.execute("""
+            WITH bumped AS (
+                UPDATE users SET data_version = data_version + 1
+                WHERE id = ANY(%s)
+                RETURNING family_id
+            )
+            UPDATE families SET data_version = data_version + 1
+            WHERE id IN (SELECT family_id FROM bumped)
+        """, (user_ids,))
+    if family_id is not None:
+        cursor.execute("UPDATE families SET data_version = data_version + 1 WHERE id = %s", (family_id,))
+
+
+class DataVersions:
+    """Reads the current data_version of a user or family"""
+
+    def get(self, scope, scope_id, family_id=None):
+        """Returns the version, or None when the row is missing or not in `family_id`"""
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Database connection failed")
+
+        try:
+            cursor = conn.cursor()
+            if scope == FAMILY_SCOPE:
+                cursor.execute("SELECT data_version FROM families WHERE id = %s", (scope_id,))
+            elif family_id is not None:
+                cursor.execute("SELECT data_version FROM users WHERE id = %s AND family_id = %s", (scope_id, family_id))
+            else:
+                cursor.execute("SELECT data_version FROM users WHERE id = %s", (scope_id,))
+            row = cursor.fetchone()
+            return row['data_version'] if row else None
+        finally:
+            conn.close()
+
+
+data_versions = DataVersions()
+
+
+def make_etag(scope, scope_id, version, extra=""):
+    """Strong ETag for the current URL (path and query) at a data version"""
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+    raw = f"{ETAG_FORMAT_VERSION}:{scope}:{scope_id}:{version}:{request.path}?{query}:{extra}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def _current_family_id():
+    # Optional so the decorator also works on routes without @jwt_required()
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+        return int(identity) if identity is not None else None
+    except Exception:
+        return None
+
+
+def _matching_etag(etag):
+    """The form of `etag` (plain or compressed) the client already has, if any"""
+    for candidate in [etag] + [encoded_etag(etag, coding) for coding in available_codings()]:
+        if request.if_none_match.contains_weak(candidate):
+            return candidate
+    return None
+
+
+def conditional_get(scope, daily=False, default_user_id=None):
+    """
+    ETag / If-None-Match handling for a GET route.
+
+    scope: USER_SCOPE (versioned by ?user_id=, which must belong to the
+    caller's family when a JWT is present) or FAMILY_SCOPE (the JWT family).
+    daily: include today's date, for responses computed relative to "now".
+    Apply below @jwt_required() on protected routes.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            family_id = _current_family_id()
+            if scope == FAMILY_SCOPE:
+                scope_id = family_id
+            else:
+                scope_id = request.args.get('user_id', default_user_id, type=int)
+            if scope_id is None:
+                return view(*args, **kwargs)
+
+            try:
+                version = data_versions.get(scope, scope_id, family_id)
+            except Exception as e:
+                logger.warning("Data version lookup failed, serving without ETag: %s", e)
+                return view(*args, **kwargs)
+            if version is None:
+                # Unknown or foreign profile: let the view produce its error
+                return view(*args, **kwargs)
+
+            etag = make_etag(scope, scope_id, version, date.today().isoformat() if daily else "")
+            matched = _matching_etag(etag)
+            if matched:
+                response = make_response("", 304)
+                response.set_etag(matched)
+                response.headers["Cache-Control"] = CACHE_CONTROL
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = CACHE_CONTROL
+            return response
+
+        return wrapper
+    return decorator
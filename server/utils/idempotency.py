@@ -0,0 +1,272 @@
+# utils/idempotency.py
+"""
+Idempotency-Key support for create and import endpoints.
+
+A client that sends an `Idempotency-Key` header gets at-most-once processing
+per key and family: the first request runs and its JSON response is stored;
+a retry with the same key and the same request returns the stored response,
+a retry while the first request is still running waits for it (up to
+IDEMPOTENCY_WAIT_SECONDS, then 409 with Retry-After), and reusing a key for a
+different request is rejected with 422. Keys expire after
+IDEMPOTENCY_TTL_SECONDS. Server errors release the key so the request can be
+retried.
+
+While a request runs, its key is refreshed every third of
+IDEMPOTENCY_LOCK_SECONDS; only a key whose heartbeat stopped for that long (a
+crashed worker) is taken over by a retry, however long the original runs.
+"""
+
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import request, jsonify, make_response, current_app
+from flask_jwt_extended import get_jwt_identity
+from psycopg2.extras import RealDictCursor
+from .db_utils import get_db_connection, json_param
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+ACQUIRED = "acquired"
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+MISMATCH = "mismatch"
+
+POLL_INTERVAL_SECONDS = 0.5
+FINGERPRINT_CHUNK_BYTES = 64 * 1024
+PURGE_PROBABILITY = 0.01
+PURGE_BATCH_SIZE = 500
+
+
+class IdempotencyStore:
+    """Postgres-backed key store (table idempotency_keys)"""
+
+    def acquire(self, family_id, key, fingerprint, ttl_seconds, lock_seconds):
+        """
+        Claims `key` for a new request. Expired keys and in-progress keys without
+        a heartbeat for `lock_seconds` (a crashed worker) are taken over.
+        Returns (state, record) where state is one of ACQUIRED, IN_PROGRESS,
+        COMPLETED or MISMATCH.
+        """
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Database connection failed")
+
+        try:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            if random.random() < PURGE_PROBABILITY:
+                cursor.execute("""
+                    DELETE FROM idempotency_keys WHERE id IN (
+                        SELECT id FROM idempotency_keys WHERE expires_at < NOW() LIMIT %s
+                    )
+                """, (PURGE_BATCH_SIZE,))
+
+            cursor.execute("""
+                INSERT INTO idempotency_keys (
+                    family_id, idempotency_key, request_fingerprint, status, created_at, heartbeat_at, expires_at
+                )
+                VALUES (%s, %s, %s, 'in_progress', NOW(), NOW(), NOW() + %s * INTERVAL '1 second')
+                ON CONFLICT (family_id, idempotency_key) DO UPDATE SET
+                    request_fingerprint = EXCLUDED.request_fingerprint,
+                    status = 'in_progress',
+                    response_status = NULL,
+                    response_body = NULL,
+                    created_at = NOW(),
+                    heartbeat_at = NOW(),
+                    expires_at = EXCLUDED.expires_at
+                WHERE idempotency_keys.expires_at < NOW()
+                   OR (idempotency_keys.status = 'in_progress'
+                       AND COALESCE(idempotency_keys.heartbeat_at, idempotency_keys.created_at)
+                           < NOW() - %s * INTERVAL '1 second')
+                RETURNING id
+            """, (family_id, key, fingerprint, ttl_seconds, lock_seconds))
+            acquired = cursor.fetchone()
+            conn.commit()
+            if acquired:
+                return ACQUIRED, None
+
+            record = self._get(cursor, family_id, key)
+            if record is None:
+                # Purged between the insert and the read; let the caller retry
+                return IN_PROGRESS, None
+            if record['request_fingerprint'] != fingerprint:
+                return MISMATCH, record
+            return record['status'], record
+        finally:
+            conn.close()
+
+    def get(self, family_id, key):
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Database connection failed")
+        try:
+            return self._get(conn.cursor(cursor_factory=RealDictCursor), family_id, key)
+        finally:
+            conn.close()
+
+    def complete(self, family_id, key, status_code, body):
+        self._execute("""
+            UPDATE idempotency_keys
+            SET status = 'completed', response_status = %s, response_body = %s
+            WHERE family_id = %s AND idempotency_key = %s
+        """, (status_code, json_param(body), family_id, key))
+
+    def heartbeat(self, family_id, key, fingerprint):
+        """Keeps an in-progress key from being taken over"""
+        self._execute("""
+            UPDATE idempotency_keys SET heartbeat_at = NOW()
+            WHERE family_id = %s AND idempotency_key = %s
+              AND request_fingerprint = %s AND status = 'in_progress'
+        """, (family_id, key, fingerprint))
+
+    def release(self, family_id, key):
+        self._execute("""
+            DELETE FROM idempotency_keys
+            WHERE family_id = %s AND idempotency_key = %s AND status = 'in_progress'
+        """, (family_id, key))
+
+    def _get(self, cursor, family_id, key):
+        cursor.execute("""
+            SELECT request_fingerprint, status, response_status, response_body
+            FROM idempotency_keys
+            WHERE family_id = %s AND idempotency_key = %s AND expires_at >= NOW()
+        """, (family_id, key))
+        return cursor.fetchone()
+
+    def _execute(self, query, params):
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError("Database connection failed")
+        try:
+            conn.cursor().execute(query, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+idempotency_store = IdempotencyStore()
+
+
+def request_fingerprint():
+    """
+    Hash of what makes two requests "the same": method, path and payload.
+    Uploads are fingerprinted by their form fields, file names and contents;
+    each file is read from its spooled copy in chunks and rewound for the view.
+    """
+    digest = hashlib.sha256(f"{request.method} {request.path}?{request.query_string.decode()}".encode("utf-8"))
+    if request.mimetype == "multipart/form-data":
+        digest.update(json.dumps(sorted(request.form.items(multi=True))).encode("utf-8"))
+        files = sorted(request.files.items(multi=True), key=lambda item: (item[0], item[1].filename or ""))
+        for name, upload in files:
+            digest.update(json.dumps([name, upload.filename or ""]).encode("utf-8"))
+            for chunk in iter(lambda: upload.stream.read(FINGERPRINT_CHUNK_BYTES), b""):
+                digest.update(chunk)
+            upload.stream.seek(0)
+    else:
+        payload = request.get_json(silent=True)
+        if payload is not None:
+            digest.update(json.dumps(payload, sort_keys=True, default=str).encode("utf-8"))
+        else:
+            digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+@contextmanager
+def lock_heartbeat(family_id, key, fingerprint, interval):
+    """Refreshes the key's heartbeat every `interval` seconds while the block runs"""
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(interval):
+            try:
+                idempotency_store.heartbeat(family_id, key, fingerprint)
+            except Exception as e:
+                logger.warning("Idempotency heartbeat failed: %s", e, extra={"idempotency_key": key})
+
+    thread = threading.Thread(target=beat, name="idempotency-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def replay_response(record):
+    response = jsonify(record['response_body'])
+    response.status_code = record['response_status']
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def idempotent(view):
+    """
+    Honors the Idempotency-Key header on a JWT-protected route.
+    Apply below @jwt_required() so the family is known.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        config = current_app.config
+        family_id = int(get_jwt_identity())
+        fingerprint = request_fingerprint()
+
+        try:
+            state, record = idempotency_store.acquire(
+                family_id, key, fingerprint,
+                config['IDEMPOTENCY_TTL_SECONDS'], config['IDEMPOTENCY_LOCK_SECONDS']
+            )
+            deadline = time.monotonic() + config['IDEMPOTENCY_WAIT_SECONDS']
+            while state == IN_PROGRESS and time.monotonic() < deadline:
+                # Attach to the original request and return its result when it finishes
+                time.sleep(POLL_INTERVAL_SECONDS)
+                state, record = idempotency_store.acquire(
+                    family_id, key, fingerprint,
+                    config['IDEMPOTENCY_TTL_SECONDS'], config['IDEMPOTENCY_LOCK_SECONDS']
+                )
+        except Exception as e:
+            logger.warning("Idempotency store unavailable, processing without key: %s", e)
+            return view(*args, **kwargs)
+
+        if state == MISMATCH:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} was already used for a different request"}), 422
+        if state == COMPLETED:
+            return replay_response(record)
+        if state == IN_PROGRESS:
+            response = jsonify({"error": "A request with this idempotency key is still being processed"})
+            response.status_code = 409
+            response.headers["Retry-After"] = str(max(1, int(config['IDEMPOTENCY_WAIT_SECONDS'])))
+            return response
+
+        try:
+            with lock_heartbeat(family_id, key, fingerprint, config['IDEMPOTENCY_LOCK_SECONDS'] / 3):
+                response = make_response(view(*args, **kwargs))
+        except Exception:
+            idempotency_store.release(family_id, key)
+            raise
+
+        body = response.get_json(silent=True)
+        try:
+            # Failures and rate-limit rejections are not results: a retry should run again
+            if response.status_code >= 500 or response.status_code == 429 or body is None:
+                idempotency_store.release(family_id, key)
+            else:
+                idempotency_store.complete(family_id, key, response.status_code, body)
+        except Exception as e:
+            logger.warning("Failed to record idempotent response: %s", e)
+        return response
+
+    return wrapper
@@ -0,0 +1,469 @@
+# utils/import_pipeline.py
+"""
+Staged bulk import: parser -> dedup -> extraction pool -> batched DB writer.
+
+Stages run concurrently and are connected by bounded queues, so a slow stage
+applies backpressure to the ones before it instead of buffering the whole
+import. The writer commits finished entries in batches while model calls for
+later entries are still in flight, which brings the import time close to
+max(model time / workers, write time) rather than their sum.
+
+Each stage records items processed, busy time and throughput, and every queue
+records its current and peak depth; `stats()` returns both, and
+`active_pipeline_stats()` reports on imports that are still running.
+"""
+
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from itertools import islice
+from psycopg2.extras import execute_values
+from .db_utils import json_param
+from .dedup_utils import compute_content_hash, REASON_DUPLICATE_EXISTING, REASON_DUPLICATE_IN_IMPORT
+from .ai_utils import extract_health_data_with_ai, summarize_extraction
+from .vector_index import store_embeddings_safely, index_embeddings
+from .etag import bump_data_version
+from .metrics import registry, QUEUE_DEPTH, ACTIVE_IMPORTS, IMPORT_STAGE_ITEMS, IMPORT_STAGE_SECONDS
+from .slow_profiler import request_samples, sampled_thread
+from .model_scheduler import model_priority, BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+METRIC_FIELDS = [
+    "mood_score", "energy_level", "pain_level",
+    "sleep_quality", "sleep_hours", "stress_level"
+]
+
+PREVIEW_LIMIT = 10
+SKIP_REASON_LIMIT = 5
+
+_DONE = object()
+
+_active_pipelines = {}
+_active_lock = threading.Lock()
+
+
+def active_pipeline_stats():
+    """Stats of every import pipeline currently running in this process"""
+    with _active_lock:
+        pipelines = list(_active_pipelines.values())
+    return [pipeline.stats() for pipeline in pipelines]
+
+
+def _collect_queue_metrics():
+    stats = active_pipeline_stats()
+    ACTIVE_IMPORTS.set(len(stats))
+    for name in ("parsed", "extracted"):
+        QUEUE_DEPTH.set(sum(pipeline["queues"][name]["depth"] for pipeline in stats), queue=name)
+
+
+registry.add_collector(_collect_queue_metrics)
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def record(self, count, seconds):
+        with self._lock:
+            self.processed += count
+            self.busy_seconds += seconds
+
+    def as_dict(self):
+        end = self.finished_at or time.monotonic()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            "processed": self.processed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_per_second": round(self.processed / elapsed, 2) if elapsed else 0.0
+        }
+
+
+class BoundedQueue(queue.Queue):
+    """queue.Queue that tracks its peak depth"""
+
+    def __init__(self, name, maxsize):
+        super().__init__(maxsize)
+        self.name = name
+        self.peak_depth = 0
+
+    def _put(self, item):
+        super()._put(item)
+        self.peak_depth = max(self.peak_depth, len(self.queue))
+
+    def as_dict(self):
+        return {"depth": self.qsize(), "peak_depth": self.peak_depth, "capacity": self.maxsize}
+
+
+class ImportResult:
+    """Aggregates of a finished import (bounded, whatever the import size)"""
+
+    def __init__(self):
+        self.total_found = 0
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.duplicates = 0
+        self.skipped_reasons = []
+        self.processed_entries = []
+        self.confidence_sum = 0.0
+        self.earliest = None
+        self.latest = None
+        self.stats = None
+        self.error = None  # set when the input failed after earlier batches were written
+
+    def skip(self, reason, duplicate=False):
+        self.skipped += 1
+        self.duplicates += int(duplicate)
+        if len(self.skipped_reasons) < SKIP_REASON_LIMIT:
+            self.skipped_reasons.append(reason)
+
+    def add_written(self, raw_entry_id, entry, ai_data):
+        self.processed += 1
+        confidence = ai_data.get("confidence", 0.0) or 0.0
+        self.confidence_sum += confidence
+        self.earliest = min(self.earliest, entry["date"]) if self.earliest else entry["date"]
+        self.latest = max(self.latest, entry["date"]) if self.latest else entry["date"]
+        if len(self.processed_entries) < PREVIEW_LIMIT:
+            text = entry["text"]
+            self.processed_entries.append({
+                "id": raw_entry_id,
+                "date": entry["date"].isoformat(),
+                "text_preview": text[:100] + "..." if len(text) > 100 else text,
+                "ai_confidence": confidence
+            })
+
+    @property
+    def avg_confidence(self):
+        return self.confidence_sum / self.processed if self.processed else 0
+
+
+class ImportPipeline:
+    """
+    Runs one import for `user_id` over an iterable of {'text', 'date'} entries.
+
+    `dedup(entries)` is the dedup stage: called with chunks of entries, it
+    returns one skip reason (or None to keep the entry) per entry, and may set
+    `content_hash` on them. The default only drops repeats within the import;
+    see utils.dedup_utils.DuplicateChecker for the stored-entry check.
+
+    Extracted entries are added to `import_batch` as soon as their model call
+    returns, so later entries of the same import see them in their temporal
+    context even before they are written.
+    """
+
+    def __init__(self, conn, user_id, import_batch=None, workers=4, queue_size=32,
+                 write_batch_size=25, flush_interval=1.0, min_length=0,
+                 dedup=None, dedup_chunk_size=50, extract=extract_health_data_with_ai):
+        self.conn = conn
+        self.user_id = user_id
+        self.import_batch = import_batch
+        self.workers = max(1, workers)
+        self.write_batch_size = write_batch_size
+        self.flush_interval = flush_interval
+        self.min_length = min_length
+        self.dedup = dedup or self._dedup_in_import
+        self.dedup_chunk_size = dedup_chunk_size
+        self.extract = extract
+
+        self.id = uuid.uuid4().hex[:12]
+        self.parsed = BoundedQueue("parsed", queue_size)
+        self.extracted = BoundedQueue("extracted", queue_size)
+        self.stages = {name: StageStats(name) for name in ("parse", "dedup", "extract", "write")}
+        self.result = ImportResult()
+        self._seen = set()
+        self._result_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._error = None
+
+    def stats(self):
+        return {
+            "pipeline_id": self.id,
+            "user_id": self.user_id,
+            "stages": {name: stage.as_dict() for name, stage in self.stages.items()},
+            "queues": {q.name: q.as_dict() for q in (self.parsed, self.extracted)}
+        }
+
+    def run(self, entries):
+        """
+        Runs every stage to completion and returns the ImportResult. If a stage
+        fails the error is raised once every stage stopped; `self.result` still
+        counts the batches committed before that.
+        """
+        with _active_lock:
+            _active_pipelines[self.id] = self
+
+        # Stage threads show up in the request's slow-request profile, if any
+        samples = request_samples()
+        threads = [threading.Thread(target=self._guard, args=(self._parse, entries),
+                                    kwargs={"samples": samples, "label": "import-parse"},
+                                    name=f"import-{self.id}-parse", daemon=True)]
+        threads += [threading.Thread(target=self._guard, args=(self._extract_worker,),
+                                     kwargs={"samples": samples, "label": "import-extract"},
+                                     name=f"import-{self.id}-extract-{i}", daemon=True)
+                    for i in range(self.workers)]
+        try:
+            for thread in threads:
+                thread.start()
+            self._guard(self._write)
+            # If the writer stopped early, keep draining so workers can finish
+            while any(thread.is_alive() for thread in threads):
+                try:
+                    self.extracted.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            for thread in threads:
+                thread.join()
+        finally:
+            with _active_lock:
+                _active_pipelines.pop(self.id, None)
+
+        self.result.stats = self.stats()
+        for name, stage in self.stages.items():
+            IMPORT_STAGE_ITEMS.inc(stage.processed, stage=name)
+            IMPORT_STAGE_SECONDS.inc(stage.busy_seconds, stage=name)
+        if self._error is not None:
+            raise self._error
+        return self.result
+
+    # -- stages --------------------------------------------------------------
+
+    def _parse(self, entries):
+        parse, dedup = self.stages["parse"], self.stages["dedup"]
+        parse.started_at = dedup.started_at = time.monotonic()
+        try:
+            for chunk in self._parsed_chunks(entries):
+                for entry in chunk:
+                    if self._stop.is_set():
+                        return
+                    self._put(self.parsed, entry)
+        finally:
+            parse.finished_at = dedup.finished_at = time.monotonic()
+            for _ in range(self.workers):
+                self._put(self.parsed, _DONE)
+
+    def _parsed_chunks(self, entries):
+        """Yields chunks of entries that passed the length and dedup checks"""
+        parse, dedup = self.stages["parse"], self.stages["dedup"]
+        iterator = iter(entries)
+        while not self._stop.is_set():
+            started = time.monotonic()
+            chunk = list(islice(iterator, self.dedup_chunk_size))
+            parse.record(len(chunk), time.monotonic() - started)
+            if not chunk:
+                return
+
+            started = time.monotonic()
+            candidates = []
+            for entry in chunk:
+                self.result.total_found += 1
+                entry["position"] = self.result.total_found
+                if len(entry["text"].strip()) < self.min_length:
+                    self._skip(entry, f"Too short ({len(entry['text'])} chars)")
+                else:
+                    candidates.append(entry)
+
+            kept = []
+            for entry, reason in zip(candidates, self.dedup(candidates) if candidates else []):
+                if reason:
+                    self._skip(entry, reason, duplicate=True)
+                else:
+                    kept.append(entry)
+            dedup.record(len(chunk), time.monotonic() - started)
+            yield kept
+
+    def _skip(self, entry, reason, duplicate=False):
+        with self._result_lock:
+            self.result.skip(f"Entry {entry['position']}: {reason}", duplicate=duplicate)
+
+    def _dedup_in_import(self, entries):
+        reasons = []
+        for entry in entries:
+            entry.setdefault("content_hash", compute_content_hash(entry["text"]))
+            key = (entry["date"], entry["content_hash"])
+            reasons.append(REASON_DUPLICATE_IN_IMPORT if key in self._seen else None)
+            self._seen.add(key)
+        return reasons
+
+    def preview(self, entries):
+        """
+        Dry run: parses and dedups every entry without model calls or writes.
+        `result.processed` is the number of entries that would be imported.
+        """
+        for chunk in self._parsed_chunks(entries):
+            self.result.processed += len(chunk)
+            for entry in chunk[:PREVIEW_LIMIT - len(self.result.processed_entries)]:
+                text = entry["text"]
+                self.result.processed_entries.append({
+                    "date": entry["date"].isoformat(),
+                    "text_preview": text[:100] + "..." if len(text) > 100 else text
+                })
+        self.result.stats = self.stats()
+        return self.result
+
+    def _extract_worker(self):
+        # Imports yield model call slots to interactive saves
+        with model_priority(BACKGROUND):
+            self._extract_entries()
+
+    def _extract_entries(self):
+        stage = self.stages["extract"]
+        stage.started_at = stage.started_at or time.monotonic()
+        try:
+            while True:
+                entry = self.parsed.get()
+                if entry is _DONE or self._stop.is_set():
+                    if entry is _DONE:
+                        break
+                    continue
+
+                started = time.monotonic()
+                try:
+                    ai_data = self.extract(entry["text"], self.user_id, entry["date"], import_batch=self.import_batch)
+                except Exception as e:
+                    logger.warning("Extraction failed for import entry: %s", e, extra={"user_id": self.user_id, "entry_date": entry["date"]})
+                    with self._result_lock:
+                        self.result.failed += 1
+                    continue
+                finally:
+                    stage.record(1, time.monotonic() - started)
+
+                if self.import_batch is not None:
+                    self.import_batch.add({
+                        "entry_date": entry["date"],
+                        "entry_text": entry["text"],
+                        "content_hash": entry.get("content_hash") or compute_content_hash(entry["text"]),
+                        "extraction_details": summarize_extraction(ai_data),
+                        **{field: ai_data.get(field) for field in METRIC_FIELDS}
+                    })
+                self._put(self.extracted, (entry, ai_data))
+        finally:
+            stage.finished_at = time.monotonic()
+            self._put(self.extracted, _DONE)
+
+    def _write(self):
+        stage = self.stages["write"]
+        stage.started_at = time.monotonic()
+        pending = []
+        remaining_workers = self.workers
+        try:
+            while remaining_workers:
+                try:
+                    item = self.extracted.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    self._flush(pending)
+                    pending = []
+                    continue
+
+                if item is _DONE:
+                    remaining_workers -= 1
+                    continue
+                if self._stop.is_set():
+                    continue
+
+                pending.append(item)
+                if len(pending) >= self.write_batch_size:
+                    self._flush(pending)
+                    pending = []
+
+            if not self._stop.is_set():
+                self._flush(pending)
+        finally:
+            stage.finished_at = time.monotonic()
+
+    def _flush(self, items):
+        if not items:
+            return
+        stage = self.stages["write"]
+        started = time.monotonic()
+        now = datetime.now()
+        keys = [(entry["date"], entry.get("content_hash") or compute_content_hash(entry["text"])) for entry, _ in items]
+        cursor = self.conn.cursor()
+        embeddings = []
+        try:
+            # Entries stored since the dedup stage ran (e.g. by a retried
+            # request still in flight) conflict on the unique fingerprint
+            inserted = execute_values(cursor, """
+                INSERT INTO raw_entries (user_id, entry_text, entry_date, content_hash, created_at)
+                VALUES %s
+                ON CONFLICT (user_id, entry_date, content_hash) DO NOTHING
+                RETURNING id, entry_date, content_hash
+            """, [(self.user_id, entry["text"], entry_date, content_hash, now)
+                  for (entry, _), (entry_date, content_hash) in zip(items, keys)], fetch=True)
+            raw_ids = {(row["entry_date"], row["content_hash"]): row["id"] for row in inserted}
+            written = [(raw_ids[key], entry, ai_data) for key, (entry, ai_data) in zip(keys, items) if key in raw_ids]
+
+            if written:
+                execute_values(cursor, """
+                    INSERT INTO health_metrics (
+                        user_id, raw_entry_id, entry_date, mood_score, energy_level,
+                        pain_level, sleep_quality, sleep_hours, stress_level,
+                        ai_confidence, processing_version, extraction_details, created_at
+                    ) VALUES %s
+                """, [(
+                    self.user_id, raw_entry_id, entry["date"],
+                    *[ai_data.get(field) for field in METRIC_FIELDS],
+                    ai_data.get("confidence", 0.0), ai_data.get("processing_version"),
+                    json_param(summarize_extraction(ai_data)), now
+                ) for raw_entry_id, entry, ai_data in written])
+
+                # Vectors not cached from extraction may need a model call
+                with model_priority(BACKGROUND):
+                    embeddings = store_embeddings_safely(cursor, [{
+                        "raw_entry_id": raw_entry_id, "user_id": self.user_id,
+                        "entry_date": entry["date"], "entry_text": entry["text"]
+                    } for raw_entry_id, entry, _ in written])
+                bump_data_version(cursor, [self.user_id])
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.exception("Import write batch failed", extra={"user_id": self.user_id, "entries": len(items)})
+            with self._result_lock:
+                self.result.failed += len(items)
+            return
+        finally:
+            cursor.close()
+
+        index_embeddings(embeddings)
+        if self.import_batch is not None:
+            self.import_batch.committed({key: raw_ids.get(key) for key in keys})
+        with self._result_lock:
+            for raw_entry_id, entry, ai_data in written:
+                self.result.add_written(raw_entry_id, entry, ai_data)
+            for key, (entry, _) in zip(keys, items):
+                if key not in raw_ids:
+                    self.result.skip(f"Entry {entry['position']}: {REASON_DUPLICATE_EXISTING}", duplicate=True)
+        stage.record(len(items), time.monotonic() - started)
+
+    # -- plumbing ------------------------------------------------------------
+
+    def _put(self, q, item):
+        """
+        Blocking put with backpressure. Work items are dropped once the
+        pipeline is stopping; shutdown markers are always delivered.
+        """
+        while True:
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self._stop.is_set() and item is not _DONE:
+                    return
+
+    def _guard(self, target, *args, samples=None, label=None):
+        try:
+            with sampled_thread(samples, label):
+                target(*args)
+        except BaseException as e:
+            if self._error is None:
+                self._error = e
+            self._stop.set()
@@ -0,0 +1,194 @@
+# utils/import_utils.py
+"""
+Streaming readers for bulk diary imports.
+
+A dump is read line by line from any file-like object (or iterable of lines)
+and entries are yielded as soon as the next date line closes them, so large
+imports parse in bounded memory and feed downstream stages incrementally.
+Uploads are decoded incrementally with a byte limit, and CSV exports are read
+row by row.
+"""
+
+import csv
+import io
+import re
+from datetime import datetime
+from itertools import chain, islice
+from dateutil import parser
+
+# Header names recognised in CSV exports from other diary apps
+CSV_TEXT_COLUMNS = ("text", "entry", "entry_text", "content", "body", "note")
+CSV_DATE_COLUMNS = ("date", "entry_date", "day", "created", "created_at")
+
+
+class ImportTooLarge(Exception):
+    """Raised once an upload exceeds the configured byte limit"""
+
+    def __init__(self, max_bytes):
+        super().__init__(f"Import exceeds the {max_bytes} byte limit")
+        self.max_bytes = max_bytes
+
+
+_MONTHS = (
+    r"Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|"
+    r"Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?"
+)
+
+# One alternation for every supported date heading; text may follow the date
+DATE_LINE_PATTERN = re.compile(
+    r"^(?:"
+    r"\*\*(?P<bold>[^*]+)\*\*"                                   # **June 19, 2025**
+    r"|(?P<date>(?:" + _MONTHS + r")\s+\d{1,2},?\s+\d{4}"        # June 19, 2025 / Jun 19 2025
+    r"|\d{1,2}[/-]\d{1,2}[/-]\d{2,4}"                            # 06/19/2025
+    r"|\d{4}[/-]\d{1,2}[/-]\d{1,2})"                             # 2025-06-19
+    r")",
+    re.IGNORECASE
+)
+
+
+def parse_flexible_date(date_str):
+    """
+    Enhanced date parsing with better error handling
+    """
+    date_str = date_str.replace('*', '').strip()
+    try:
+        return parser.parse(date_str).date()
+    except Exception:
+        # Manual fallback
+        return datetime.now().date()
+
+
+def match_date_line(line):
+    """Returns (date, remainder) when `line` starts with a date heading, else None"""
+    match = DATE_LINE_PATTERN.match(line)
+    if not match:
+        return None
+
+    if match.group('bold') is not None:
+        # Bold text is only a heading when it actually holds a date
+        try:
+            found_date = parser.parse(match.group('bold').strip()).date()
+        except (ValueError, OverflowError):
+            return None
+    else:
+        found_date = parse_flexible_date(match.group('date'))
+
+    return found_date, line[match.end():].strip()
+
+
+def iter_bulk_entries(stream, default_date=None):
+    """
+    Yields {'text', 'date'} dicts from a stream of diary text, one per dated
+    section. Text before the first date heading is dated `default_date`
+    (today when not given).
+    """
+    default_date = default_date or datetime.now().date()
+    current_lines = []
+    current_date = None
+
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+
+        heading = match_date_line(line)
+        if heading is None:
+            current_lines.append(line)
+            continue
+
+        if current_lines:
+            yield {'text': "\n".join(current_lines), 'date': current_date or default_date}
+            current_lines = []
+
+        current_date, remainder = heading
+        if remainder:
+            current_lines.append(remainder)
+
+    if current_lines:
+        yield {'text': "\n".join(current_lines), 'date': current_date or default_date}
+
+
+def split_bulk_text_into_entries(bulk_text):
+    """Splits an in-memory bulk text into a list of dated entries"""
+    return list(iter_bulk_entries(io.StringIO(bulk_text)))
+
+
+class LimitedReader(io.RawIOBase):
+    """Binary stream wrapper that raises ImportTooLarge past `max_bytes`"""
+
+    def __init__(self, raw, max_bytes):
+        self.raw = raw
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.raw.read(len(buffer))
+        if not data:
+            return 0
+        self.bytes_read += len(data)
+        if self.max_bytes and self.bytes_read > self.max_bytes:
+            raise ImportTooLarge(self.max_bytes)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def open_text_stream(binary_stream, max_bytes=None):
+    """
+    Incrementally decoded UTF-8 view of an upload. Invalid bytes raise
+    UnicodeDecodeError when they are reached, not after reading everything.
+    """
+    return io.TextIOWrapper(
+        io.BufferedReader(LimitedReader(binary_stream, max_bytes)),
+        encoding="utf-8-sig",
+        errors="strict",
+        newline=""
+    )
+
+
+def _find_column(header, names):
+    for index, column in enumerate(header):
+        if column.strip().lower() in names:
+            return index
+    return None
+
+
+def iter_csv_entries(text_stream, default_date=None):
+    """
+    Yields {'text', 'date'} dicts from a CSV stream, one per row. A header
+    row with recognised text/date columns is used when present; otherwise the
+    first column is the entry text.
+    """
+    default_date = default_date or datetime.now().date()
+    reader = csv.reader(text_stream)
+    text_index, date_index = 0, None
+
+    first = next(reader, None)
+    if first is None:
+        return
+    header_text = _find_column(first, CSV_TEXT_COLUMNS)
+    if header_text is not None:
+        text_index, date_index = header_text, _find_column(first, CSV_DATE_COLUMNS)
+        rows = reader
+    else:
+        rows = chain([first], reader)
+
+    for row in rows:
+        if len(row) <= text_index or not row[text_index].strip():
+            continue
+        entry_date = default_date
+        if date_index is not None and len(row) > date_index and row[date_index].strip():
+            entry_date = parse_flexible_date(row[date_index])
+        yield {'text': row[text_index].strip(), 'date': entry_date}
+
+
+def iter_batches(iterable, size):
+    """Groups an iterable into lists of at most `size` items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,82 @@
+# utils/json_provider.py
+"""
+Fast JSON provider for Flask.
+
+Uses orjson when it is installed and falls back to the standard library with
+the same conversions otherwise, so responses look the same either way:
+dates and datetimes as ISO 8601, Decimal (NUMERIC columns) as numbers, UUIDs
+as strings and sets as lists. Installed in create_app via `app.json`.
+"""
+
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime, time, timedelta
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised by forcing the fallback in tests
+    orjson = None
+
+
+def _default(value):
+    """Conversions for types neither serializer handles natively"""
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _stdlib_default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    return _default(value)
+
+
+class FastJSONProvider(JSONProvider):
+    """orjson-backed provider; `use_orjson=False` forces the stdlib path"""
+
+    mimetype = "application/json"
+    compact = None
+
+    def __init__(self, app, use_orjson=None):
+        super().__init__(app)
+        self.use_orjson = orjson is not None if use_orjson is None else use_orjson
+
+    def _pretty(self):
+        return self.compact is False or (self.compact is None and self._app.debug)
+
+    def dumps_bytes(self, obj, indent=False):
+        if self.use_orjson:
+            option = orjson.OPT_NON_STR_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=_default, option=option)
+        if indent:
+            return json.dumps(obj, default=_stdlib_default, indent=2, ensure_ascii=False).encode("utf-8")
+        return json.dumps(obj, default=_stdlib_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj, indent=bool(kwargs.get("indent"))).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj, indent=self._pretty()) + b"\n", mimetype=self.mimetype)
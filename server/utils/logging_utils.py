@@ -0,0 +1,174 @@
+# utils/logging_utils.py
+"""
+Structured, leveled logging.
+
+Modules log through `logging.getLogger(__name__)` and pass structured fields
+as `extra` (e.g. `logger.info("entry created", extra={"user_id": 3})`). Never
+put diary text in a log message or field; log ids, counts and durations.
+
+configure_logging() routes every record through a bounded in-memory queue to
+a background writer thread, so request threads never block on stdout/stderr;
+when the queue is full, records are dropped and counted instead of waiting.
+
+Environment:
+    LOG_LEVEL              root level (default INFO)
+    LOG_LEVELS             per-module overrides, e.g.
+                           "utils.import_pipeline=DEBUG,analytics_engine=WARNING"
+    LOG_FORMAT             json (default) or text
+    LOG_DEBUG_SAMPLE_RATE  fraction of DEBUG records kept (default 1.0)
+
+A single high-volume call can also be sampled with
+`extra={"sample_rate": 0.01}`.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+LOG_QUEUE_SIZE = 10000
+
+_STANDARD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "asctime", "sample_rate"}
+
+
+def record_fields(record):
+    """The structured `extra` fields of a record"""
+    return {key: value for key, value in record.__dict__.items() if key not in _STANDARD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        text = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a record with probability `sample_rate` (per record) or `debug_rate` for DEBUG"""
+
+    def __init__(self, debug_rate=1.0):
+        super().__init__()
+        self.debug_rate = debug_rate
+
+    def filter(self, record):
+        rate = getattr(record, "sample_rate", None)
+        if rate is None and record.levelno <= logging.DEBUG:
+            rate = self.debug_rate
+        return rate is None or rate >= 1.0 or random.random() < rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that drops (and counts) records when the queue is full and
+    (re)starts its listener in every process, since gunicorn workers fork
+    without the parent's threads.
+    """
+
+    def __init__(self, log_queue, target):
+        super().__init__(log_queue)
+        self.target = target
+        self.dropped = 0
+        self._listener = None
+        self._listener_pid = None
+        self._lock = threading.Lock()
+
+    def ensure_listener(self):
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid != os.getpid():
+                self._listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+                self._listener.start()
+                self._listener_pid = os.getpid()
+
+    def stop(self):
+        with self._lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                self._listener.stop()
+            self._listener = self._listener_pid = None
+
+    def prepare(self, record):
+        # Resolve args and tracebacks here; the record crosses a thread boundary
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_module_levels(spec):
+    """'a=DEBUG, b.c=warning' -> {'a': 'DEBUG', 'b.c': 'WARNING'}"""
+    levels = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            name, level = part.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_handler = None
+
+
+def configure_logging(level=None, module_levels=None, fmt=None, debug_sample_rate=None, stream=None):
+    """Installs the queued handler on the root logger (once per process)"""
+    global _handler
+    if _handler is not None:
+        return _handler
+
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    module_levels = module_levels if module_levels is not None else parse_module_levels(os.getenv('LOG_LEVELS'))
+    fmt = fmt or os.getenv('LOG_FORMAT', 'json')
+    if debug_sample_rate is None:
+        debug_sample_rate = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 1.0))
+
+    target = logging.StreamHandler(stream or sys.stderr)
+    target.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+    handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE), target)
+    handler.addFilter(SamplingFilter(debug_sample_rate))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(handler)
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    atexit.register(handler.stop)
+    _handler = handler
+    return handler
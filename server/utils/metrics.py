@@ -0,0 +1,373 @@
+# utils/metrics.py
+"""
+In-process metrics with a Prometheus text endpoint.
+
+Counters, gauges and histograms live in a per-process registry. Under
+gunicorn every worker has its own, so each worker also writes a snapshot of
+its registry to METRICS_DIR (one JSON file per pid, replaced atomically every
+METRICS_FLUSH_SECONDS and on every scrape). /metrics merges the snapshots of
+all live workers, so a scrape sees the whole server whichever worker answers.
+Snapshots of pids that no longer exist, or not refreshed for
+METRICS_STALE_SECONDS, belong to dead workers and are removed.
+
+Counters and histograms are summed across workers. Gauges are merged as
+declared: "sum" for per-worker shares of a server-wide quantity (queue
+depths, imports running), "max"/"min", or "pid" (the default) to keep one
+sample per worker with a pid label. Gauges that describe current state are
+filled in by collector callbacks when a snapshot is taken.
+"""
+
+import bisect
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from flask import Response, g, request
+from .db_utils import add_query_observer
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MODEL_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'health-diary-metrics'))
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+METRICS_STALE_SECONDS = float(os.getenv('METRICS_STALE_SECONDS', 120))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return [[list(key), self._copy(value)] for key, value in self._values.items()]
+
+    def _copy(self, value):
+        return value
+
+    def describe(self):
+        return {"type": self.kind, "help": self.documentation, "labels": list(self.labelnames)}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+    MERGE_MODES = ("sum", "max", "min", "pid")
+
+    def __init__(self, name, documentation, labelnames=(), merge="pid"):
+        if merge not in self.MERGE_MODES:
+            raise ValueError(f"Unknown gauge merge mode: {merge}")
+        super().__init__(name, documentation, labelnames)
+        self.merge = merge
+
+    def describe(self):
+        return {**super().describe(), "merge": self.merge}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def describe(self):
+        return {**super().describe(), "buckets": list(self.buckets)}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=(), merge="pid"):
+        return self._get_or_create(Gauge, name, documentation, labelnames, merge=merge)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def add_collector(self, collector):
+        """`collector()` runs before every snapshot to refresh state gauges"""
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning("Metrics collector failed: %s", e)
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: {**metric.describe(), "samples": metric.samples()} for metric in metrics}
+
+
+registry = MetricsRegistry()
+
+
+def merge_snapshots(snapshots):
+    """
+    Merges {pid: snapshot} of the live workers: counters and histograms are
+    summed per label set, gauges combined by their merge mode
+    """
+    merged = {}
+    for pid, snapshot in sorted(snapshots.items()):
+        for name, metric in snapshot.items():
+            merge = metric.get("merge", "pid") if metric["type"] == "gauge" else "sum"
+            target = merged.get(name)
+            if target is None:
+                labels = metric["labels"] + ["pid"] if merge == "pid" else metric["labels"]
+                target = merged[name] = {**metric, "labels": labels, "samples": {}}
+            for labels, value in metric["samples"]:
+                key = tuple(labels) + (str(pid),) if merge == "pid" else tuple(labels)
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = value
+                elif metric["type"] == "histogram":
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+                    current[2] += value[2]
+                elif merge == "max":
+                    target["samples"][key] = max(current, value)
+                elif merge == "min":
+                    target["samples"][key] = min(current, value)
+                else:
+                    target["samples"][key] = current + value
+    return merged
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render_prometheus(merged):
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for labels, value in sorted(metric["samples"].items()):
+            if metric["type"] == "histogram":
+                cumulative = 0
+                for bound, count in zip(list(metric["buckets"]) + ["+Inf"], value[0]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(metric['labels'], labels, ('le', bound))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(metric['labels'], labels)} {value[1]}")
+                lines.append(f"{name}_count{_format_labels(metric['labels'], labels)} {value[2]}")
+            else:
+                lines.append(f"{name}{_format_labels(metric['labels'], labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class SnapshotExporter:
+    """Writes this worker's snapshot to METRICS_DIR in the background"""
+
+    def __init__(self, registry, directory=METRICS_DIR, interval=METRICS_FLUSH_SECONDS):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def path(self, pid=None):
+        return os.path.join(self.directory, f"metrics-{pid or os.getpid()}.json")
+
+    def ensure_started(self):
+        # Threads do not survive gunicorn's fork, so start one per worker pid
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            os.makedirs(self.directory, exist_ok=True)
+            threading.Thread(target=self._loop, name="metrics-exporter", daemon=True).start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except Exception as e:
+                logger.warning("Metrics snapshot failed: %s", e)
+
+    def write(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".metrics-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.registry.snapshot(), f)
+        os.replace(tmp_path, self.path())
+
+    def collect(self):
+        """Merged snapshots of all live workers, this one freshly written"""
+        self.ensure_started()
+        self.write()
+        snapshots = {}
+        now = time.time()
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            try:
+                pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+            except ValueError:
+                continue
+            try:
+                if not pid_alive(pid) or now - os.path.getmtime(path) > METRICS_STALE_SECONDS:
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    snapshots[pid] = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced or removed by its worker
+        return merge_snapshots(snapshots)
+
+
+exporter = SnapshotExporter(registry)
+
+
+# -- Standard metrics ---------------------------------------------------------
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route", ("method", "route", "status"))
+REQUEST_DB_QUERIES = registry.histogram(
+    "http_request_db_queries", "Database queries issued per request", ("route",), buckets=COUNT_BUCKETS)
+REQUEST_DB_SECONDS = registry.histogram(
+    "http_request_db_seconds", "Time spent in database queries per request", ("route",))
+DB_QUERIES = registry.counter("db_queries_total", "Database queries executed")
+DB_QUERY_SECONDS = registry.counter("db_query_seconds_total", "Time spent executing database queries")
+
+MODEL_LATENCY = registry.histogram(
+    "openai_request_duration_seconds", "OpenAI call latency by call site", ("call_site", "model"),
+    buckets=MODEL_LATENCY_BUCKETS)
+MODEL_REQUESTS = registry.counter(
+    "openai_requests_total", "OpenAI calls by call site and outcome", ("call_site", "model", "outcome"))
+MODEL_TOKENS = registry.counter(
+    "openai_tokens_total", "OpenAI tokens by call site", ("call_site", "model", "kind"))
+
+QUEUE_DEPTH = registry.gauge("import_queue_depth", "Items waiting between import stages", ("queue",), merge="sum")
+ACTIVE_IMPORTS = registry.gauge("import_pipelines_active", "Bulk imports running", merge="sum")
+IMPORT_STAGE_ITEMS = registry.counter("import_stage_items_total", "Items handled per import stage", ("stage",))
+IMPORT_STAGE_SECONDS = registry.counter(
+    "import_stage_busy_seconds_total", "Busy time per import stage", ("stage",))
+
+
+def record_query(cursor, query, params, duration):
+    """Query observer: global and per-request query counts and time"""
+    DB_QUERIES.inc()
+    DB_QUERY_SECONDS.inc(duration)
+    try:
+        g.db_queries = g.get("db_queries", 0) + 1
+        g.db_seconds = g.get("db_seconds", 0.0) + duration
+    except RuntimeError:
+        pass  # outside a request (background threads, CLI)
+
+
+def observe_model_call(call_site, model, seconds, response=None, error=None):
+    MODEL_LATENCY.observe(seconds, call_site=call_site, model=model)
+    MODEL_REQUESTS.inc(call_site=call_site, model=model, outcome="error" if error else "ok")
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        MODEL_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, call_site=call_site, model=model, kind="prompt")
+        MODEL_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, call_site=call_site, model=model, kind="completion")
+
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def init_metrics(app):
+    """Request timing hooks, query observation and the /metrics endpoint"""
+    add_query_observer(record_query)
+
+    @app.before_request
+    def start_request_timer():
+        exporter.ensure_started()
+        g.request_started = time.perf_counter()
+        g.db_queries = 0
+        g.db_seconds = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get("request_started")
+        if started is not None:
+            route = _route_label()
+            REQUEST_LATENCY.observe(time.perf_counter() - started, method=request.method,
+                                    route=route, status=response.status_code)
+            REQUEST_DB_QUERIES.observe(g.get("db_queries", 0), route=route)
+            REQUEST_DB_SECONDS.observe(g.get("db_seconds", 0.0), route=route)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(render_prometheus(exporter.collect()), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    return app
@@ -0,0 +1,171 @@
+# utils/model_scheduler.py
+"""
+Priority scheduling of model calls within a worker process.
+
+Every create_chat_completion() call takes one of MODEL_CONCURRENCY slots
+before it goes out. Calls belong to one of two classes:
+
+  interactive  a user is waiting on the response (entry saves and edits);
+               the default
+  background   bulk import extraction and weekly summaries; run code under
+               `with model_priority(BACKGROUND):` (import pipeline workers
+               and the summary do)
+
+Background calls may hold at most
+MODEL_CONCURRENCY - MODEL_INTERACTIVE_RESERVED slots, so some capacity is
+always free for interactive calls; both settings live on the app config and
+are applied by init_model_scheduler. Queued background calls never start
+while an interactive call is waiting: a new interactive call goes ahead of
+every queued background call (calls already running are not interrupted).
+Within a class, calls start in arrival order.
+
+Interactive calls give up after MODEL_INTERACTIVE_QUEUE_TIMEOUT seconds in the
+queue with ModelQueueTimeout, which entry saves answer with 503 and
+Retry-After. Background calls wait as long as it takes.
+
+Queue waits, queue lengths and running calls are exported as metrics per
+class.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_INTERACTIVE_RESERVED = 2
+DEFAULT_INTERACTIVE_QUEUE_TIMEOUT = 30.0
+# Suggested wait before retrying a call that timed out in the queue
+RETRY_AFTER_SECONDS = 5
+
+# Waits run from none at all to background calls queued behind a long import
+QUEUE_WAIT_BUCKETS = (0.005, 0.025, 0.1, 0.5, 2.0, 5.0, 15.0, 60.0, 300.0)
+
+MODEL_QUEUE_WAIT = registry.histogram(
+    "model_queue_wait_seconds", "Time model calls waited for a slot by priority", ("priority",),
+    buckets=QUEUE_WAIT_BUCKETS)
+MODEL_QUEUE_TIMEOUTS = registry.counter(
+    "model_queue_timeouts_total", "Model calls that gave up waiting for a slot", ("priority",))
+MODEL_QUEUED = registry.gauge(
+    "model_calls_queued", "Model calls waiting for a slot", ("priority",), merge="sum")
+MODEL_RUNNING = registry.gauge("model_calls_running", "Model calls in flight", ("priority",), merge="sum")
+
+_priority = contextvars.ContextVar("model_priority", default=INTERACTIVE)
+
+
+class ModelQueueTimeout(Exception):
+    def __init__(self, priority, timeout, retry_after=RETRY_AFTER_SECONDS):
+        super().__init__(f"No {priority} model call slot within {timeout:g}s")
+        self.retry_after = retry_after
+
+
+@contextmanager
+def model_priority(priority):
+    """Model calls made inside the block (in this thread) use `priority`"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown model call priority: {priority}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class ModelCallScheduler:
+    def __init__(self, capacity=DEFAULT_CONCURRENCY, interactive_reserved=DEFAULT_INTERACTIVE_RESERVED,
+                 interactive_timeout=DEFAULT_INTERACTIVE_QUEUE_TIMEOUT):
+        self.running = {priority: 0 for priority in PRIORITIES}
+        self._waiting = {priority: deque() for priority in PRIORITIES}
+        self._cond = threading.Condition()
+        self.configure(capacity, interactive_reserved, interactive_timeout)
+
+    def configure(self, capacity, interactive_reserved, interactive_timeout):
+        """Applies new limits in place (modules hold a reference to the shared scheduler)"""
+        with self._cond:
+            self.capacity = max(1, capacity)
+            self.background_capacity = max(1, self.capacity - max(0, interactive_reserved))
+            self.timeouts = {INTERACTIVE: interactive_timeout, BACKGROUND: None}
+            self._cond.notify_all()
+
+    def _can_start(self, priority, ticket):
+        if sum(self.running.values()) >= self.capacity or self._waiting[priority][0] is not ticket:
+            return False
+        if priority == BACKGROUND:
+            return not self._waiting[INTERACTIVE] and self.running[BACKGROUND] < self.background_capacity
+        return True
+
+    @contextmanager
+    def slot(self, priority=None, timeout=None):
+        """Holds a model call slot for the block; yields the seconds spent queued"""
+        priority = priority or current_priority()
+        timeout = timeout if timeout is not None else self.timeouts[priority]
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            self._waiting[priority].append(ticket)
+            try:
+                while not self._can_start(priority, ticket):
+                    remaining = None if timeout is None else timeout - (time.monotonic() - started)
+                    if remaining is not None and remaining <= 0:
+                        MODEL_QUEUE_TIMEOUTS.inc(priority=priority)
+                        raise ModelQueueTimeout(priority, timeout)
+                    self._cond.wait(remaining)
+                self.running[priority] += 1
+            finally:
+                self._waiting[priority].remove(ticket)
+                # The head of a queue changed; let the next waiter re-check
+                self._cond.notify_all()
+
+        waited = time.monotonic() - started
+        MODEL_QUEUE_WAIT.observe(waited, priority=priority)
+        try:
+            yield waited
+        finally:
+            with self._cond:
+                self.running[priority] -= 1
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "capacity": self.capacity,
+                "background_capacity": self.background_capacity,
+                "running": dict(self.running),
+                "queued": {priority: len(waiting) for priority, waiting in self._waiting.items()},
+            }
+
+
+model_scheduler = ModelCallScheduler()
+
+
+def init_model_scheduler(app):
+    """Sizes the process-wide scheduler from the MODEL_* settings"""
+    model_scheduler.configure(
+        app.config['MODEL_CONCURRENCY'],
+        app.config['MODEL_INTERACTIVE_RESERVED'],
+        app.config['MODEL_INTERACTIVE_QUEUE_TIMEOUT'],
+    )
+    return app
+
+
+def _collect_scheduler_metrics():
+    stats = model_scheduler.stats()
+    for priority in PRIORITIES:
+        MODEL_QUEUED.set(stats["queued"][priority], priority=priority)
+        MODEL_RUNNING.set(stats["running"][priority], priority=priority)
+
+
+registry.add_collector(_collect_scheduler_metrics)
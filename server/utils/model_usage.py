@@ -0,0 +1,322 @@
+# utils/model_usage.py
+"""
+Token, latency and cost accounting of model calls.
+
+create_chat_completion() hands every call to `usage_recorder`, which queues
+it and writes batches to the append-only model_usage table from a background
+thread (every MODEL_USAGE_FLUSH_SECONDS or MODEL_USAGE_BATCH_SIZE records),
+so the hot path never waits on an INSERT. When the queue is full, e.g. while
+the database is down, records are dropped and counted instead of blocking
+model calls.
+
+Calls are attributed to
+  user_id    the innermost model_usage_scope(user_id=...), set by the
+             extraction pipeline and the weekly summary
+  family_id  the scope's, else the JWT identity of the current request,
+             else the user's family (resolved when the batch is written)
+  source     the scope's, else the request route, else "background"
+
+The model_usage_daily view aggregates per family, UTC day, call site, source
+and model. GET /api/family/usage serves a family its own days; the admin
+endpoint GET /debug/model-usage ranks families, call sites, sources or models
+by estimated cost.
+"""
+
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from flask import has_request_context, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from psycopg2.extras import execute_values
+from .admin_utils import admin_required
+from .db_utils import get_db_connection
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MODEL_USAGE_BATCH_SIZE = int(os.getenv('MODEL_USAGE_BATCH_SIZE', 200))
+MODEL_USAGE_FLUSH_SECONDS = float(os.getenv('MODEL_USAGE_FLUSH_SECONDS', 2.0))
+MODEL_USAGE_QUEUE_SIZE = 10000
+
+# USD per million prompt / completion tokens; MODEL_PRICES=gpt-4o=2.5:10,... overrides
+DEFAULT_MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+
+GROUP_COLUMNS = ("family_id", "call_site", "source", "model")
+
+MODEL_USAGE_RECORDS = registry.counter(
+    "model_usage_records_total", "Model usage records by outcome of the write", ("outcome",))
+
+_scope = contextvars.ContextVar("model_usage_scope", default={})
+
+
+def parse_model_prices(spec):
+    prices = dict(DEFAULT_MODEL_PRICES)
+    for part in filter(None, (part.strip() for part in (spec or "").split(","))):
+        model, _, rates = part.partition("=")
+        prompt_rate, _, completion_rate = rates.partition(":")
+        prices[model.strip()] = (float(prompt_rate), float(completion_rate or prompt_rate))
+    return prices
+
+
+MODEL_PRICES = parse_model_prices(os.getenv('MODEL_PRICES'))
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, prices=None):
+    """Estimated USD cost, or None for models without a price"""
+    rates = (prices or MODEL_PRICES).get(model)
+    if rates is None:
+        return None
+    return round(((prompt_tokens or 0) * rates[0] + (completion_tokens or 0) * rates[1]) / 1_000_000, 6)
+
+
+@contextmanager
+def model_usage_scope(**attributes):
+    """Attributes (user_id, family_id, source) for model calls made inside the block"""
+    current = _scope.get()
+    token = _scope.set({**current, **{key: value for key, value in attributes.items() if value is not None}})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def _as_int(value):
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def current_attribution():
+    """(family_id, user_id, source) for a model call made now"""
+    scope = _scope.get()
+    family_id = _as_int(scope.get("family_id"))
+    source = scope.get("source")
+    if has_request_context():
+        if family_id is None:
+            try:
+                family_id = _as_int(get_jwt_identity())
+            except Exception:
+                pass  # no verified JWT on this request
+        if source is None:
+            source = request.url_rule.rule if request.url_rule else "unmatched"
+    return family_id, _as_int(scope.get("user_id")), source or "background"
+
+
+class UsageRecorder:
+    """Queues usage records and writes them in batches from a background thread"""
+
+    INSERT_SQL = """
+        INSERT INTO model_usage (
+            family_id, user_id, call_site, model, source, prompt_tokens,
+            completion_tokens, latency_ms, outcome, created_at
+        )
+        SELECT COALESCE(v.family_id, u.family_id), v.user_id, v.call_site, v.model, v.source,
+               v.prompt_tokens, v.completion_tokens, v.latency_ms, v.outcome, v.created_at
+        FROM (VALUES %s) AS v (family_id, user_id, call_site, model, source, prompt_tokens,
+                               completion_tokens, latency_ms, outcome, created_at)
+        LEFT JOIN users u ON u.id = v.user_id
+    """
+    # Typed, so a batch whose rows are all NULL in a column still matches the table
+    ROW_TEMPLATE = ("(%s::integer, %s::integer, %s, %s, %s, %s::integer, %s::integer, "
+                    "%s::double precision, %s, %s::timestamp)")
+
+    def __init__(self, batch_size=MODEL_USAGE_BATCH_SIZE, flush_seconds=MODEL_USAGE_FLUSH_SECONDS,
+                 queue_size=MODEL_USAGE_QUEUE_SIZE, connect=get_db_connection):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.connect = connect
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._pid = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _ensure_running(self):
+        # Started lazily and again after a fork: threads do not survive fork()
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="model-usage-writer", daemon=True).start()
+            atexit.register(self.flush)
+
+    def record(self, call_site, model, seconds, usage=None, error=None):
+        family_id, user_id, source = current_attribution()
+        row = (
+            family_id, user_id, call_site, model, source,
+            getattr(usage, "prompt_tokens", None) if usage is not None else None,
+            getattr(usage, "completion_tokens", None) if usage is not None else None,
+            round(seconds * 1000, 3), "error" if error else "ok", datetime.utcnow(),
+        )
+        self._ensure_running()
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            MODEL_USAGE_RECORDS.inc(outcome="dropped")
+
+    def _take_batch(self, timeout):
+        """Up to batch_size queued rows, waiting at most `timeout` for more once one arrived"""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            self.write(self._take_batch(self.flush_seconds))
+
+    def flush(self):
+        """Writes everything queued so far (at exit, and in tests)"""
+        rows = []
+        while True:
+            try:
+                rows.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(rows), self.batch_size):
+            self.write(rows[start:start + self.batch_size])
+
+    def write(self, rows):
+        if not rows:
+            return 0
+        with self._write_lock:
+            conn = self.connect()
+            if not conn:
+                self.dropped += len(rows)
+                MODEL_USAGE_RECORDS.inc(len(rows), outcome="dropped")
+                logger.warning("Model usage not recorded: no database connection", extra={"records": len(rows)})
+                return 0
+            try:
+                execute_values(conn.cursor(), self.INSERT_SQL, rows, template=self.ROW_TEMPLATE,
+                               page_size=self.batch_size)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                self.dropped += len(rows)
+                MODEL_USAGE_RECORDS.inc(len(rows), outcome="dropped")
+                logger.exception("Writing model usage failed", extra={"records": len(rows)})
+                return 0
+            finally:
+                conn.close()
+        MODEL_USAGE_RECORDS.inc(len(rows), outcome="written")
+        return len(rows)
+
+
+usage_recorder = UsageRecorder()
+
+
+def _with_cost(row):
+    row = dict(row)
+    row["total_tokens"] = (row.get("prompt_tokens") or 0) + (row.get("completion_tokens") or 0)
+    if "model" in row:
+        row["estimated_cost_usd"] = estimate_cost(row["model"], row.get("prompt_tokens"), row.get("completion_tokens"))
+    if row.get("calls"):
+        row["avg_latency_ms"] = round((row.pop("total_latency_ms") or 0) / row["calls"], 1)
+    return row
+
+
+def family_daily_usage(cursor, family_id, days=30):
+    """Per-day, call site and model usage of one family over the last `days` days"""
+    cursor.execute("""
+        SELECT usage_date, call_site, model,
+               SUM(calls)::integer AS calls, SUM(errors)::integer AS errors,
+               SUM(prompt_tokens)::bigint AS prompt_tokens, SUM(completion_tokens)::bigint AS completion_tokens,
+               SUM(total_latency_ms) AS total_latency_ms, MAX(max_latency_ms) AS max_latency_ms
+        FROM model_usage_daily
+        WHERE family_id = %s AND usage_date > CURRENT_DATE - %s::integer
+        GROUP BY usage_date, call_site, model
+        ORDER BY usage_date DESC, call_site, model
+    """, (family_id, days))
+    rows = [_with_cost(row) for row in cursor.fetchall()]
+    for row in rows:
+        row["usage_date"] = row["usage_date"].isoformat()
+    return rows
+
+
+def top_usage(cursor, group_by="family_id", days=7, limit=20):
+    """Usage over the last `days` days grouped by one of GROUP_COLUMNS, costliest first"""
+    if group_by not in GROUP_COLUMNS:
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_COLUMNS)}")
+    # Costs are per model, so group by model too and fold the models together below
+    model_column = "" if group_by == "model" else ", model"
+    cursor.execute(f"""
+        SELECT {group_by} AS key{model_column},
+               SUM(calls)::integer AS calls, SUM(errors)::integer AS errors,
+               SUM(prompt_tokens)::bigint AS prompt_tokens, SUM(completion_tokens)::bigint AS completion_tokens,
+               SUM(total_latency_ms) AS total_latency_ms, MAX(max_latency_ms) AS max_latency_ms
+        FROM model_usage_daily
+        WHERE usage_date > CURRENT_DATE - %s::integer
+        GROUP BY {group_by}{model_column}
+    """, (days,))
+
+    groups = {}
+    for row in cursor.fetchall():
+        model = row.get("model", row["key"])
+        group = groups.setdefault(row["key"], {
+            group_by: row["key"], "calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "total_latency_ms": 0.0, "max_latency_ms": 0.0, "estimated_cost_usd": 0.0, "unpriced_calls": 0})
+        for field in ("calls", "errors", "prompt_tokens", "completion_tokens"):
+            group[field] += row[field] or 0
+        group["total_latency_ms"] += row["total_latency_ms"] or 0
+        group["max_latency_ms"] = max(group["max_latency_ms"], row["max_latency_ms"] or 0)
+        cost = estimate_cost(model, row["prompt_tokens"], row["completion_tokens"])
+        if cost is None:
+            group["unpriced_calls"] += row["calls"] or 0
+        else:
+            group["estimated_cost_usd"] = round(group["estimated_cost_usd"] + cost, 6)
+
+    ranked = sorted(groups.values(), key=lambda group: (group["estimated_cost_usd"], group["prompt_tokens"]
+                                                        + group["completion_tokens"]), reverse=True)
+    for group in ranked:
+        group["total_tokens"] = group["prompt_tokens"] + group["completion_tokens"]
+        group["avg_latency_ms"] = round(group.pop("total_latency_ms") / group["calls"], 1) if group["calls"] else None
+    return ranked[:limit]
+
+
+def init_model_usage(app):
+    """Admin endpoint ranking usage across families"""
+
+    @app.route('/debug/model-usage', methods=['GET'])
+    @admin_required
+    def get_model_usage():
+        group_by = request.args.get('group_by', 'family_id')
+        if group_by not in GROUP_COLUMNS:
+            return jsonify({"error": f"group_by must be one of {', '.join(GROUP_COLUMNS)}"}), 400
+        days = max(1, min(request.args.get('days', 7, type=int), 366))
+        limit = max(1, min(request.args.get('limit', 20, type=int), 500))
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({"error": "Database connection failed"}), 500
+        try:
+            return jsonify({"group_by": group_by, "period_days": days,
+                            "usage": top_usage(conn.cursor(), group_by, days, limit)})
+        except Exception:
+            logger.exception("Fetching model usage failed")
+            return jsonify({"error": "Failed to fetch model usage"}), 500
+        finally:
+            conn.close()
+
+    return app
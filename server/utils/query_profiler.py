@@ -0,0 +1,224 @@
+# utils/query_profiler.py
+"""
+Per-request query profiler and N+1 detector.
+
+A profiled request records every statement issued through
+get_db_connection() (as a normalized shape without parameter values), its
+duration and row count. Shapes repeated QUERY_PROFILE_N_PLUS_ONE times or
+more in one request are flagged as likely N+1 loops and logged.
+
+Requests are profiled when
+  - sampled, with probability QUERY_PROFILE_SAMPLE_RATE (safe in production:
+    unprofiled requests pay one flask.g lookup per statement), or
+  - asked for with `X-Query-Profile: 1` by an admin (X-Admin-Token) or on a
+    debug server. These requests also get the summary back in the
+    X-Query-Profile response header and the report id in X-Query-Profile-Id.
+
+The last QUERY_PROFILE_KEEP reports of each worker are served by the admin
+endpoints GET /debug/query-profiles and /debug/query-profiles/<id>.
+"""
+
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from functools import lru_cache
+from flask import g, jsonify, request
+from .admin_utils import admin_required, is_admin_request
+from .db_utils import add_query_observer
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Query-Profile"
+PROFILE_ID_HEADER = "X-Query-Profile-Id"
+QUERY_PROFILE_KEEP = int(os.getenv('QUERY_PROFILE_KEEP', 200))
+MAX_STATEMENTS_PER_PROFILE = 1000
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_ROW = r"\((?:[^()]|\([^()]*\))*\)"
+_VALUES_LIST = re.compile(rf"\bVALUES\s*{_ROW}(?:\s*,\s*{_ROW})*", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(query):
+    """SQL with literals, placeholders and value lists collapsed, for grouping"""
+    shape = _STRING_LITERAL.sub("?", query)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    shape = _VALUES_LIST.sub("VALUES (...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def _query_text(cursor, query):
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode("utf-8", errors="replace")
+    try:
+        return query.as_string(cursor)  # psycopg2.sql.Composed
+    except Exception:
+        return str(query)
+
+
+class QueryProfile:
+    """Statements of one request"""
+
+    def __init__(self, method, path, route, forced=False):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.route = route
+        self.forced = forced
+        self.started = time.perf_counter()
+        self.statements = []
+        self.dropped = 0
+
+    def record(self, shape, seconds, rows):
+        if len(self.statements) >= MAX_STATEMENTS_PER_PROFILE:
+            self.dropped += 1
+            return
+        self.statements.append((shape, seconds, rows))
+
+    def report(self, status=None, n_plus_one_threshold=5):
+        shapes = OrderedDict()
+        for shape, seconds, rows in self.statements:
+            group = shapes.get(shape)
+            if group is None:
+                group = shapes[shape] = {"sql": shape, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0}
+            group["count"] += 1
+            group["total_ms"] += seconds * 1000
+            group["max_ms"] = max(group["max_ms"], seconds * 1000)
+            group["rows"] += rows or 0
+        for group in shapes.values():
+            group["total_ms"] = round(group["total_ms"], 3)
+            group["max_ms"] = round(group["max_ms"], 3)
+
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": status,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "queries": len(self.statements) + self.dropped,
+            "query_ms": round(sum(seconds for _, seconds, _ in self.statements) * 1000, 3),
+            "statements": [
+                {"sql": shape, "ms": round(seconds * 1000, 3), "rows": rows}
+                for shape, seconds, rows in self.statements
+            ],
+            "dropped_statements": self.dropped,
+            "shapes": sorted(shapes.values(), key=lambda group: group["total_ms"], reverse=True),
+            "n_plus_one": [
+                {"sql": group["sql"], "count": group["count"]}
+                for group in shapes.values() if group["count"] >= n_plus_one_threshold
+            ],
+        }
+
+
+class ProfileStore:
+    """The most recent reports of this worker"""
+
+    def __init__(self, size=QUERY_PROFILE_KEEP):
+        self._reports = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, report):
+        with self._lock:
+            self._reports.append(report)
+
+    def get(self, profile_id):
+        with self._lock:
+            return next((report for report in self._reports if report["id"] == profile_id), None)
+
+    def recent(self, limit=50, n_plus_one_only=False):
+        with self._lock:
+            reports = list(self._reports)
+        if n_plus_one_only:
+            reports = [report for report in reports if report["n_plus_one"]]
+        return reports[::-1][:limit]
+
+    def clear(self):
+        with self._lock:
+            self._reports.clear()
+
+
+profile_store = ProfileStore()
+
+
+def profile_query(cursor, query, params, duration):
+    """Query observer: records the statement on the request's profile, if any"""
+    try:
+        profile = g.get("query_profile")
+    except RuntimeError:
+        return  # outside a request (background threads, CLI)
+    if profile is None:
+        return
+    rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+    profile.record(statement_shape(_query_text(cursor, query)), duration, rows)
+
+
+def summary_header(report):
+    return f"queries={report['queries']}; db_ms={report['query_ms']}; n_plus_one={len(report['n_plus_one'])}"
+
+
+def _profile_requested(app):
+    if request.headers.get(PROFILE_HEADER) != "1":
+        return False
+    return app.debug or is_admin_request()
+
+
+def init_query_profiler(app):
+    """Sampling hooks, the query observer and the admin report endpoints"""
+    add_query_observer(profile_query)
+
+    @app.before_request
+    def start_query_profile():
+        forced = _profile_requested(app)
+        if forced or random.random() < app.config.get('QUERY_PROFILE_SAMPLE_RATE', 0.0):
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            g.query_profile = QueryProfile(request.method, request.path, route, forced=forced)
+
+    @app.after_request
+    def finish_query_profile(response):
+        profile = g.pop("query_profile", None)
+        if profile is None:
+            return response
+
+        report = profile.report(response.status_code, app.config.get('QUERY_PROFILE_N_PLUS_ONE', 5))
+        profile_store.add(report)
+        for group in report["n_plus_one"]:
+            logger.warning("Repeated query shape, possible N+1", extra={
+                "route": report["route"], "method": report["method"], "count": group["count"],
+                "sql": group["sql"][:200], "profile_id": report["id"]})
+        if profile.forced:
+            response.headers[PROFILE_HEADER] = summary_header(report)
+            response.headers[PROFILE_ID_HEADER] = report["id"]
+        return response
+
+    @app.route('/debug/query-profiles', methods=['GET'])
+    @admin_required
+    def list_query_profiles():
+        limit = request.args.get('limit', 50, type=int)
+        n_plus_one_only = request.args.get('n_plus_one', '').lower() in ('1', 'true')
+        reports = profile_store.recent(limit, n_plus_one_only)
+        # The list omits per-statement timelines; fetch a single report for those
+        return jsonify([{key: value for key, value in report.items() if key != "statements"} for report in reports])
+
+    @app.route('/debug/query-profiles/<profile_id>', methods=['GET'])
+    @admin_required
+    def get_query_profile(profile_id):
+        report = profile_store.get(profile_id)
+        if report is None:
+            return jsonify({"error": "Profile not found"}), 404
+        return jsonify(report)
+
+    return app
@@ -0,0 +1,301 @@
+# utils/rate_limit.py
+"""
+Token-bucket rate limiting of model calls, per family and globally.
+
+One token is one model call. Every admission takes tokens from the family's
+bucket and from the global bucket (the share of the OpenAI rate limit this
+deployment may use):
+
+  interactive  `@model_rate_limited(cost)` on model-backed endpoints answers
+               429 with Retry-After when either bucket is empty
+  background   `rate_limiter.acquire(...)` / `admitted(...)` wait for tokens
+               (bulk import extraction). A family whose own bucket is empty
+               may still borrow from the global bucket while it is more than
+               RATE_LIMIT_BORROW_HEADROOM full, so a lone importer runs at
+               full speed on an idle server but is held to its family rate as
+               soon as others need the capacity.
+
+The global rate adapts to the upstream: every 429 from OpenAI halves it
+(down to 10%) and successful calls restore it step by step.
+
+Buckets live in process memory by default (limits then apply per worker
+process); RATE_LIMIT_BACKEND=postgres shares them between workers and hosts
+through the rate_limit_buckets table. If that table cannot be reached, calls
+are admitted rather than failed.
+"""
+
+import logging
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from .db_utils import get_db_connection
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_KEY = "global"
+MAX_POLL_SECONDS = 1.0
+MIN_RATE_FACTOR = 0.1
+RECOVERY_STEP = 0.02
+
+RATE_LIMIT_DECISIONS = registry.counter(
+    "rate_limit_decisions_total", "Model call admissions by kind and outcome", ("kind", "outcome"))
+RATE_LIMIT_WAIT = registry.histogram(
+    "rate_limit_wait_seconds", "Time background model calls waited for admission")
+# Every worker adapts its own factor, so it is reported per pid
+RATE_LIMIT_FACTOR = registry.gauge(
+    "rate_limit_global_factor", "Share of the configured global model call rate in use", merge="pid")
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Model call rate limit exceeded, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, burst, now):
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, rate, burst, cost, reserve, now):
+        """0 when `cost` tokens were taken, else seconds until they (plus `reserve`) are available"""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens - cost >= reserve:
+            self.tokens -= cost
+            return 0.0
+        return (cost + reserve - self.tokens) / rate if rate > 0 else math.inf
+
+
+class MemoryBucketStore:
+    """Buckets of this process; idle buckets beyond `max_buckets` are forgotten (they refill anyway)"""
+
+    def __init__(self, max_buckets=10000, clock=time.monotonic):
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost, reserve=0.0):
+        with self._lock:
+            now = self.clock()
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(burst, now)
+                if len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(key)
+            return bucket.take(rate, burst, cost, reserve, now)
+
+    def refund(self, key, cost):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.tokens += cost
+
+
+class PostgresBucketStore:
+    """Buckets in rate_limit_buckets, updated atomically by one statement per take"""
+
+    TAKE_SQL = """
+        INSERT INTO rate_limit_buckets AS b (bucket_key, tokens, updated_at)
+        VALUES (%(key)s, %(burst)s - %(cost)s, clock_timestamp())
+        ON CONFLICT (bucket_key) DO UPDATE
+        SET tokens = LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * %(rate)s)
+                     - %(cost)s,
+            updated_at = clock_timestamp()
+        WHERE LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * %(rate)s)
+              - %(cost)s >= %(reserve)s
+        RETURNING tokens
+    """
+    AVAILABLE_SQL = """
+        SELECT LEAST(%(burst)s, tokens + EXTRACT(EPOCH FROM clock_timestamp() - updated_at) * %(rate)s) AS available
+        FROM rate_limit_buckets WHERE bucket_key = %(key)s
+    """
+
+    def __init__(self, connect=get_db_connection):
+        self.connect = connect
+
+    def take(self, key, rate, burst, cost, reserve=0.0):
+        params = {"key": key, "rate": rate, "burst": burst, "cost": cost, "reserve": reserve}
+        conn = self.connect()
+        if not conn:
+            logger.warning("Rate limit store unavailable, admitting", extra={"bucket": key})
+            return 0.0
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.TAKE_SQL, params)
+            taken = cursor.fetchone()
+            if taken is None:
+                cursor.execute(self.AVAILABLE_SQL, params)
+                available = float(cursor.fetchone()["available"])
+            conn.commit()
+        except Exception as e:
+            logger.warning("Rate limit store failed, admitting: %s", e, extra={"bucket": key})
+            return 0.0
+        finally:
+            conn.close()
+        if taken is not None:
+            return 0.0
+        return (cost + reserve - available) / rate if rate > 0 else math.inf
+
+    def refund(self, key, cost):
+        conn = self.connect()
+        if not conn:
+            return
+        try:
+            conn.cursor().execute(
+                "UPDATE rate_limit_buckets SET tokens = tokens + %s WHERE bucket_key = %s", (cost, key))
+            conn.commit()
+        except Exception as e:
+            logger.warning("Rate limit refund failed: %s", e, extra={"bucket": key})
+        finally:
+            conn.close()
+
+
+class RateLimiter:
+    def __init__(self, store, family_per_minute=30, family_burst=20, global_per_minute=300,
+                 global_burst=60, borrow_headroom=0.5):
+        self.store = store
+        self.family_rate = family_per_minute / 60
+        self.family_burst = family_burst
+        self.global_rate = global_per_minute / 60
+        self.global_burst = global_burst
+        self.borrow_headroom = borrow_headroom
+        self.factor = 1.0
+        self._factor_lock = threading.Lock()
+
+    # -- upstream feedback (AIMD on the global rate) --------------------------
+
+    def upstream_throttled(self):
+        with self._factor_lock:
+            self.factor = max(MIN_RATE_FACTOR, self.factor / 2)
+        RATE_LIMIT_FACTOR.set(self.factor)
+        logger.warning("Upstream rate limited, global model call rate reduced", extra={"factor": self.factor})
+
+    def upstream_ok(self):
+        if self.factor < 1.0:
+            with self._factor_lock:
+                self.factor = min(1.0, self.factor + RECOVERY_STEP)
+            RATE_LIMIT_FACTOR.set(self.factor)
+
+    # -- admission ------------------------------------------------------------
+
+    def try_acquire(self, family_id, cost=1, borrow=False):
+        """0 when admitted, else seconds to wait before trying again"""
+        cost = min(cost, self.family_burst, self.global_burst)
+        family_key = f"family:{family_id}"
+        global_rate = self.global_rate * self.factor
+
+        family_wait = self.store.take(family_key, self.family_rate, self.family_burst, cost)
+        if family_wait == 0:
+            global_wait = self.store.take(GLOBAL_KEY, global_rate, self.global_burst, cost)
+            if global_wait == 0:
+                return 0.0
+            self.store.refund(family_key, cost)
+            return global_wait
+
+        if borrow:
+            # Work-conserving: idle global capacity may go beyond the family's share
+            global_wait = self.store.take(GLOBAL_KEY, global_rate, self.global_burst, cost,
+                                          reserve=self.global_burst * self.borrow_headroom)
+            if global_wait == 0:
+                return 0.0
+            return min(family_wait, global_wait)
+        return family_wait
+
+    def acquire(self, family_id, cost=1, timeout=None, borrow=True):
+        """Waits for admission; returns the seconds waited or raises RateLimitExceeded after `timeout`"""
+        started = time.monotonic()
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(family_id, cost, borrow=borrow)
+            if wait == 0:
+                RATE_LIMIT_WAIT.observe(waited)
+                RATE_LIMIT_DECISIONS.inc(kind="background", outcome="waited" if waited > 0 else "admitted")
+                return waited
+            if timeout is not None and waited + min(wait, MAX_POLL_SECONDS) > timeout:
+                RATE_LIMIT_DECISIONS.inc(kind="background", outcome="rejected")
+                raise RateLimitExceeded(wait)
+            # Jittered so waiting importers do not retry in lockstep
+            time.sleep(min(wait, MAX_POLL_SECONDS) * random.uniform(0.9, 1.1))
+            waited = time.monotonic() - started
+
+    def admitted(self, function, family_id, cost=1, timeout=None):
+        """`function` waiting for admission before every call (for background stages)"""
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            self.acquire(family_id, cost, timeout)
+            return function(*args, **kwargs)
+        return wrapper
+
+
+rate_limiter = None
+
+
+def build_rate_limiter(config):
+    if not config.get('RATE_LIMIT_ENABLED'):
+        return None
+    store = PostgresBucketStore() if config.get('RATE_LIMIT_BACKEND') == 'postgres' else MemoryBucketStore()
+    return RateLimiter(
+        store,
+        family_per_minute=config['RATE_LIMIT_FAMILY_PER_MINUTE'],
+        family_burst=config['RATE_LIMIT_FAMILY_BURST'],
+        global_per_minute=config['RATE_LIMIT_GLOBAL_PER_MINUTE'],
+        global_burst=config['RATE_LIMIT_GLOBAL_BURST'],
+        borrow_headroom=config['RATE_LIMIT_BORROW_HEADROOM'],
+    )
+
+
+def init_rate_limiting(app):
+    """Configures the process-wide limiter from RATE_LIMIT_* settings (None when disabled)"""
+    global rate_limiter
+    rate_limiter = build_rate_limiter(app.config)
+    return app
+
+
+def background_extract(function, family_id, cost, timeout):
+    """`function` behind blocking admission when rate limiting is on"""
+    if rate_limiter is None:
+        return function
+    return rate_limiter.admitted(function, family_id, cost, timeout)
+
+
+def _limit_key():
+    verify_jwt_in_request(optional=True)
+    return get_jwt_identity() or f"ip:{request.remote_addr}"
+
+
+def model_rate_limited(cost=1):
+    """
+    429 with Retry-After when the caller's family (or the deployment) is out
+    of model calls. Apply below @jwt_required(), @idempotent and
+    @conditional_get so replays and cached responses cost nothing.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = rate_limiter
+            if limiter is None:
+                return view(*args, **kwargs)
+            retry_after = limiter.try_acquire(_limit_key(), cost)
+            if retry_after == 0:
+                RATE_LIMIT_DECISIONS.inc(kind="interactive", outcome="admitted")
+                return view(*args, **kwargs)
+
+            RATE_LIMIT_DECISIONS.inc(kind="interactive", outcome="rejected")
+            seconds = max(1, math.ceil(retry_after)) if math.isfinite(retry_after) else 60
+            response = make_response(jsonify({
+                "error": "Too many AI requests, please try again shortly",
+                "retry_after": seconds
+            }), 429)
+            response.headers["Retry-After"] = str(seconds)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,91 @@
+# utils/recompute_planner.py
+"""
+Finds entries whose metrics were produced by an older prompt version and
+plans their re-extraction, most recent entries first, so prompt changes can be
+rolled out a slice at a time instead of reprocessing everything at once.
+"""
+
+from psycopg2.extras import RealDictCursor
+from .db_utils import get_db_connection
+from prompts import PROMPT_VERSION
+
+
+def get_stale_version_report(current_version=PROMPT_VERSION, user_id=None):
+    """
+    Per-user counts of entries on the current prompt version vs. stale ones.
+    Entries with no metrics or no recorded version count as stale.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return []
+
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        query = """
+            SELECT
+                re.user_id,
+                COUNT(*) AS total_entries,
+                COUNT(*) FILTER (WHERE hm.processing_version = %(version)s) AS current_entries,
+                COUNT(*) FILTER (WHERE hm.processing_version IS DISTINCT FROM %(version)s) AS stale_entries,
+                MAX(re.entry_date) FILTER (WHERE hm.processing_version IS DISTINCT FROM %(version)s) AS newest_stale_date,
+                MIN(re.entry_date) FILTER (WHERE hm.processing_version IS DISTINCT FROM %(version)s) AS oldest_stale_date,
+                ARRAY_AGG(DISTINCT COALESCE(hm.processing_version, 'unversioned')) AS versions
+            FROM raw_entries re
+            LEFT JOIN health_metrics hm ON re.id = hm.raw_entry_id
+        """
+        params = {"version": current_version}
+        if user_id:
+            query += " WHERE re.user_id = %(user_id)s"
+            params["user_id"] = user_id
+        query += " GROUP BY re.user_id ORDER BY stale_entries DESC, re.user_id"
+
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def plan_recompute(limit, current_version=PROMPT_VERSION, user_id=None,
+                   per_user_limit=None, exclude_ids=None):
+    """
+    Next slice of stale entries to re-extract, newest entry_date first.
+    `per_user_limit` caps how much of the slice a single user can take, so
+    one long diary does not starve everyone else's recent entries.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return []
+
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        query = """
+            SELECT raw_entry_id, user_id, entry_text, entry_date, processing_version
+            FROM (
+                SELECT
+                    re.id AS raw_entry_id, re.user_id, re.entry_text, re.entry_date,
+                    hm.processing_version,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY re.user_id
+                        ORDER BY re.entry_date DESC NULLS LAST, re.id DESC
+                    ) AS user_rank
+                FROM raw_entries re
+                LEFT JOIN health_metrics hm ON re.id = hm.raw_entry_id
+                WHERE hm.processing_version IS DISTINCT FROM %(version)s
+        """
+        params = {"version": current_version, "limit": limit}
+        if user_id:
+            query += " AND re.user_id = %(user_id)s"
+            params["user_id"] = user_id
+        if exclude_ids:
+            query += " AND re.id <> ALL(%(exclude_ids)s)"
+            params["exclude_ids"] = list(exclude_ids)
+        query += ") ranked"
+        if per_user_limit:
+            query += " WHERE user_rank <= %(per_user_limit)s"
+            params["per_user_limit"] = per_user_limit
+        query += " ORDER BY entry_date DESC NULLS LAST, raw_entry_id DESC LIMIT %(limit)s"
+
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
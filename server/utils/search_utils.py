@@ -0,0 +1,101 @@
+# utils/search_utils.py
+"""
+Full-text search over diary entries.
+
+Ranked search uses the generated raw_entries.search_vector column (GIN
+indexed) with websearch_to_tsquery, so users can type plain phrases, quoted
+phrases and -exclusions. Fuzzy search uses pg_trgm word similarity for typos
+and partial words. Results are paged with an opaque keyset cursor over
+(score, id), so deep pages cost the same as the first one.
+"""
+
+import base64
+import json
+from psycopg2.extras import RealDictCursor
+
+SEARCH_CONFIG = "english"
+MAX_PAGE_SIZE = 100
+HEADLINE_OPTIONS = 'MaxFragments=2, MaxWords=20, MinWords=6, FragmentDelimiter=" … ", StartSel=<mark>, StopSel=</mark>'
+FUZZY_SNIPPET_CHARS = 160
+
+
+def encode_cursor(score, entry_id):
+    return base64.urlsafe_b64encode(json.dumps([score, entry_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Returns (score, id); raises ValueError for malformed cursors"""
+    try:
+        score, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(score), int(entry_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def search_entries(conn, family_id, query, user_id=None, start_date=None, end_date=None,
+                   limit=20, cursor=None, fuzzy=False):
+    """
+    One page of matching entries of a family, best match first.
+    Returns (results, next_cursor); next_cursor is None on the last page.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    filters = ["u.family_id = %(family_id)s"]
+    params = {"family_id": family_id, "query": query, "limit": limit + 1, "headline_options": HEADLINE_OPTIONS}
+
+    if user_id:
+        filters.append("re.user_id = %(user_id)s")
+        params["user_id"] = user_id
+    if start_date:
+        filters.append("re.entry_date >= %(start_date)s")
+        params["start_date"] = start_date
+    if end_date:
+        filters.append("re.entry_date <= %(end_date)s")
+        params["end_date"] = end_date
+
+    if fuzzy:
+        match = "%(query)s <%% re.entry_text"
+        score = "word_similarity(%(query)s, re.entry_text)"
+    else:
+        match = f"re.search_vector @@ websearch_to_tsquery('{SEARCH_CONFIG}', %(query)s)"
+        score = f"ts_rank(re.search_vector, websearch_to_tsquery('{SEARCH_CONFIG}', %(query)s))"
+    filters.append(match)
+
+    if cursor:
+        params["cursor_score"], params["cursor_id"] = decode_cursor(cursor)
+        # Scores are float4; compare in the same precision they were returned in
+        filters.append(f"({score}, re.id) < (%(cursor_score)s::real, %(cursor_id)s)")
+
+    if fuzzy:
+        snippet = f"left(page.entry_text, {FUZZY_SNIPPET_CHARS})"
+    else:
+        snippet = (f"ts_headline('{SEARCH_CONFIG}', page.entry_text, "
+                   f"websearch_to_tsquery('{SEARCH_CONFIG}', %(query)s), %(headline_options)s)")
+
+    # Rank and page on the index first; snippets are only built for the page
+    sql = f"""
+        SELECT page.id, page.user_id, page.member_name, page.entry_date, page.score,
+               {snippet} AS snippet
+        FROM (
+            SELECT re.id, re.user_id, u.display_name AS member_name, re.entry_date,
+                   re.entry_text, {score}::real AS score
+            FROM raw_entries re
+            JOIN users u ON re.user_id = u.id
+            WHERE {" AND ".join(filters)}
+            ORDER BY score DESC, re.id DESC
+            LIMIT %(limit)s
+        ) page
+        ORDER BY page.score DESC, page.id DESC
+    """
+
+    db_cursor = conn.cursor(cursor_factory=RealDictCursor)
+    db_cursor.execute(sql, params)
+    rows = [dict(row) for row in db_cursor.fetchall()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["score"], rows[-1]["id"])
+
+    for row in rows:
+        row["entry_date"] = row["entry_date"].isoformat() if row["entry_date"] else None
+    return rows, next_cursor
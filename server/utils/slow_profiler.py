@@ -0,0 +1,321 @@
+# utils/slow_profiler.py
+"""
+Sampling profiler for slow requests.
+
+Opt-in with SLOW_REQUEST_PROFILE_MS > 0. While enabled, one sampler thread
+per worker process wakes every SLOW_REQUEST_SAMPLE_INTERVAL_MS, reads the
+stacks of the threads serving requests (sys._current_frames) and counts them
+in collapsed form (`module:function;module:function;...`). When the request
+finishes under the threshold its samples are thrown away; when it took
+longer, they are written to SLOW_REQUEST_PROFILE_DIR as `<id>.json` (request
+details, hottest frames and stacks) and `<id>.folded` (input for
+flamegraph.pl or speedscope), and a warning is logged. Only the newest
+SLOW_REQUEST_PROFILE_KEEP reports are kept.
+
+Work a request hands to other threads (the import pipeline's parse and
+extraction workers) is sampled too when those threads run inside
+`sampled_thread(request_samples(), label)`; their stacks are rooted at the
+label.
+
+Admin endpoints (X-Admin-Token): GET /debug/slow-requests lists recent
+reports of every worker sharing the directory, /debug/slow-requests/<id>
+returns one, with ?format=folded for the raw collapsed stacks.
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from flask import Response, g, jsonify, request
+from .admin_utils import admin_required
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_PROFILE_KEEP = int(os.getenv('SLOW_REQUEST_PROFILE_KEEP', 200))
+MAX_STACK_DEPTH = 80
+HOT_FRAMES = 15
+_REPORT_ID = re.compile(r"^[0-9a-f]{16}$")
+
+
+def collapse_stack(frame, root=None, max_depth=MAX_STACK_DEPTH):
+    """`root;module:function;...` from the outermost frame to `frame`"""
+    names = []
+    while frame is not None and len(names) < max_depth:
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    if root:
+        names.append(root)
+    return ";".join(reversed(names))
+
+
+class RequestSamples:
+    """Stack samples of one request (and the threads it handed work to)"""
+
+    def __init__(self, method, path, route):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.route = route
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.stacks = Counter()
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def add(self, stack, thread_label):
+        with self._lock:
+            self.stacks[stack] += 1
+            self.threads.add(thread_label)
+
+    def report(self, status, interval_ms):
+        with self._lock:
+            stacks = dict(self.stacks)
+            threads = sorted(self.threads)
+        leaves = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(stacks.values())
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "interval_ms": interval_ms,
+            "samples": total,
+            "threads": threads,
+            "hot_frames": [
+                {"frame": frame, "samples": count, "share": round(count / total, 3)}
+                for frame, count in leaves.most_common(HOT_FRAMES)
+            ],
+            "stacks": stacks,
+        }
+
+
+class StackSampler:
+    """Background thread sampling the stacks of registered threads"""
+
+    def __init__(self, interval_seconds):
+        self.interval = interval_seconds
+        self._active = {}  # thread ident -> (RequestSamples, label)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+
+    def _ensure_running(self):
+        # Started lazily and again after a fork: threads do not survive fork()
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, name="slow-request-sampler", daemon=True).start()
+
+    def register(self, samples, label, ident=None):
+        """Samples thread `ident` (default: the caller) into `samples`; False if already registered"""
+        ident = ident or threading.get_ident()
+        with self._lock:
+            if ident in self._active:
+                return False
+            self._active[ident] = (samples, label)
+            self._ensure_running()
+        self._wake.set()
+        return True
+
+    def unregister(self, ident=None):
+        with self._lock:
+            self._active.pop(ident or threading.get_ident(), None)
+
+    def sample_once(self):
+        with self._lock:
+            active = list(self._active.items())
+        if not active:
+            return 0
+        frames = sys._current_frames()
+        taken = 0
+        for ident, (samples, label) in active:
+            frame = frames.get(ident)
+            if frame is not None:
+                samples.add(collapse_stack(frame, label), label)
+                taken += 1
+        return taken
+
+    def _run(self):
+        while True:
+            # Sleep until something registers; no wake-ups while idle
+            self._wake.wait()
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+            time.sleep(self.interval)
+            try:
+                self.sample_once()
+            except Exception:
+                logger.exception("Stack sampling failed")
+
+
+class SlowRequestStore:
+    """Reports on disk, shared by every worker pointing at the same directory"""
+
+    def __init__(self, directory, keep=SLOW_REQUEST_PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+
+    def save(self, report):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, report["id"])
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in sorted(report["stacks"].items()))
+        # Metadata last, so listed reports always have their stacks
+        tmp = base + ".json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f)
+        os.replace(tmp, base + ".json")
+        self.prune()
+
+    def _reports_newest_first(self):
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(".json")]
+        except FileNotFoundError:
+            return []
+        paths = [os.path.join(self.directory, name) for name in names]
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.path.getmtime(path)
+            except FileNotFoundError:
+                pass  # pruned by another worker
+        return sorted(mtimes, key=mtimes.get, reverse=True)
+
+    def prune(self):
+        for path in self._reports_newest_first()[self.keep:]:
+            for extension in (".json", ".folded"):
+                try:
+                    os.remove(path[:-len(".json")] + extension)
+                except FileNotFoundError:
+                    pass
+
+    def recent(self, limit=50):
+        reports = []
+        for path in self._reports_newest_first()[:limit]:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    report = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue
+            report.pop("stacks", None)
+            reports.append(report)
+        return reports
+
+    def get(self, report_id):
+        if not _REPORT_ID.match(report_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, report_id + ".json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def folded(self, report_id):
+        if not _REPORT_ID.match(report_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, report_id + ".folded"), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+_sampler = None
+
+
+def request_samples():
+    """Samples of the current request, when it is being profiled"""
+    try:
+        return g.get("slow_request_samples")
+    except RuntimeError:
+        return None  # outside a request
+
+
+@contextmanager
+def sampled_thread(samples, label):
+    """Samples the calling (worker) thread into a request's samples while inside the block"""
+    registered = samples is not None and _sampler is not None and _sampler.register(samples, label)
+    try:
+        yield
+    finally:
+        if registered:
+            _sampler.unregister()
+
+
+def init_slow_request_profiler(app):
+    """Request hooks and admin endpoints; a no-op unless SLOW_REQUEST_PROFILE_MS > 0"""
+    global _sampler
+    threshold_ms = app.config.get('SLOW_REQUEST_PROFILE_MS', 0)
+    if not threshold_ms or threshold_ms <= 0:
+        return app
+
+    interval_ms = app.config.get('SLOW_REQUEST_SAMPLE_INTERVAL_MS', 10)
+    if _sampler is None:
+        _sampler = StackSampler(interval_ms / 1000)
+    store = SlowRequestStore(app.config.get('SLOW_REQUEST_PROFILE_DIR') or 'slow_requests')
+
+    @app.before_request
+    def start_slow_request_samples():
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        samples = RequestSamples(request.method, request.path, route)
+        if _sampler.register(samples, "request"):
+            g.slow_request_samples = samples
+
+    @app.after_request
+    def remember_status(response):
+        g.slow_request_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_slow_request_samples(exc):
+        samples = g.pop("slow_request_samples", None)
+        if samples is None:
+            return
+        _sampler.unregister()
+        if (time.perf_counter() - samples.started) * 1000 < threshold_ms:
+            return
+
+        report = samples.report(g.get("slow_request_status", 500), interval_ms)
+        try:
+            store.save(report)
+        except OSError:
+            logger.exception("Could not save slow request profile", extra={"profile_id": report["id"]})
+            return
+        hottest = report["hot_frames"][0]["frame"] if report["hot_frames"] else None
+        logger.warning("Slow request profiled", extra={
+            "route": report["route"], "method": report["method"], "duration_ms": report["duration_ms"],
+            "samples": report["samples"], "hot_frame": hottest, "profile_id": report["id"]})
+
+    @app.route('/debug/slow-requests', methods=['GET'])
+    @admin_required
+    def list_slow_requests():
+        return jsonify(store.recent(request.args.get('limit', 50, type=int)))
+
+    @app.route('/debug/slow-requests/<report_id>', methods=['GET'])
+    @admin_required
+    def get_slow_request(report_id):
+        if request.args.get('format') == 'folded':
+            folded = store.folded(report_id)
+            if folded is None:
+                return jsonify({"error": "Profile not found"}), 404
+            return Response(folded, mimetype="text/plain")
+        report = store.get(report_id)
+        if report is None:
+            return jsonify({"error": "Profile not found"}), 404
+        return jsonify(report)
+
+    return app
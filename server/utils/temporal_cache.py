@@ -0,0 +1,236 @@
+# utils/temporal_cache.py
+"""
+In-memory sliding window of recent entries per user, used to build temporal
+context without re-querying the previous days for every extraction.
+
+Each user keeps one contiguous loaded date range [start, end). A lookup inside
+the range is served from memory; a lookup just outside it extends the range
+with a single query. Writes invalidate the user's window, and entries older
+than the TTL are reloaded so other workers' writes become visible.
+
+Bulk imports open an ImportBatch: entries extracted earlier in the same import
+(not yet committed) are added to it and merged into later lookups, so
+consecutive days see each other while the import is still running. When a
+write batch commits, its entries move from the batch into the loaded window
+instead of invalidating it, and the merge skips any pending entry whose
+(entry_date, content_hash) the window already holds. Lookups made for an
+import load IMPORT_LOOKAHEAD_DAYS past the requested day, so an import whose
+date span is not known up front (a streamed upload) still extends its window
+once a month rather than once per entry.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from psycopg2.extras import RealDictCursor
+from .db_utils import get_db_connection
+
+# A window wider than this is not extended; it is replaced by the requested range
+MAX_WINDOW_DAYS = 120
+
+# How far past the requested day a lookup made for an import loads
+IMPORT_LOOKAHEAD_DAYS = 30
+
+
+class _UserWindow:
+    def __init__(self, start, end, rows):
+        self.start = start
+        self.end = end
+        self.rows = rows
+        self.loaded_at = time.monotonic()
+
+    def covers(self, start, end):
+        return self.start <= start and end <= self.end
+
+    def add(self, rows):
+        """Adds committed rows that fall inside the window and are not loaded yet"""
+        stored = {(r["entry_date"], r.get("content_hash")) for r in self.rows}
+        self.rows.extend(r for r in rows
+                         if self.start <= r["entry_date"] < self.end
+                         and (r["entry_date"], r.get("content_hash")) not in stored)
+
+
+class ImportBatch:
+    """Not-yet-committed entries of one import, visible to that import's lookups"""
+
+    def __init__(self, cache, user_id):
+        self.cache = cache
+        self.user_id = user_id
+        self.pending = []
+        self._lock = threading.Lock()
+
+    def add(self, entry):
+        """
+        `entry` uses the temporal context row shape (entry_date, entry_text,
+        content_hash, metrics, extraction_details)
+        """
+        entry = dict(entry)
+        entry.setdefault("created_at", datetime.now())
+        with self._lock:
+            self.pending.append(entry)
+
+    def committed(self, entry_ids):
+        """
+        Moves the entries of a committed write batch into the user's window.
+        `entry_ids` maps (entry_date, content_hash) to the stored raw entry id,
+        or to None for an entry that was already stored and is just dropped.
+        """
+        rows, pending = [], []
+        with self._lock:
+            for entry in self.pending:
+                key = (entry.get("entry_date"), entry.get("content_hash"))
+                if key not in entry_ids:
+                    pending.append(entry)
+                elif entry_ids[key] is not None:
+                    rows.append({**entry, "id": entry_ids[key]})
+            self.pending = pending
+        self.cache.add_committed(self.user_id, rows)
+
+    def entries_between(self, start, end):
+        with self._lock:
+            return [e for e in self.pending if e.get("entry_date") and start <= e["entry_date"] < end]
+
+    def close(self):
+        """Call once the import committed or rolled back"""
+        self.cache.invalidate(self.user_id)
+
+
+class TemporalContextCache:
+    def __init__(self, max_users=512, ttl_seconds=300):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start_batch(self, user_id):
+        return ImportBatch(self, user_id)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._windows.pop(int(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+
+    def add_committed(self, user_id, rows):
+        """Adds rows this process just committed to the user's loaded window"""
+        with self._lock:
+            window = self._windows.get(int(user_id))
+            if window:
+                window.add(rows)
+
+    def prime(self, user_id, start, end):
+        """Loads [start, end) in one query, e.g. the full date span of an import"""
+        rows = _load_entries(user_id, start, end)
+        with self._lock:
+            self._store(int(user_id), _UserWindow(start, end, rows))
+
+    def get_entries(self, user_id, current_date, days_back=3, batch=None):
+        """
+        Entries in [current_date - days_back, current_date), newest first.
+        With an import `batch`, a window that has to be loaded or extended
+        reaches IMPORT_LOOKAHEAD_DAYS further, for the import's later days.
+        """
+        user_id = int(user_id)
+        start = current_date - timedelta(days=days_back)
+        end = current_date
+        load_to = end + timedelta(days=IMPORT_LOOKAHEAD_DAYS) if batch is not None else end
+
+        with self._lock:
+            window = self._windows.get(user_id)
+            if window and time.monotonic() - window.loaded_at > self.ttl_seconds:
+                window = None
+            if window and window.covers(start, end):
+                self._windows.move_to_end(user_id)
+                rows = [r for r in window.rows if start <= r["entry_date"] < end]
+            else:
+                rows = None
+                if window and window.start <= end and start <= window.end \
+                        and (max(load_to, window.end) - min(start, window.start)).days <= MAX_WINDOW_DAYS:
+                    load_start, load_end = min(start, window.start), max(load_to, window.end)
+                else:
+                    load_start, load_end = start, load_to
+
+        if rows is None:
+            loaded = _load_entries(user_id, load_start, load_end)
+            with self._lock:
+                self._store(user_id, _UserWindow(load_start, load_end, loaded))
+            rows = [r for r in loaded if start <= r["entry_date"] < end]
+
+        rows = [dict(r) for r in rows]
+        if batch is not None:
+            # A window loaded after a write batch committed already has its rows
+            stored = {(r["entry_date"], r.get("content_hash")) for r in rows}
+            rows.extend(e for e in batch.entries_between(start, end)
+                        if (e["entry_date"], e.get("content_hash")) not in stored)
+        rows.sort(key=lambda r: (r["entry_date"], r.get("created_at") or datetime.min), reverse=True)
+        return rows
+
+    def _store(self, user_id, window):
+        self._windows[user_id] = window
+        self._windows.move_to_end(user_id)
+        while len(self._windows) > self.max_users:
+            self._windows.popitem(last=False)
+
+
+CONTEXT_COLUMNS = """
+                re.id,
+                re.entry_date,
+                re.entry_text,
+                re.content_hash,
+                re.created_at,
+                hm.mood_score,
+                hm.energy_level,
+                hm.pain_level,
+                hm.sleep_quality,
+                hm.sleep_hours,
+                hm.stress_level,
+                hm.extraction_details
+"""
+
+
+def _load_entries(user_id, start, end):
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(f"""
+            SELECT {CONTEXT_COLUMNS}
+            FROM raw_entries re
+            LEFT JOIN health_metrics hm ON re.id = hm.raw_entry_id
+            WHERE re.user_id = %s
+            AND re.entry_date >= %s
+            AND re.entry_date < %s
+            ORDER BY re.entry_date DESC, re.created_at DESC
+        """, (user_id, start, end))
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def load_entries_by_id(user_id, entry_ids):
+    """Context rows (same shape as the window rows) for specific entries"""
+    if not entry_ids:
+        return []
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(f"""
+            SELECT {CONTEXT_COLUMNS}
+            FROM raw_entries re
+            LEFT JOIN health_metrics hm ON re.id = hm.raw_entry_id
+            WHERE re.user_id = %s AND re.id = ANY(%s)
+        """, (user_id, list(entry_ids)))
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+temporal_cache = TemporalContextCache()
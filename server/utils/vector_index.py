@@ -0,0 +1,311 @@
+# utils/vector_index.py
+"""
+Approximate nearest-neighbour search over entry embeddings, per user.
+
+Embeddings live in entry_embeddings together with their locality-sensitive
+hash keys (random-hyperplane LSH: LSH_TABLES tables of LSH_BITS bits). Keys
+are computed once when an entry is stored, so loading a user's index is a
+single query plus bucket inserts. A query hashes the probe vector, collects
+candidates from its buckets and re-ranks them by exact cosine similarity;
+users with few entries are simply scanned. When the buckets return more than
+MAX_RERANK candidates (large histories of similar days), only the MAX_RERANK
+whose LSH sketch is closest in Hamming distance to the probe's are re-ranked,
+which keeps a query in the low milliseconds for 10k+ entries.
+
+Loaded indexes are kept in a small LRU and refreshed after a TTL so other
+workers' writes become visible; entries stored by this process are added
+once the transaction that stored them commits (see index_embeddings).
+"""
+
+import heapq
+import logging
+import math
+import operator
+import random
+import threading
+import time
+from array import array
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime
+from functools import lru_cache
+from psycopg2.extras import RealDictCursor, execute_values
+from .db_utils import get_db_connection
+from .embeddings import get_embedding_provider, embed_texts, embed_text, pack_vector, unpack_vector
+
+logger = logging.getLogger(__name__)
+
+LSH_TABLES = 12
+LSH_BITS = 6
+MAX_RERANK = 256
+BRUTE_FORCE_LIMIT = MAX_RERANK
+
+
+def _py_dot(a, b):
+    return sum(map(operator.mul, a, b))
+
+
+# math.sumprod (Python 3.12+) runs the loop in C
+dot = getattr(math, "sumprod", _py_dot)
+
+
+@lru_cache(maxsize=8)
+def _hyperplanes(provider_name, dim):
+    # Seeded so keys stored by any worker (or an earlier deploy) stay comparable
+    rng = random.Random(f"{provider_name}:{LSH_TABLES}x{LSH_BITS}")
+    return [array('f', (rng.gauss(0.0, 1.0) for _ in range(dim))) for _ in range(LSH_TABLES * LSH_BITS)]
+
+
+def lsh_keys(vector, provider_name):
+    """One bucket key per table; the table number is folded into the key"""
+    planes = _hyperplanes(provider_name, len(vector))
+    keys = []
+    for table in range(LSH_TABLES):
+        key = 0
+        for bit in range(LSH_BITS):
+            if dot(planes[table * LSH_BITS + bit], vector) >= 0:
+                key |= 1 << bit
+        keys.append((table << LSH_BITS) | key)
+    return keys
+
+
+def lsh_sketch(keys):
+    """All LSH_TABLES * LSH_BITS hyperplane signs of `keys` as one int"""
+    sketch = 0
+    mask = (1 << LSH_BITS) - 1
+    for key in keys:
+        sketch |= (key & mask) << ((key >> LSH_BITS) * LSH_BITS)
+    return sketch
+
+
+class UserVectorIndex:
+    def __init__(self):
+        self.entries = {}
+        self.buckets = defaultdict(set)
+        self.loaded_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry_id, entry_date, vector, keys):
+        with self._lock:
+            self._remove(entry_id)
+            self.entries[entry_id] = (entry_date, vector, keys, lsh_sketch(keys))
+            for key in keys:
+                self.buckets[key].add(entry_id)
+
+    def _remove(self, entry_id):
+        previous = self.entries.pop(entry_id, None)
+        if previous:
+            for key in previous[2]:
+                self.buckets[key].discard(entry_id)
+
+    def query(self, vector, keys, k=5, exclude_ids=(), before_date=None):
+        """[(entry_id, entry_date, similarity)] best first"""
+        with self._lock:
+            if len(self.entries) <= BRUTE_FORCE_LIMIT:
+                candidate_ids = list(self.entries)
+            else:
+                candidate_ids = set()
+                for key in keys:
+                    candidate_ids.update(self.buckets.get(key, ()))
+            candidates = []
+            for entry_id in candidate_ids:
+                entry = self.entries[entry_id]
+                if entry_id not in exclude_ids and (before_date is None or (entry[0] and entry[0] < before_date)):
+                    candidates.append((entry_id, entry))
+
+        if len(candidates) > MAX_RERANK:
+            # Fewest differing hyperplane signs approximates the smallest angle
+            probe = lsh_sketch(keys)
+            candidates = heapq.nsmallest(MAX_RERANK, candidates, key=lambda item: (item[1][3] ^ probe).bit_count())
+        scored = (
+            (dot(vector, stored_vector), entry_id, entry_date)
+            for entry_id, (entry_date, stored_vector, _, _) in candidates
+        )
+        return [(entry_id, entry_date, score) for score, entry_id, entry_date in heapq.nlargest(k, scored)]
+
+
+class VectorIndexRegistry:
+    def __init__(self, max_users=64, ttl_seconds=300):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        user_id = int(user_id)
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index and time.monotonic() - index.loaded_at <= self.ttl_seconds:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        index = _load_user_index(user_id, get_embedding_provider().name)
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def add(self, user_id, entry_id, entry_date, vector, keys):
+        """Adds to an already loaded index; unloaded users pick it up on load"""
+        with self._lock:
+            index = self._indexes.get(int(user_id))
+        if index is not None:
+            index.add(entry_id, entry_date, vector, keys)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._indexes.pop(int(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+vector_index = VectorIndexRegistry()
+
+
+def store_embeddings(cursor, entries):
+    """
+    Embeds and upserts entries given as dicts with raw_entry_id, user_id,
+    entry_date and entry_text, in one statement. Runs in the caller's
+    transaction; returns the stored rows, which the caller passes to
+    index_embeddings() after committing.
+    """
+    if not entries:
+        return []
+    provider = get_embedding_provider()
+    vectors = embed_texts([entry['entry_text'] for entry in entries], provider)
+    rows = []
+    for entry, vector in zip(entries, vectors):
+        keys = lsh_keys(vector, provider.name)
+        entry_date = entry['entry_date']
+        if isinstance(entry_date, str):
+            entry_date = date.fromisoformat(entry_date)
+        elif isinstance(entry_date, datetime):
+            entry_date = entry_date.date()
+        rows.append((
+            entry['raw_entry_id'], entry['user_id'], entry_date, provider.name,
+            len(vector), pack_vector(vector), keys, datetime.now()
+        ))
+
+    execute_values(cursor, """
+        INSERT INTO entry_embeddings (
+            raw_entry_id, user_id, entry_date, provider, dim, vector, lsh_keys, created_at
+        ) VALUES %s
+        ON CONFLICT (raw_entry_id) DO UPDATE SET
+            entry_date = EXCLUDED.entry_date,
+            provider = EXCLUDED.provider,
+            dim = EXCLUDED.dim,
+            vector = EXCLUDED.vector,
+            lsh_keys = EXCLUDED.lsh_keys,
+            created_at = EXCLUDED.created_at
+    """, rows)
+    return rows
+
+
+def index_embeddings(rows):
+    """
+    Adds rows returned by store_embeddings to the loaded indexes. Call after
+    the commit, so a rolled-back write never leaves ids in the index.
+    """
+    for row in rows:
+        # Keep the float16-rounded vector so results match a fresh load
+        vector_index.add(row[1], row[0], row[2], unpack_vector(row[5]), row[6])
+
+
+def store_embeddings_safely(cursor, entries):
+    """
+    store_embeddings inside a savepoint; a failure never fails the caller's
+    write. Returns the stored rows for index_embeddings (none on failure).
+    """
+    try:
+        cursor.execute("SAVEPOINT store_embeddings")
+        rows = store_embeddings(cursor, entries)
+        cursor.execute("RELEASE SAVEPOINT store_embeddings")
+        return rows
+    except Exception as e:
+        logger.warning("Could not store embeddings: %s", e, extra={"entries": len(entries)})
+        cursor.execute("ROLLBACK TO SAVEPOINT store_embeddings")
+        return []
+
+
+def store_entry_embedding(cursor, raw_entry_id, user_id, entry_date, entry_text):
+    return store_embeddings_safely(cursor, [{
+        'raw_entry_id': raw_entry_id, 'user_id': user_id,
+        'entry_date': entry_date, 'entry_text': entry_text
+    }])
+
+
+def backfill_embeddings(user_id=None, batch_size=200):
+    """
+    Embeds entries that have no embedding from the current provider (new
+    installs, or after switching providers). Commits per batch so it can be
+    interrupted and resumed. Returns the number of entries embedded.
+    """
+    provider_name = get_embedding_provider().name
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    total = 0
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        while True:
+            cursor.execute("""
+                SELECT re.id AS raw_entry_id, re.user_id, re.entry_date, re.entry_text
+                FROM raw_entries re
+                LEFT JOIN entry_embeddings ee
+                    ON ee.raw_entry_id = re.id AND ee.provider = %s
+                WHERE ee.raw_entry_id IS NULL
+                AND (%s::int IS NULL OR re.user_id = %s)
+                ORDER BY re.id
+                LIMIT %s
+            """, (provider_name, user_id, user_id, batch_size))
+            entries = cursor.fetchall()
+            if not entries:
+                return total
+            rows = store_embeddings(cursor, entries)
+            conn.commit()
+            index_embeddings(rows)
+            total += len(entries)
+    finally:
+        conn.close()
+
+
+def find_similar_entries(user_id, text=None, vector=None, k=5, exclude_ids=(), before_date=None):
+    """[(entry_id, entry_date, similarity)] for a text or a stored vector"""
+    provider = get_embedding_provider()
+    if vector is None:
+        vector = embed_text(text, provider)
+    index = vector_index.get(user_id)
+    return index.query(vector, lsh_keys(vector, provider.name), k=k,
+                       exclude_ids=set(exclude_ids), before_date=before_date)
+
+
+def get_entry_vector(user_id, entry_id):
+    entry = vector_index.get(user_id).entries.get(entry_id)
+    return entry[1] if entry else None
+
+
+def _load_user_index(user_id, provider_name):
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("""
+            SELECT raw_entry_id, entry_date, vector, lsh_keys
+            FROM entry_embeddings
+            WHERE user_id = %s AND provider = %s
+        """, (user_id, provider_name))
+        index = UserVectorIndex()
+        for row in cursor.fetchall():
+            index.add(row['raw_entry_id'], row['entry_date'], unpack_vector(bytes(row['vector'])), row['lsh_keys'])
+        return index
+    finally:
+        conn.close()